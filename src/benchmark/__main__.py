@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from benchmark.harness import (
+    BACKENDS, collect_environment, import_time_report, run_sweep, print_header, save_results, compare_with_baseline,
+    load_baseline
+)
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+import benchmark.backends  # 注册全部后端
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='ExpHydro跨框架基准测试 (每次运行: 求解, 计算流量与均方误差)')
+    parser.add_argument('--backends', nargs='+', default=None, help='要测试的后端 (默认全部)')
+    parser.add_argument('--lengths', nargs='+', type=int, default=[1000, 10000], help='序列长度 (天)')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1], help='参数组数')
+    parser.add_argument('--warmup', type=int, default=2, help='计时前的预热次数 (不含首次运行)')
+    parser.add_argument('--repeats', type=int, default=10, help='计时重复次数')
+    parser.add_argument('--output', nargs='+', default=[], help='结果文件 (.json 或 .csv)')
+    parser.add_argument('--baseline', default=None, help='用于对比的基准结果 (.json)')
+    parser.add_argument('--list', action='store_true', help='列出已注册的后端')
+    parser.add_argument('--no-import-times', action='store_true', help='不测量各后端模块的导入时间')
+    args = parser.parse_args()
+
+    if args.list:
+        for backend in BACKENDS.values():
+            print(f"{backend.name:<18}{backend.description}")
+        return
+
+    backend_names = args.backends or list(BACKENDS)
+    unknown = [name for name in backend_names if name not in BACKENDS]
+    if unknown:
+        parser.error(f"未知的后端: {unknown}, 可选: {list(BACKENDS)}")
+    if args.baseline:
+        # 在测试前检查基准文件, 避免测试结束后才失败
+        try:
+            load_baseline(args.baseline)
+        except ValueError as e:
+            parser.error(str(e))
+
+    environment = collect_environment()
+    print(f"{environment['hostname']} | {environment['processor']} | {environment['platform']} | "
+          f"Python {environment['python']}\n")
+    if not args.no_import_times:
+        # 各模块在独立的解释器中导入 (-X importtime), 结果随环境信息一起保存
+        environment['import_times_us'] = import_time_report(backend_names)
+        print()
+    print_header()
+    results = run_sweep(
+        backend_names, args.lengths, args.batch_sizes,
+        load_data=lambda length: load_hydro_data(get_data_path(), data_length=length),
+        warmup=args.warmup, repeats=args.repeats,
+    )
+
+    for path in args.output:
+        save_results(results, environment, path)
+        print(f"\n结果已保存: {path}")
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+from typing import Callable, Dict
+
+import numpy as np
+
+from benchmark.harness import register_backend
+# scipy_benchmark在导入时不加载scipy (solve_ivp在求解函数内导入)
+from benchmark.scipy_benchmark import PARAM_NAMES, DEFAULT_PARAMS
+
+# 各后端共用的初始状态
+INITIAL_STATE = (0.0, 50.0)
+
+# 每个后端的run()完成一次率定目标函数的求值: 求解状态, 由状态计算流量, 与观测流量的均方误差,
+# 各后端计时的工作量相同. 后端的依赖在setup中导入, 未安装的后端在结果中标记为unavailable; module为setup导入的模块, 用于导入时间报告
+
+def batch_params(batch_size: int, seed: int = 42) -> np.ndarray:
+    """在默认参数附近扰动得到 (batch_size, 6) 参数矩阵, 第一组为默认参数"""
+    rng = np.random.default_rng(seed)
+    scales = rng.uniform(0.9, 1.1, (batch_size, len(PARAM_NAMES)))
+    scales[0] = 1.0
+    return DEFAULT_PARAMS * scales
+
+def _setup_scipy(inputs_dict: Dict[str, np.ndarray], observed_flow: np.ndarray,
+                 batch_size: int, method: str) -> Callable[[], object]:
+    from benchmark import scipy_benchmark
+
+    inputs = scipy_benchmark.ModelInput(**inputs_dict)
+    params_list = [scipy_benchmark.ModelParams(**dict(zip(PARAM_NAMES, row))) for row in batch_params(batch_size)]
+    initial_state = scipy_benchmark.ModelState(*INITIAL_STATE)
+    t_span = (0.0, len(observed_flow) - 1.0)
+
+    def loss(params):
+        _, states = scipy_benchmark.solve_model(initial_state, inputs, params, t_span, 1.0, method=method)
+        flow = scipy_benchmark.compute_outputs(states, inputs, params).flow
+        return np.mean((flow - observed_flow[:len(flow)]) ** 2)
+
+    def run():
+        return [loss(params) for params in params_list]
+    return run
+
+@register_backend('scipy-rk45', 'scipy solve_ivp (RK45), 逐组参数求解',
+                  module='benchmark.scipy_benchmark')
+def setup_scipy_rk45(inputs_dict, observed_flow, batch_size):
+    return _setup_scipy(inputs_dict, observed_flow, batch_size, 'RK45')
+
+@register_backend('scipy-bdf', 'scipy solve_ivp (BDF, 解析雅可比矩阵), 逐组参数求解',
+                  module='benchmark.scipy_benchmark')
+def setup_scipy_bdf(inputs_dict, observed_flow, batch_size):
+    return _setup_scipy(inputs_dict, observed_flow, batch_size, 'BDF')
+
+@register_backend('scipy-radau', 'scipy solve_ivp (Radau, 解析雅可比矩阵), 逐组参数求解',
+                  module='benchmark.scipy_benchmark')
+def setup_scipy_radau(inputs_dict, observed_flow, batch_size):
+    return _setup_scipy(inputs_dict, observed_flow, batch_size, 'Radau')
+
+@register_backend('scipy-lsoda', 'scipy solve_ivp (LSODA, 解析雅可比矩阵), 逐组参数求解',
+                  module='benchmark.scipy_benchmark')
+def setup_scipy_lsoda(inputs_dict, observed_flow, batch_size):
+    return _setup_scipy(inputs_dict, observed_flow, batch_size, 'LSODA')
+
+@register_backend('scipy-euler', 'NumPy离散时间显式欧拉, 逐组参数求解',
+                  module='benchmark.scipy_benchmark')
+def setup_scipy_euler(inputs_dict, observed_flow, batch_size):
+    return _setup_scipy(inputs_dict, observed_flow, batch_size, 'euler')
+
+@register_backend('scipy-rk4', 'NumPy离散时间定步长RK4, 逐组参数求解',
+                  module='benchmark.scipy_benchmark')
+def setup_scipy_rk4(inputs_dict, observed_flow, batch_size):
+    return _setup_scipy(inputs_dict, observed_flow, batch_size, 'rk4')
+
+@register_backend('numba', 'Numba离散时间显式欧拉, 参数维并行',
+                  module='benchmark.numba_benchmark')
+def setup_numba(inputs_dict, observed_flow, batch_size):
+    from benchmark.numba_benchmark import exphydro_kernel
+
+    params = batch_params(batch_size)
+    temp, lday, prcp = (np.ascontiguousarray(inputs_dict[name], dtype=np.float64)
+                        for name in ('temp', 'lday', 'prcp'))
+    initial_state = np.array(INITIAL_STATE)
+
+    def run():
+        flow = exphydro_kernel(params, temp, lday, prcp, initial_state)
+        return np.mean((flow - observed_flow) ** 2, axis=1)
+    return run
+
+@register_backend('torch-rk4', 'torchdiffeq rk4, 批量模型一次求解',
+                  module='benchmark.torch_benchmark')
+def setup_torch(inputs_dict, observed_flow, batch_size):
+    import torch
+    from benchmark import torch_benchmark
+
+    times = torch.arange(1, len(observed_flow) + 1, dtype=torch.float32)
+    forcing = torch_benchmark.build_forcing(inputs_dict)
+    forcing_interp = torch_benchmark.NaturalCubicSpline(torch_benchmark.natural_cubic_spline_coeffs(times, forcing))
+    params = torch.tensor(batch_params(batch_size), dtype=torch.float32)
+    model = torch_benchmark.BatchedHydroModel(params, forcing_interp)
+    initial_state = torch.tensor(INITIAL_STATE, dtype=torch.float32).expand(batch_size, 2)
+    t_span = (1.0, float(len(observed_flow)))
+    observed = torch.tensor(observed_flow, dtype=torch.float32)[:, None]
+
+    def run():
+        with torch.no_grad():
+            _, states = torch_benchmark.solve_batched_model(model, initial_state, t_span, 1.0)
+            flow = torch_benchmark.compute_outputs(states, forcing, params).flow  # 输出时刻与样条节点重合
+            return ((flow - observed) ** 2).mean(dim=0)
+    return run
+
+@register_backend('jax', 'diffrax Tsit5, 未JIT, 逐组参数求解',
+                  module='benchmark.jax_benchmark')
+def setup_jax(inputs_dict, observed_flow, batch_size):
+    import jax
+    import jax.numpy as jnp
+    from benchmark import jax_benchmark
+
+    inputs = jax_benchmark.ModelInput(*(jnp.array(inputs_dict[name]) for name in jax_benchmark.ModelInput._fields))
+    params_list = [jax_benchmark.ModelParams(*row) for row in batch_params(batch_size)]
+    initial_state = jax_benchmark.ModelState(*INITIAL_STATE)
+    observed = jnp.array(observed_flow)
+
+    def run():
+        return jax.block_until_ready([jax_benchmark.loss_function(params, initial_state, inputs, observed)
+                                      for params in params_list])
+    return run
+
+@register_backend('jax-jit', 'diffrax Tsit5, JIT + vmap参数维',
+                  module='benchmark.jax_benchmark_jit')
+def setup_jax_jit(inputs_dict, observed_flow, batch_size):
+    import jax
+    import jax.numpy as jnp
+    from benchmark import jax_benchmark_jit
+
+    inputs = jax_benchmark_jit.ModelInput(*(jnp.array(inputs_dict[name])
+                                            for name in jax_benchmark_jit.ModelInput._fields))
+    params = jax_benchmark_jit.ModelParams(*jnp.array(batch_params(batch_size).T))
+    initial_state = jax_benchmark_jit.ModelState(*INITIAL_STATE)
+    observed = jnp.array(observed_flow)
+    mask = jnp.ones(len(observed_flow), dtype=bool)
+
+    def run():
+        return jax.block_until_ready(
+            jax_benchmark_jit.ensemble_loss_function(params, initial_state, inputs, observed, mask))
+    return run
+
+@register_backend('jax-scan', 'lax.scan离散时间显式欧拉, JIT + vmap参数维',
+                  module='benchmark.jax_benchmark_jit')
+def setup_jax_scan(inputs_dict, observed_flow, batch_size):
+    import jax
+    import jax.numpy as jnp
+    from benchmark import jax_benchmark_jit
+
+    inputs = jax_benchmark_jit.ModelInput(*(jnp.array(inputs_dict[name])
+                                            for name in jax_benchmark_jit.ModelInput._fields))
+    params = jax_benchmark_jit.ModelParams(*jnp.array(batch_params(batch_size).T))
+    initial_state = jax_benchmark_jit.ModelState(*INITIAL_STATE)
+    observed = jnp.array(observed_flow)
+    loss_fn = jax.jit(jax.vmap(jax_benchmark_jit.discrete_loss_function, in_axes=(0, None, None, None)))
+
+    def run():
+        return jax.block_until_ready(loss_fn(params, initial_state, inputs, observed))
+    return run
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import pickle
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from benchmark.utils.data_loader import DATA_DIR
+from benchmark.utils.forcing_store import STORE_DIR, ForcingStore
+
+def _basin_summary(store: ForcingStore, basin: str):
+    """工作进程中取单个流域的数据: store按路径重新映射, 返回降水均值, 是否为映射文件的视图与进程号"""
+    forcing = store.select(basin)
+    is_view = isinstance(store.data, np.memmap) and np.shares_memory(forcing, store.data)
+    return basin, _mean_prcp(store, forcing), is_view, os.getpid()
+
+def _mean_prcp(store: ForcingStore, forcing: np.ndarray) -> float:
+    return float(np.nanmean(forcing[0, :, store.variables.index('prcp')]))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2, help='工作进程数')
+    parser.add_argument('--start-date', type=str, default='1980-10-01',
+                        help='没有date列的CSV (如03604000) 的起始日期, 仅用于演示')
+    parser.add_argument('--path', type=str, default=str(STORE_DIR / 'exphydro'), help='存储目录')
+    args = parser.parse_args()
+
+    files = {path.stem: str(path) for path in sorted((DATA_DIR / 'exphydro').glob('*.csv'))}
+    start_time = time.perf_counter()
+    start_dates = {basin: args.start_date for basin in files}
+    store = ForcingStore.build(files, args.path, start_dates=start_dates)
+    print(f"构建: {time.perf_counter() - start_time:.4f} 秒, {store}")
+
+    # 传给工作进程的只有路径, 与数据量无关
+    print(f"pickle大小: store {len(pickle.dumps(store))} 字节, 数组 {len(pickle.dumps(np.asarray(store.data)))} 字节")
+
+    expected = {basin: _mean_prcp(store, store.select(basin)) for basin in store.basin_ids}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for basin, mean_prcp, is_view, pid in executor.map(_basin_summary, [store] * len(files), store.basin_ids):
+            print(f"  流域 {basin} (进程 {pid}): 内存映射视图 = {is_view}, "
+                  f"与主进程的最大差异 = {abs(mean_prcp - expected[basin]):.1e}")
+
+    # 重建不影响已映射旧文件的读者: data.npy被替换为新文件而不是原地改写
+    inode = os.stat(store.path / 'data.npy').st_ino
+    ForcingStore.build(files, args.path, start_dates=start_dates)
+    print(f"重建后data.npy为新文件 (旧映射仍指向原文件): {os.stat(store.path / 'data.npy').st_ino != inode}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+using CSV, DataFrames
+using DataInterpolations, ComponentArrays
+using HydroModels
+using BenchmarkTools
+using Random
+
+include("../../models/gr4j.jl")
+# 用法: julia -t auto --project src/benchmark/gr4j_benchmark.jl [天数] [参数组数]
+# 与numba_gr4j_benchmark.py的默认值相同 (3600天, 1000组参数), 输入为相同的GR4J样例
+n_days = length(ARGS) >= 1 ? parse(Int, ARGS[1]) : 3600
+n_params = length(ARGS) >= 2 ? parse(Int, ARGS[2]) : 1000
+
+file_path = "data/gr4j/sample.csv"
+data = CSV.File(file_path);
+df = DataFrame(data);
+ts = collect(1:n_days)
+input = (P=df[ts, "prec"], Ep=df[ts, "pet"])
+input_arr = stack(input[HydroModels.get_input_names(gr4j_model)], dims=1)
+
+# 与numba_gr4j_benchmark.INITIAL_STATES一致
+initstates = ComponentVector(S=10.0, R=10.0)
+config = (solver=HydroModels.DiscreteSolver(), interp=LinearInterpolation)
+
+# 第一组为gr4j_benchmark.SAMPLE_PARAMS, 其余在numba_gr4j_benchmark.SAMPLE_BOUNDS内均匀采样
+# (随机数生成器与numpy不同, 参数取值不同, 只用于对比运行时间)
+bounds = [(100.0, 1200.0), (0.0, 3.0), (20.0, 300.0), (1.1, 15.0)]
+rng = MersenneTwister(42)
+params_list = map(1:n_params) do i
+    x = i == 1 ? [320.11, 2.42, 69.63, 1.39] : [lo + (hi - lo) * rand(rng) for (lo, hi) in bounds]
+    ComponentVector(params=ComponentVector(x1=x[1], x2=x[2], x3=x[3], x4=x[4]))
+end
+
+# 单组参数
+@btime gr4j_model($input_arr, $(params_list[1]), initstates=$initstates, config=$config)
+
+# 参数组 (多线程, 对应numba的prange)
+function run_ensemble(params_list)
+    outputs = Vector{Any}(undef, length(params_list))
+    Threads.@threads for i in eachindex(params_list)
+        outputs[i] = gr4j_model(input_arr, params_list[i], initstates=initstates, config=config)
+    end
+    return outputs
+end
+run_ensemble(params_list[1:2])  # 预热编译
+elapsed = @elapsed run_ensemble(params_list)
+println("$(n_params) 组参数 x $(n_days) 天 ($(Threads.nthreads()) 线程), 运行时间: $(round(elapsed, digits=4)) 秒 ",
+        "($(round(n_params / elapsed, digits=1)) 组/秒)")
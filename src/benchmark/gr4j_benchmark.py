@@ -0,0 +1,262 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+import numpy as np
+from numba import njit, prange
+from benchmark.utils.data_loader import load_dataset
+
+PARAM_NAMES = ('x1', 'x2', 'x3', 'x4')
+PARAM_BOUNDS = np.array([
+    [100.0, 1200.0],  # x1
+    [-5.0, 3.0],      # x2
+    [20.0, 300.0],    # x3
+    [1.1, 15.0],      # x4
+])
+
+# data/gr4j/sample.csv (airGR RunModel_GR4J的输出) 的参数, 由样例前几行的输出反算
+SAMPLE_PARAMS = np.array([320.11, 2.42, 69.63, 1.39])
+VALIDATION_START = 365  # 与样例对比的起始天, 反算只用到此前的几行
+
+UH1_SPLIT = 0.9         # 进入UH1 (慢速分量Q9) 的比例
+FFT_MIN_KERNEL = 24     # 单位线长度不小于该值时用FFT卷积, 否则直接卷积 (1000x3652的实测交点)
+CONVOLVE_METHODS = ('auto', 'direct', 'fft')
+
+class GR4JOutput(NamedTuple):
+    """GR4J的输出, 每项为 (n_params, T)"""
+    prod: np.ndarray   # 产流水库储水量 (时段末)
+    pr: np.ndarray     # 进入单位线的水量
+    q9: np.ndarray     # UH1汇流后的慢速分量
+    q1: np.ndarray     # UH2汇流后的快速分量
+    rout: np.ndarray   # 汇流水库储水量 (时段末)
+    exch: np.ndarray   # 地下水交换量
+    qr: np.ndarray     # 汇流水库出流
+    qd: np.ndarray     # 直接径流
+    qsim: np.ndarray   # 总径流
+
+@lru_cache(maxsize=4096)
+def uh_ordinates(x4: float) -> Tuple[np.ndarray, np.ndarray]:
+    """单个x4的UH1 (长度ceil(x4)) 与UH2 (长度ceil(2 * x4)) 纵坐标, 按x4缓存 (只读数组)"""
+    t1 = np.arange(int(np.ceil(x4)) + 1, dtype=np.float64)
+    s1 = np.where(t1 < x4, (t1 / x4) ** 2.5, 1.0)
+    t2 = np.arange(int(np.ceil(2.0 * x4)) + 1, dtype=np.float64)
+    s2 = np.where(t2 < x4, 0.5 * (t2 / x4) ** 2.5,
+                  np.where(t2 < 2.0 * x4, 1.0 - 0.5 * np.abs(2.0 - t2 / x4) ** 2.5, 1.0))
+    uh1, uh2 = np.diff(s1), np.diff(s2)
+    uh1.flags.writeable = False
+    uh2.flags.writeable = False
+    return uh1, uh2
+
+def uh_kernels(x4: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """批量x4的纵坐标矩阵 (n_params, n1), (n_params, n2), 按最长的单位线补零"""
+    ordinates = [uh_ordinates(float(value)) for value in x4]
+    n1 = max(len(uh1) for uh1, _ in ordinates)
+    n2 = max(len(uh2) for _, uh2 in ordinates)
+    kernels1, kernels2 = np.zeros((len(x4), n1)), np.zeros((len(x4), n2))
+    for j, (uh1, uh2) in enumerate(ordinates):
+        kernels1[j, :len(uh1)] = uh1
+        kernels2[j, :len(uh2)] = uh2
+    return kernels1, kernels2
+
+def convolve_batched(inflow: np.ndarray, kernels: np.ndarray, method: str = 'auto') -> np.ndarray:
+    """逐行因果卷积 out[j, t] = sum_k kernels[j, k] * inflow[j, t - k], 整个序列一次计算
+
+    参数:
+        inflow: (n_params, T) 输入序列
+        kernels: (n_params, n) 单位线纵坐标
+        method: 'direct' (滑动窗口与纵坐标的批量点积), 'fft' (rfft相乘), 'auto' 按单位线长度选择
+    """
+    n_params, n_steps = inflow.shape
+    n = kernels.shape[1]
+    if method == 'auto':
+        method = 'fft' if n >= FFT_MIN_KERNEL else 'direct'
+    if method == 'direct':
+        padded = np.concatenate([np.zeros((n_params, n - 1)), inflow], axis=1)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, n, axis=1)  # (n_params, T, n)
+        return np.einsum('ptk,pk->pt', windows, kernels[:, ::-1])
+    if method == 'fft':
+        n_fft = 1 << int(np.ceil(np.log2(n_steps + n - 1)))
+        spectrum = np.fft.rfft(inflow, n_fft, axis=1) * np.fft.rfft(kernels, n_fft, axis=1)
+        return np.fft.irfft(spectrum, n_fft, axis=1)[:, :n_steps]
+    raise ValueError(f"未知的卷积方法: {method}, 可选: {CONVOLVE_METHODS}")
+
+def route_lag_state(inflow: np.ndarray, kernels: np.ndarray) -> np.ndarray:
+    """逐时段平移滞时状态的汇流 (superflexpy LagElement的做法), 作为卷积的对照"""
+    n_params, n_steps = inflow.shape
+    lag = np.zeros_like(kernels)
+    out = np.empty_like(inflow)
+    for t in range(n_steps):
+        lag += inflow[:, t, None] * kernels
+        out[:, t] = lag[:, 0]
+        lag[:, :-1] = lag[:, 1:]
+        lag[:, -1] = 0.0
+    return out
+
+@njit(parallel=True, cache=True)
+def production_store(x1: np.ndarray, prcp: np.ndarray, pet: np.ndarray, s0: np.ndarray):
+    """产流水库 (airGR的解析积分形式), 在参数维并行
+
+    返回:
+        prod, ps, ae (实际蒸散发), perc, pr, 每项为 (n_params, T)
+    """
+    n_params, n_steps = x1.shape[0], prcp.shape[0]
+    prod = np.empty((n_params, n_steps))
+    ps_out = np.empty((n_params, n_steps))
+    ae_out = np.empty((n_params, n_steps))
+    perc_out = np.empty((n_params, n_steps))
+    pr_out = np.empty((n_params, n_steps))
+    for j in prange(n_params):
+        S, X1 = s0[j], x1[j]
+        for t in range(n_steps):
+            P, E = prcp[t], pet[t]
+            sr = S / X1
+            if P <= E:
+                tws = np.tanh(min((E - P) / X1, 13.0))
+                es = S * (2.0 - sr) * tws / (1.0 + (1.0 - sr) * tws)
+                S -= es
+                ps, ae, pn = 0.0, es + P, 0.0
+            else:
+                pn = P - E
+                tws = np.tanh(min(pn / X1, 13.0))
+                ps = X1 * (1.0 - sr * sr) * tws / (1.0 + sr * tws)
+                S += ps
+                ae = E
+            S = max(S, 0.0)
+            perc = S * (1.0 - (1.0 + (S / (2.25 * X1)) ** 4) ** -0.25)
+            S -= perc
+            prod[j, t], ps_out[j, t], ae_out[j, t], perc_out[j, t] = S, ps, ae, perc
+            pr_out[j, t] = pn - ps + perc
+    return prod, ps_out, ae_out, perc_out, pr_out
+
+@njit(parallel=True, cache=True)
+def routing_store(x2: np.ndarray, x3: np.ndarray, q9: np.ndarray, q1: np.ndarray, r0: np.ndarray):
+    """汇流水库与地下水交换, 在参数维并行
+
+    返回:
+        rout, exch, qr, qd, 每项为 (n_params, T)
+    """
+    n_params, n_steps = q9.shape
+    rout = np.empty((n_params, n_steps))
+    exch_out = np.empty((n_params, n_steps))
+    qr_out = np.empty((n_params, n_steps))
+    qd_out = np.empty((n_params, n_steps))
+    for j in prange(n_params):
+        R, X2, X3 = r0[j], x2[j], x3[j]
+        for t in range(n_steps):
+            exch = X2 * (R / X3) ** 3.5
+            R = max(0.0, R + q9[j, t] + exch)
+            qr = R * (1.0 - (1.0 + (R / X3) ** 4) ** -0.25)
+            R -= qr
+            rout[j, t], exch_out[j, t], qr_out[j, t] = R, exch, qr
+            qd_out[j, t] = max(0.0, q1[j, t] + exch)
+    return rout, exch_out, qr_out, qd_out
+
+def run_gr4j(params: np.ndarray, prcp: np.ndarray, pet: np.ndarray,
+             initial_states: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+             uh_states: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+             method: str = 'auto') -> GR4JOutput:
+    """批量参数的GR4J: 产流水库 -> 单位线 (整段序列的批量卷积) -> 汇流水库
+
+    参数:
+        params: (n_params, 4) 参数矩阵, 列顺序见PARAM_NAMES
+        prcp, pet: (T,) 降水与潜在蒸散发
+        initial_states: 产流与汇流水库的初始储水量 (标量或 (n_params,)), 默认为0.3 * x1与0.5 * x3 (airGR的默认值)
+        uh_states: 单位线中尚未流出的Q9, Q1 (各为 (n_params, m) 或 (m,)), 加到前m个时段, 默认为0
+        method: 卷积方法, 见convolve_batched
+    """
+    params = np.ascontiguousarray(params, dtype=np.float64)
+    x1, x2, x3, x4 = params.T
+    if initial_states is None:
+        initial_states = (0.3 * x1, 0.5 * x3)
+    s0, r0 = (np.broadcast_to(np.asarray(state, dtype=np.float64), x1.shape).copy() for state in initial_states)
+
+    prod, _, _, _, pr = production_store(x1, prcp, pet, s0)
+
+    kernels1, kernels2 = uh_kernels(x4)
+    q9 = UH1_SPLIT * convolve_batched(pr, kernels1, method)
+    q1 = (1.0 - UH1_SPLIT) * convolve_batched(pr, kernels2, method)
+    if uh_states is not None:
+        for routed, state in zip((q9, q1), uh_states):
+            state = np.atleast_2d(state)
+            routed[:, :state.shape[1]] += state
+
+    rout, exch, qr, qd = routing_store(x2, x3, q9, q1, r0)
+    return GR4JOutput(prod, pr, q9, q1, rout, exch, qr, qd, qr + qd)
+
+def validate_against_sample(method: str = 'auto', start: int = VALIDATION_START) -> Dict[str, float]:
+    """与data/gr4j/sample.csv第start天起的一段对比, 返回各变量的最大相对误差 (相对于该变量的最大绝对值)
+
+    SAMPLE_PARAMS由样例的前几行反算, 在这些行上对比是循环论证, 因此从start天起重新开始模拟:
+    初始储水量取样例第start - 1天末的prob与rout, 单位线中尚未流出的水量由样例此前的pr卷积得到, 均不经过拟合.
+    样例的单位线纵坐标之和为1 - 3e-8 (单精度), q9, q1及其下游变量的误差约为1e-7量级.
+    """
+    data = load_dataset('gr4j')
+    prcp, pet = np.ascontiguousarray(data['prcp'][start:]), np.ascontiguousarray(data['pet'][start:])
+    params = SAMPLE_PARAMS[None]
+    initial_states = (data['prob'][start - 1], data['rout'][start - 1])
+
+    kernels1, kernels2 = uh_kernels(params[:, 3])
+    uh_states = []
+    for split, kernels in ((UH1_SPLIT, kernels1), (1.0 - UH1_SPLIT, kernels2)):
+        n = kernels.shape[1]
+        history = np.concatenate([data['pr'][:start], np.zeros(n)])[None]
+        uh_states.append(split * convolve_batched(history, kernels, method)[0, start:])
+
+    prod, ps, ae, perc, _ = production_store(params[:, 0], prcp, pet, np.array([initial_states[0]]))
+    output = run_gr4j(params, prcp, pet, initial_states, tuple(uh_states), method)
+    simulated = {'prob': prod, 'ps': ps, 'evap': ae, 'perc': perc, **output._asdict()}
+    return {name: float(np.max(np.abs(simulated[name][0] - data[name][start:])) / np.max(np.abs(data[name][start:])))
+            for name in ('prob', 'ps', 'evap', 'perc', 'pr', 'q9', 'q1', 'rout', 'exch', 'qr', 'qd', 'qsim')}
+
+def sample_params(n_params: int, seed: int = 42, bounds: np.ndarray = PARAM_BOUNDS) -> np.ndarray:
+    """在参数范围 (默认PARAM_BOUNDS) 内均匀采样 (n_params, 4) 参数矩阵, 第一组为SAMPLE_PARAMS"""
+    rng = np.random.default_rng(seed)
+    low, high = bounds[:, 0], bounds[:, 1]
+    params = low + (high - low) * rng.random((n_params, len(PARAM_NAMES)))
+    params[0] = SAMPLE_PARAMS
+    return params
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--params', type=int, default=1000, help='参数组数')
+    parser.add_argument('--repeats', type=int, default=3, help='计时重复次数')
+    args = parser.parse_args()
+
+    errors = validate_against_sample()
+    print(f"与sample.csv (第{VALIDATION_START}天起) 的最大相对误差:", {name: f"{value:.1e}" for name, value in errors.items()})
+
+    data = load_dataset('gr4j', ['prcp', 'pet'])
+    prcp, pet = np.ascontiguousarray(data['prcp']), np.ascontiguousarray(data['pet'])
+    params = sample_params(args.params)
+    run_gr4j(params[:2], prcp, pet)  # 预热JIT编译
+
+    def timed(fn, *fn_args):
+        times = []
+        for _ in range(args.repeats):
+            start_time = time.perf_counter()
+            result = fn(*fn_args)
+            times.append(time.perf_counter() - start_time)
+        return result, float(np.median(times))
+
+    print(f"\n{args.params} 组参数 x {len(prcp)} 天:")
+    (_, _, _, _, pr), prod_time = timed(production_store, params[:, 0], prcp, pet, 0.3 * params[:, 0])
+    uh_kernels(params[:, 3])
+    kernels, uh_time = timed(uh_kernels, params[:, 3])
+    print(f"  产流水库: {prod_time:.4f} 秒, 单位线纵坐标 (已缓存): {uh_time * 1000:.2f} 毫秒")
+
+    reference, lag_time = timed(route_lag_state, pr, kernels[1])
+    print(f"  UH2汇流 (n={kernels[1].shape[1]}), 逐时段滞时状态: {lag_time:.4f} 秒")
+    for method in ('direct', 'fft'):
+        routed, conv_time = timed(convolve_batched, pr, kernels[1], method)
+        print(f"  UH2汇流, {method:<6}: {conv_time:.4f} 秒 (加速比 {lag_time / conv_time:.1f}), "
+              f"最大差异 {np.max(np.abs(routed - reference)):.1e}")
+
+    output, total_time = timed(run_gr4j, params, prcp, pet)
+    print(f"  完整模型: {total_time:.4f} 秒 ({args.params / total_time:.1f} 组/秒)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import csv
+import json
+import resource
+import subprocess
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+from benchmark.harness import collect_environment
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+from benchmark.scipy_benchmark import PARAM_NAMES, DEFAULT_PARAMS
+
+# 两个框架共用的梯度计算方式名称 (分别见torch_benchmark.odeint与jax_benchmark_jit.GRADIENT_MODES)
+GRADIENT_MODES = ('direct', 'checkpoint', 'adjoint')
+FRAMEWORKS = ('jax', 'torch')
+
+def _peak_rss_bytes() -> int:
+    """进程的常驻内存峰值 (Linux下ru_maxrss单位为KB, macOS下为字节)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _current_rss_bytes() -> int:
+    """当前常驻内存 (读取/proc/self/statm), 不可用时退回到常驻内存峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return _peak_rss_bytes()
+
+def run_with_peak_rss(fn, interval: float = 1e-3):
+    """运行fn, 后台线程每interval秒采样一次常驻内存
+
+    返回 (fn的返回值, 调用期间常驻内存峰值相对调用前的增量). 与ru_maxrss的差值不同, 不受准备阶段
+    (样条构建, 模型构造) 已达到的峰值影响; 采样间隔内的短暂尖峰可能漏测.
+    """
+    baseline = peak = _current_rss_bytes()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(interval):
+            peak = max(peak, _current_rss_bytes())
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        result = fn()
+    finally:
+        done.set()
+        thread.join()
+    return result, max(peak, _current_rss_bytes()) - baseline
+
+def jax_gradient_case(mode: str, length: int, repeats: int) -> Dict[str, float]:
+    """JAX: 编译后的梯度函数的运行时间与XLA临时缓冲区大小
+
+    以float64运行: float32下diffrax的自适应步长使三种方式的梯度相差可达20%, float64下一致到1e-16.
+    """
+    import jax
+    jax.config.update('jax_enable_x64', True)
+    import jax.numpy as jnp
+    from benchmark.jax_benchmark_jit import ModelParams, ModelState, ModelInput, loss_function
+
+    inputs_dict, observed_flow = load_hydro_data(get_data_path(), data_length=length)
+    inputs = ModelInput(*(jnp.array(inputs_dict[name]) for name in ModelInput._fields))
+    observed_flow = jnp.array(observed_flow)
+    params = ModelParams(**dict(zip(PARAM_NAMES, DEFAULT_PARAMS.tolist())))
+    initial_state = ModelState(snowpack=0.0, soilwater=50.0)
+
+    grad_fn = jax.jit(jax.grad(loss_function), static_argnames='gradient_mode')
+    start_time = time.perf_counter()
+    compiled = grad_fn.lower(params, initial_state, inputs, observed_flow, gradient_mode=mode).compile()
+    compile_time = time.perf_counter() - start_time
+
+    # 峰值内存: 编译器给出的临时缓冲区 + 输出大小 (与编译本身占用的内存无关)
+    memory = compiled.memory_analysis()
+    peak_bytes = memory.temp_size_in_bytes + memory.output_size_in_bytes
+
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        gradients = jax.block_until_ready(compiled(params, initial_state, inputs, observed_flow))
+        times.append(time.perf_counter() - start_time)
+    return {'time': float(np.median(times)), 'compile_time': compile_time, 'peak_bytes': peak_bytes,
+            'grad_Smax': float(gradients.Smax), 'dtype': 'float64'}
+
+def torch_gradient_case(mode: str, length: int, repeats: int) -> Dict[str, float]:
+    """torch: 前向加反向的运行时间与峰值内存增量 (float32)"""
+    import torch
+    from benchmark.torch_benchmark import (
+        ModelParams, ModelState, HydroModel, build_forcing, compute_outputs, solve_model,
+        natural_cubic_spline_coeffs, NaturalCubicSpline,
+    )
+
+    inputs_dict, observed_flow = load_hydro_data(get_data_path(), data_length=length)
+    times = torch.arange(1, length + 1, dtype=torch.float32)
+    forcings = build_forcing(inputs_dict)
+    forcing_interp = NaturalCubicSpline(natural_cubic_spline_coeffs(times, forcings))
+    model = HydroModel(ModelParams(**dict(zip(PARAM_NAMES, DEFAULT_PARAMS.tolist()))), forcing_interp)
+    initial_state = ModelState(snowpack=0.0, soilwater=50.0)
+    observed = torch.tensor(observed_flow, dtype=torch.float32)
+
+    def gradient():
+        _, states = solve_model(model, initial_state, (1.0, float(length)), 1.0, gradient_mode=mode)
+        loss = torch.mean((compute_outputs(states, forcings, model.params).flow - observed) ** 2)
+        return torch.autograd.grad(loss, model.params)[0]
+
+    # 峰值内存: CUDA下为分配器峰值, CPU下为首次梯度计算期间采样得到的常驻内存峰值增量
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+        baseline = torch.cuda.memory_allocated()
+        gradients = gradient()
+        peak_bytes = torch.cuda.max_memory_allocated() - baseline
+    else:
+        gradients, peak_bytes = run_with_peak_rss(gradient)
+
+    run_times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        gradients = gradient()
+        run_times.append(time.perf_counter() - start_time)
+    return {'time': float(np.median(run_times)), 'compile_time': 0.0, 'peak_bytes': peak_bytes,
+            'grad_Smax': float(gradients[3]), 'dtype': 'float32'}
+
+CASES = {'jax': jax_gradient_case, 'torch': torch_gradient_case}
+
+def run_isolated(framework: str, mode: str, length: int, repeats: int) -> Dict[str, float]:
+    """在独立的子进程中运行一个用例, 保证峰值内存互不影响"""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', framework, mode,
+               '--length', str(length), '--repeats', str(repeats)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        message = completed.stderr.strip().splitlines()
+        return {'error': message[-1] if message else f"退出码 {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def save_rows(rows: List[Dict[str, object]], length: int, path: str) -> None:
+    """保存对比结果 (格式同harness.save_results): .json包含环境, 序列长度与全部用例, .csv每个用例一行 (失败的用例只有error列)"""
+    if path.endswith('.csv'):
+        fieldnames = list(dict.fromkeys(key for row in rows for key in ['length', *row]))
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows({'length': length, **row} for row in rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'environment': collect_environment(), 'length': length, 'results': rows}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='JAX与torch ODE求解的梯度计算方式对比')
+    parser.add_argument('--frameworks', nargs='+', default=list(FRAMEWORKS), choices=FRAMEWORKS)
+    parser.add_argument('--modes', nargs='+', default=list(GRADIENT_MODES), choices=GRADIENT_MODES)
+    parser.add_argument('--length', type=int, default=10000, help='序列长度 (天)')
+    parser.add_argument('--repeats', type=int, default=3, help='计时重复次数')
+    parser.add_argument('--output', nargs='+', default=[], help='结果文件 (.json 或 .csv)')
+    parser.add_argument('--worker', nargs=2, metavar=('FRAMEWORK', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        framework, mode = args.worker
+        print(json.dumps(CASES[framework](mode, args.length, args.repeats)))
+        return
+
+    print(f"梯度计算方式对比 ({args.length} 天, 每个用例在独立进程中运行):")
+    print(f"{'框架':<8}{'方式':<12}{'精度':<10}{'梯度时间(秒)':>14}{'编译时间(秒)':>14}{'峰值内存(MB)':>14}"
+          f"{'dL/dSmax':>14}{'与首个方式相对差':>18}")
+    rows: List[Dict[str, object]] = []
+    for framework in args.frameworks:
+        reference = None  # 同一框架中第一个成功的方式的梯度, 用于检查各方式是否给出同一个梯度
+        for mode in args.modes:
+            result = run_isolated(framework, mode, args.length, args.repeats)
+            rows.append({'framework': framework, 'mode': mode, **result})
+            if 'error' in result:
+                print(f"{framework:<8}{mode:<12}  失败: {result['error']}")
+                continue
+            if reference is None:
+                reference = result['grad_Smax']
+            agreement = abs(result['grad_Smax'] - reference) / max(abs(reference), np.finfo(float).tiny)
+            print(f"{framework:<8}{mode:<12}{result['dtype']:<10}{result['time']:>14.4f}{result['compile_time']:>14.2f}"
+                  f"{result['peak_bytes'] / 2 ** 20:>14.1f}{result['grad_Smax']:>14.3e}{agreement:>18.1e}")
+    print("峰值内存: JAX为XLA临时缓冲区与输出大小 (编译器给出), torch (CPU) 为梯度计算期间采样的常驻内存峰值增量")
+
+    for path in args.output:
+        save_rows(rows, args.length, path)
+        print(f"\n结果已保存: {path}")
+
+if __name__ == "__main__":
+    main()
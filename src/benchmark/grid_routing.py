@@ -0,0 +1,205 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from collections import deque
+from typing import List, Optional, Tuple, Union
+import numpy as np
+from scipy import sparse
+
+# D8流向编码 (ESRI/HydroModels约定) -> (行偏移, 列偏移), 行向下, 列向右; 其他值为出口
+D8_OFFSETS = {1: (0, 1), 2: (1, 1), 4: (1, 0), 8: (1, -1), 16: (0, -1), 32: (-1, -1), 64: (-1, 0), 128: (-1, 1)}
+ROUTING_SCHEMES = ('levels', 'explicit')
+
+def downstream_index(flwdir: np.ndarray, positions: Optional[np.ndarray] = None) -> np.ndarray:
+    """每个网格的下游网格编号, 出口或流出研究区的网格为-1
+
+    参数:
+        flwdir: (n_rows, n_cols) D8流向矩阵
+        positions: (N, 2) 参与计算的网格 (行, 列), 默认为flwdir中所有非零网格 (行优先顺序)
+    """
+    if positions is None:
+        positions = np.argwhere(flwdir != 0)
+    rows, cols = positions[:, 0], positions[:, 1]
+    index = np.full(flwdir.shape, -1, dtype=np.int64)
+    index[rows, cols] = np.arange(len(positions))
+
+    codes = flwdir[rows, cols]
+    d_row, d_col = np.zeros_like(rows), np.zeros_like(cols)
+    for code, (dr, dc) in D8_OFFSETS.items():
+        d_row[codes == code], d_col[codes == code] = dr, dc
+    valid = np.isin(codes, list(D8_OFFSETS))
+    target_row, target_col = rows + d_row, cols + d_col
+    valid &= (target_row >= 0) & (target_row < flwdir.shape[0]) & (target_col >= 0) & (target_col < flwdir.shape[1])
+
+    downstream = np.full(len(positions), -1, dtype=np.int64)
+    downstream[valid] = index[target_row[valid], target_col[valid]]
+    return downstream
+
+def upstream_matrix(downstream: np.ndarray) -> sparse.csr_matrix:
+    """上游汇集矩阵A: A[i, j] = 1 当且仅当j的下游为i, A @ q为每个网格的上游来水"""
+    n = len(downstream)
+    source = np.flatnonzero(downstream >= 0)
+    return sparse.csr_matrix((np.ones(len(source)), (downstream[source], source)), shape=(n, n))
+
+def topological_levels(downstream: np.ndarray) -> np.ndarray:
+    """拓扑层级: 源头网格为0, 其余网格为上游最大层级 + 1 (逐层批量推进的Kahn算法)"""
+    n = len(downstream)
+    has_down = downstream >= 0
+    remaining = np.bincount(downstream[has_down], minlength=n)
+    levels = np.full(n, -1, dtype=np.int64)
+    frontier = np.flatnonzero(remaining == 0)
+    level = 0
+    while len(frontier):
+        levels[frontier] = level
+        targets = downstream[frontier]
+        targets = targets[targets >= 0]
+        remaining -= np.bincount(targets, minlength=n)
+        frontier = np.unique(targets)
+        frontier = frontier[remaining[frontier] == 0]
+        level += 1
+    if (levels < 0).any():
+        raise ValueError(f"流向存在环, {int((levels < 0).sum())} 个网格无法排序")
+    return levels
+
+class GridRouter:
+    """网格河道汇流: 每个网格一个线性水库, 出流 q = S / (1 + lag) 汇入下游网格
+
+    网格按拓扑层级重排, 重排后的汇集矩阵为严格下三角, 同一层级为连续切片.
+    scheme:
+        'levels': 同一时段内由源头向出口逐层推进, 每层的上游来水为一次稀疏矩阵-向量乘 (该层的行块),
+                  层内网格批量更新
+        'explicit': 上游来水取上一时段的出流, 每个时段一次整体的稀疏矩阵-向量乘
+                    (与HydroModels中build_aggr_func的显式离散一致)
+    """
+
+    def __init__(self, downstream: np.ndarray, lag: Union[float, np.ndarray] = 1.0, scheme: str = 'levels'):
+        if scheme not in ROUTING_SCHEMES:
+            raise ValueError(f"未知的汇流格式: {scheme}, 可选: {ROUTING_SCHEMES}")
+        self.scheme = scheme
+        self.n_cells = len(downstream)
+        self.levels = topological_levels(downstream)
+        self.order = np.argsort(self.levels, kind='stable')  # 层级顺序 -> 原编号
+        self.rank = np.empty_like(self.order)                # 原编号 -> 层级顺序
+        self.rank[self.order] = np.arange(self.n_cells)
+
+        matrix = upstream_matrix(downstream)
+        self.matrix = matrix[self.order][:, self.order].tocsr()
+        self.bounds = np.searchsorted(self.levels[self.order], np.arange(self.levels.max() + 2))
+        # 每层的上游来水只来自更低的层级, 取行块的前start列
+        self.blocks: List[Tuple[int, int, sparse.csr_matrix]] = [
+            (start, end, self.matrix[start:end, :start].tocsr())
+            for start, end in zip(self.bounds[:-1], self.bounds[1:]) if start > 0
+        ]
+        self.n_head = int(self.bounds[1])
+
+        self.outflow_coef = (1.0 / (1.0 + np.broadcast_to(lag, self.n_cells)))[self.order]
+        self.storage = np.zeros(self.n_cells)
+        self.outflow = np.zeros(self.n_cells)
+
+    @property
+    def n_levels(self) -> int:
+        return len(self.bounds) - 1
+
+    def reset(self, storage: Optional[np.ndarray] = None) -> None:
+        """重置河道储水量 (原编号顺序), 默认为0"""
+        self.storage = np.zeros(self.n_cells) if storage is None else np.asarray(storage, dtype=np.float64)[self.order]
+        self.outflow = np.zeros(self.n_cells) if self.scheme == 'levels' else self.storage * self.outflow_coef
+
+    def step_level_order(self, runoff: np.ndarray) -> np.ndarray:
+        """推进一个时段, 输入与返回值均按层级顺序 (见order), 避免每步重排"""
+        storage, coef = self.storage, self.outflow_coef
+        if self.scheme == 'explicit':
+            storage += runoff + self.matrix @ self.outflow - self.outflow
+            self.outflow = storage * coef
+            return self.outflow
+
+        outflow = self.outflow
+        storage[:self.n_head] += runoff[:self.n_head]
+        np.multiply(storage[:self.n_head], coef[:self.n_head], out=outflow[:self.n_head])
+        storage[:self.n_head] -= outflow[:self.n_head]
+        for start, end, block in self.blocks:
+            level_storage = storage[start:end]
+            level_storage += runoff[start:end] + block @ outflow[:start]
+            np.multiply(level_storage, coef[start:end], out=outflow[start:end])
+            level_storage -= outflow[start:end]
+        return outflow
+
+    def step(self, runoff: np.ndarray) -> np.ndarray:
+        """推进一个时段, 输入与返回值均按原编号顺序"""
+        return self.step_level_order(runoff[self.order])[self.rank]
+
+    def run(self, runoff: np.ndarray) -> np.ndarray:
+        """逐时段汇流, runoff为 (T, N) 的产流, 返回 (T, N) 的出流"""
+        runoff_ordered = runoff[:, self.order]
+        outflow = np.empty_like(runoff_ordered)
+        for t in range(len(runoff_ordered)):
+            outflow[t] = self.step_level_order(runoff_ordered[t])
+        return outflow[:, self.rank]
+
+def synthetic_flwdir(n_rows: int, n_cols: int, seed: int = 42) -> np.ndarray:
+    """生成单出口 (右下角) 的D8流向矩阵: 从出口随机顺序广度优先搜索, 每个网格指向搜索树中的父网格"""
+    rng = np.random.default_rng(seed)
+    codes = {offset: code for code, offset in D8_OFFSETS.items()}
+    neighbours = list(codes)
+    flwdir = np.zeros((n_rows, n_cols), dtype=np.int64)
+    visited = np.zeros((n_rows, n_cols), dtype=bool)
+    outlet = (n_rows - 1, n_cols - 1)
+    visited[outlet] = True
+    flwdir[outlet] = -1  # 出口
+    queue = deque([outlet])
+    while queue:
+        row, col = queue.popleft()
+        for k in rng.permutation(len(neighbours)):
+            dr, dc = neighbours[k]
+            r, c = row - dr, col - dc  # (r, c) 沿 (dr, dc) 流向 (row, col)
+            if 0 <= r < n_rows and 0 <= c < n_cols and not visited[r, c]:
+                visited[r, c] = True
+                flwdir[r, c] = codes[(dr, dc)]
+                queue.append((r, c))
+    return flwdir
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cells', type=int, nargs='+', default=[10000, 100000], help='网格数 (取近似正方形网格)')
+    parser.add_argument('--days', type=int, default=14610, help='模拟天数')
+    parser.add_argument('--schemes', nargs='+', default=list(ROUTING_SCHEMES), choices=ROUTING_SCHEMES)
+    parser.add_argument('--lag', type=float, default=2.0, help='河道线性水库的滞时参数')
+    args = parser.parse_args()
+
+    # 产流: 各网格按固定比例缩放的公共日序列
+    rng = np.random.default_rng(0)
+    series = rng.gamma(0.5, 4.0, args.days)
+
+    print(f"{'网格数':>8}{'层级数':>8}{'格式':>10}{'预处理(秒)':>12}{'运行(秒)':>10}{'网格日/秒':>14}{'水量误差':>12}")
+    for n_cells in args.cells:
+        n_rows = int(np.sqrt(n_cells))
+        flwdir = synthetic_flwdir(n_rows, int(np.ceil(n_cells / n_rows)))
+        downstream = downstream_index(flwdir)
+        scale = rng.uniform(0.5, 1.5, len(downstream))
+        outlets = downstream < 0
+
+        for scheme in args.schemes:
+            start_time = time.perf_counter()
+            router = GridRouter(downstream, args.lag, scheme)
+            setup_time = time.perf_counter() - start_time
+
+            scale_ordered, outlets_ordered = scale[router.order], outlets[router.order]
+            total_outlet = 0.0
+            start_time = time.perf_counter()
+            for t in range(args.days):
+                outflow = router.step_level_order(series[t] * scale_ordered)
+                total_outlet += outflow[outlets_ordered].sum()
+            run_time = time.perf_counter() - start_time
+
+            # 水量平衡: 总产流 = 出口总出流 + 河道储水量 (显式格式的最后一个时段出流在下一时段才移出)
+            residual = series.sum() * scale.sum() - total_outlet - router.storage.sum()
+            if scheme == 'explicit':
+                residual += outflow[outlets_ordered].sum()
+            print(f"{len(downstream):>8}{router.n_levels:>8}{scheme:>10}{setup_time:>12.3f}{run_time:>10.2f}"
+                  f"{len(downstream) * args.days / run_time:>14.3e}{residual / (series.sum() * scale.sum()):>12.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from importlib import metadata
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 后端的setup函数: (输入字典, 观测流量, 参数组数) -> 无参数的运行函数
+SetupFunc = Callable[[Dict[str, np.ndarray], np.ndarray, int], Callable[[], object]]
+
+@dataclass
+class Backend:
+    """已注册的基准测试后端"""
+    name: str
+    setup: SetupFunc
+    description: str = ''
+    module: Optional[str] = None  # setup中导入的模块, 用于测量导入时间
+
+@dataclass
+class BenchmarkResult:
+    """单个 (后端, 序列长度, 参数组数) 组合的测试结果, 时间单位为纳秒"""
+    backend: str
+    length: int
+    batch_size: int
+    status: str = 'ok'
+    setup_ns: int = 0        # 数据准备与模型构建
+    cold_ns: int = 0         # 首次运行 (含JIT编译等一次性开销)
+    median_ns: float = 0.0   # 稳态运行中位数
+    q1_ns: float = 0.0
+    q3_ns: float = 0.0
+    iqr_ns: float = 0.0
+    min_ns: int = 0
+    repeats: int = 0
+    times_ns: List[int] = field(default_factory=list)
+
+BACKENDS: Dict[str, Backend] = {}
+
+def register_backend(name: str, description: str = '', module: Optional[str] = None) -> Callable[[SetupFunc], SetupFunc]:
+    """注册后端的装饰器"""
+    def decorator(setup: SetupFunc) -> SetupFunc:
+        BACKENDS[name] = Backend(name=name, setup=setup, description=description, module=module)
+        return setup
+    return decorator
+
+# benchmark包所在目录, 子进程通过PYTHONPATH导入
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_import_time(module: str) -> Optional[int]:
+    """在新的解释器中以 -X importtime 导入模块, 返回累计导入时间 (微秒), 导入失败时返回None"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        return None
+    # 每行格式为 "import time: self [us] | cumulative | imported package"
+    for line in completed.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1])
+    return None
+
+def import_time_report(backend_names: List[str]) -> Dict[str, Optional[int]]:
+    """测量并打印所选后端模块 (以及共用的数据加载模块) 的导入时间"""
+    modules = ['benchmark.utils.data_loader']
+    for name in backend_names:
+        module = BACKENDS[name].module
+        if module and module not in modules:
+            modules.append(module)
+
+    import_times = {}
+    print(f"{'module':<34}{'import(ms)':>12}")
+    for module in modules:
+        import_times[module] = measure_import_time(module)
+        value = import_times[module]
+        print(f"{module:<34}{'unavailable' if value is None else f'{value / 1e3:.1f}':>12}")
+    return import_times
+
+def collect_environment() -> Dict[str, object]:
+    """记录运行环境 (对应enviroment_node.md中的系统配置)"""
+    versions = {}
+    for package in ('numpy', 'scipy', 'pandas', 'numba', 'torch', 'torchdiffeq', 'jax', 'jaxlib', 'diffrax'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'hostname': socket.gethostname(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'packages': versions,
+    }
+
+def run_case(backend: Backend, inputs_dict: Dict[str, np.ndarray], observed_flow: np.ndarray,
+             batch_size: int, warmup: int, repeats: int) -> BenchmarkResult:
+    """测试单个组合: 首次运行单独计时, 预热后重复计时"""
+    result = BenchmarkResult(backend=backend.name, length=len(observed_flow), batch_size=batch_size)
+    try:
+        start = time.perf_counter_ns()
+        run = backend.setup(inputs_dict, observed_flow, batch_size)
+        result.setup_ns = time.perf_counter_ns() - start
+
+        start = time.perf_counter_ns()
+        run()
+        result.cold_ns = time.perf_counter_ns() - start
+
+        for _ in range(warmup):
+            run()
+
+        times_ns = []
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            run()
+            times_ns.append(time.perf_counter_ns() - start)
+    except ImportError as e:
+        result.status = f'unavailable: {e}'
+        return result
+    except Exception as e:
+        result.status = f'error: {type(e).__name__}: {e}'
+        return result
+
+    q1, median, q3 = np.percentile(times_ns, [25, 50, 75])
+    result.median_ns, result.q1_ns, result.q3_ns = float(median), float(q1), float(q3)
+    result.iqr_ns = float(q3 - q1)
+    result.min_ns = int(min(times_ns))
+    result.repeats = repeats
+    result.times_ns = times_ns
+    return result
+
+def run_sweep(backend_names: List[str], lengths: List[int], batch_sizes: List[int],
+              load_data: Callable[[int], Tuple[Dict[str, np.ndarray], np.ndarray]],
+              warmup: int = 2, repeats: int = 10) -> List[BenchmarkResult]:
+    """对所选后端扫描序列长度与参数组数"""
+    results = []
+    for length in lengths:
+        inputs_dict, observed_flow = load_data(length)
+        for name in backend_names:
+            for batch_size in batch_sizes:
+                result = run_case(BACKENDS[name], inputs_dict, observed_flow, batch_size, warmup, repeats)
+                print_result(result)
+                results.append(result)
+    return results
+
+def print_result(result: BenchmarkResult) -> None:
+    """打印单条结果"""
+    prefix = f"{result.backend:<16}{result.length:>8}{result.batch_size:>6}"
+    if result.status != 'ok':
+        print(f"{prefix}  {result.status}")
+        return
+    print(f"{prefix}{result.cold_ns / 1e6:>12.2f}{result.median_ns / 1e6:>12.3f}{result.iqr_ns / 1e6:>10.3f}")
+
+def print_header() -> None:
+    """打印结果表头 (时间单位为毫秒)"""
+    print(f"{'backend':<16}{'length':>8}{'batch':>6}{'cold(ms)':>12}{'median(ms)':>12}{'IQR(ms)':>10}")
+
+def save_results(results: List[BenchmarkResult], environment: Dict[str, object], path: str) -> None:
+    """保存结果: .json包含环境与全部重复计时, .csv为汇总表"""
+    if path.endswith('.csv'):
+        rows = [{k: v for k, v in asdict(r).items() if k != 'times_ns'} for r in results]
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'environment': environment, 'results': [asdict(r) for r in results]}, f, indent=2)
+
+def load_baseline(baseline_path: str) -> Tuple[Dict[str, object], Dict[Tuple[str, int, int], dict]]:
+    """读取save_results保存的基准结果 (.json)
+
+    返回:
+        环境信息与 (后端, 序列长度, 参数组数) 到成功结果的字典. 文件缺失或格式不符时抛出ValueError
+    """
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        environment = baseline.get('environment', {})
+        baseline_results = {(r['backend'], r['length'], r['batch_size']): r
+                            for r in baseline['results'] if r['status'] == 'ok'}
+    except (OSError, json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"无法读取基准结果 {baseline_path}: {e!r}") from e
+    return environment, baseline_results
+
+def compare_with_baseline(results: List[BenchmarkResult], baseline_path: str, threshold: float = 0.1) -> None:
+    """与保存的基准结果对比稳态中位数, 超过阈值的变化标记出来"""
+    environment, baseline_results = load_baseline(baseline_path)
+    print(f"\n与基准对比 ({baseline_path}, {environment.get('hostname')}, {environment.get('timestamp')}):")
+    print(f"{'backend':<16}{'length':>8}{'batch':>6}{'baseline(ms)':>14}{'current(ms)':>13}{'ratio':>8}")
+    for result in results:
+        reference: Optional[dict] = baseline_results.get((result.backend, result.length, result.batch_size))
+        if result.status != 'ok' or reference is None:
+            continue
+        ratio = result.median_ns / reference['median_ns']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  slower'
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f"{result.backend:<16}{result.length:>8}{result.batch_size:>6}"
+              f"{reference['median_ns'] / 1e6:>14.3f}{result.median_ns / 1e6:>13.3f}{ratio:>8.2f}{flag}")
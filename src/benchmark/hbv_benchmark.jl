@@ -0,0 +1,23 @@
+using CSV, DataFrames
+using DataInterpolations, ComponentArrays
+using HydroModels
+using BenchmarkTools
+
+include("../../models/HBV.jl")
+# load data (与hbv_benchmark.py相同的HBV-EDU样例输入)
+file_path = "data/hbv_edu/hbv_sample.csv"
+data = CSV.File(file_path);
+df = DataFrame(data);
+ts = collect(1:size(df, 1))
+input = (prcp=df[ts, "prec"], pet=df[ts, "pet"], temp=df[ts, "temp"])
+input_arr = stack(input[HydroModels.get_input_names(hbv_model)], dims=1)
+
+# 与hbv_benchmark.DEFAULT_PARAMS一致 (kp未在HBV.jl的通量中使用)
+pas = ComponentVector(params=ComponentVector(
+    TT=0.0, CFMAX=4.25, CFR=0.0, CWH=0.0,
+    LP=105.89 / 177.1, FC=177.1, BETA=2.35,
+    PPERC=0.05, UZL=4.87, k0=0.05, k1=0.03, k2=0.02, kp=0.0
+))
+initstates = ComponentVector(snowpack=0.0, meltwater=0.0, soilwater=100.0, suz=3.0, slz=10.0)
+config = (solver=HydroModels.DiscreteSolver(), interp=LinearInterpolation)
+@btime output = hbv_model(input_arr, pas, initstates=initstates, config=config)
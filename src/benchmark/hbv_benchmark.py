@@ -0,0 +1,242 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from typing import Dict, Tuple
+import numpy as np
+from numba import njit, prange
+from benchmark.utils.data_loader import load_dataset
+
+# 参数与状态的顺序 (与models/HBV.jl一致, HBV.jl中声明的kp未使用)
+PARAM_NAMES = ('TT', 'CFMAX', 'CFR', 'CWH', 'LP', 'FC', 'BETA', 'PPERC', 'UZL', 'k0', 'k1', 'k2')
+STATE_NAMES = ('snowpack', 'meltwater', 'soilwater', 'suz', 'slz')
+
+PARAM_BOUNDS = np.array([
+    [-2.5, 2.5],     # TT
+    [0.5, 10.0],     # CFMAX
+    [0.0, 0.1],      # CFR
+    [0.0, 0.2],      # CWH
+    [0.3, 1.0],      # LP
+    [50.0, 500.0],   # FC
+    [1.0, 6.0],      # BETA
+    [0.0, 0.2],      # PPERC
+    [0.0, 70.0],     # UZL
+    [0.05, 0.5],     # k0
+    [0.01, 0.3],     # k1
+    [0.001, 0.15],   # k2
+])
+
+# HBV-EDU样例 (data/hbv_edu/hbv_sample.csv) 的参数: 无融水滞留与再冻结, LP = PWP / FC
+DEFAULT_PARAMS = np.array([0.0, 4.25, 0.0, 0.0, 105.89 / 177.1, 177.1, 2.35, 0.05, 4.87, 0.05, 0.03, 0.02])
+INITIAL_STATES = np.array([0.0, 0.0, 100.0, 3.0, 10.0])
+
+def hbv_step(snowpack, meltwater, soilwater, suz, slz, prcp, temp, pet, p,
+             sequential: bool = False, sharp_split: bool = False, edu_output: bool = False):
+    """HBV一个时段的状态更新 (显式欧拉, 通量由时段初的状态计算)
+
+    标量 (numba) 与数组 (NumPy, 参数与状态按 (n_params, n_cells) 广播) 通用.
+
+    参数:
+        p: 按PARAM_NAMES顺序索引的参数
+        sequential: 融水在同一时段内下渗 (融雪后立即计算infil, 与HBV-EDU一致);
+                    默认infil由时段初的meltwater计算 (HydroModels的DiscreteSolver),
+                    此时infil限制为refreeze之后剩余的融水, 以免融水为负而发散
+        sharp_split: 以TT为界划分雨雪 (HBV-EDU), 默认使用step_func平滑
+        edu_output: 按HBV-EDU输出径流 (q0由时段初, q1, q2由时段末的水库计算), 默认均由时段初的状态计算
+
+    返回:
+        时段末的5个状态与时段径流q
+    """
+    TT, CFMAX, CFR, CWH, LP, FC, BETA, PPERC, UZL, k0, k1, k2 = (
+        p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], p[8], p[9], p[10], p[11])
+
+    # 雨雪划分 (平滑时与HydroModels.step_func相同)
+    snow_frac = (TT - temp > 0.0) * 1.0 if sharp_split else (np.tanh(5.0 * (TT - temp)) + 1.0) * 0.5
+    snowfall = snow_frac * prcp
+    rainfall = prcp - snowfall
+
+    # 积雪
+    melt = np.minimum(snowpack, np.maximum(0.0, temp - TT) * CFMAX)
+    refreeze = np.minimum(np.maximum(TT - temp, 0.0) * CFR * CFMAX, meltwater)
+    new_snowpack = snowpack + snowfall + refreeze - melt
+    if sequential:
+        meltwater = meltwater + melt - refreeze
+        infil = np.maximum(0.0, meltwater - new_snowpack * CWH)
+        new_meltwater = meltwater - infil
+    else:
+        # HBV.jl的infil不受refreeze限制, 两者之和可超过时段初的融水, 使融水为负并振荡发散;
+        # 此处infil至多取refreeze之后剩余的融水 (refreeze = 0时与HBV.jl相同)
+        infil = np.minimum(np.maximum(0.0, meltwater - snowpack * CWH), meltwater - refreeze)
+        new_meltwater = meltwater + melt - refreeze - infil
+
+    # 土壤
+    inflow = rainfall + infil
+    recharge = inflow * np.minimum(np.maximum(soilwater / FC, 0.0) ** BETA, 1.0)
+    excess = np.maximum(soilwater - FC, 0.0)
+    evap = np.minimum(np.maximum(soilwater / (LP * FC), 0.0), 1.0) * pet
+    new_soilwater = soilwater + inflow - (recharge + excess + evap)
+
+    # 响应
+    perc = suz * PPERC
+    q0 = np.maximum(0.0, suz - UZL) * k0
+    q1 = suz * k1
+    q2 = slz * k2
+    new_suz = suz + recharge + excess - (perc + q0 + q1)
+    new_slz = slz + perc - q2
+    if edu_output:
+        q1, q2 = new_suz * k1, new_slz * k2
+    return new_snowpack, new_meltwater, new_soilwater, new_suz, new_slz, q0 + q1 + q2
+
+hbv_step_nb = njit(cache=True)(hbv_step)
+
+@njit(cache=True)
+def run_single(params: np.ndarray, prcp: np.ndarray, temp: np.ndarray, pet: np.ndarray,
+               initial_states: np.ndarray, sequential: bool, sharp_split: bool, edu_output: bool,
+               record_states: bool, q: np.ndarray, states: np.ndarray, final_states: np.ndarray) -> None:
+    """单组参数, 单个网格的求解, 结果写入q, states (record_states时) 与final_states"""
+    snowpack, meltwater, soilwater, suz, slz = (
+        initial_states[0], initial_states[1], initial_states[2], initial_states[3], initial_states[4])
+    for t in range(q.shape[0]):
+        snowpack, meltwater, soilwater, suz, slz, q[t] = hbv_step_nb(
+            snowpack, meltwater, soilwater, suz, slz, prcp[t], temp[t], pet[t], params, sequential, sharp_split,
+            edu_output)
+        if record_states:
+            states[0, t], states[1, t], states[2, t], states[3, t], states[4, t] = (
+                snowpack, meltwater, soilwater, suz, slz)
+    final_states[0], final_states[1], final_states[2], final_states[3], final_states[4] = (
+        snowpack, meltwater, soilwater, suz, slz)
+
+@njit(parallel=True, cache=True)
+def hbv_kernel(params: np.ndarray, prcp: np.ndarray, temp: np.ndarray, pet: np.ndarray,
+               initial_states: np.ndarray, sequential: bool = False, sharp_split: bool = False,
+               edu_output: bool = False, record_states: bool = False):
+    """批量参数 x 网格的HBV求解, 在 (参数, 网格) 组合上并行
+
+    参数:
+        params: (n_params, 12) 参数矩阵, 列顺序见PARAM_NAMES
+        prcp, temp, pet: (n_cells, T) 各网格的日尺度输入
+        initial_states: (5,) 初始状态, 顺序见STATE_NAMES
+        sequential, sharp_split, edu_output: 见hbv_step
+        record_states: 是否记录各时段末的状态 (否则返回的states时间维长度为0)
+
+    返回:
+        q: (n_params, n_cells, T) 径流
+        states: (5, n_params, n_cells, T) 时段末的状态
+        final_states: (5, n_params, n_cells) 最终状态
+    """
+    n_params, (n_cells, n_steps) = params.shape[0], prcp.shape
+    q = np.empty((n_params, n_cells, n_steps))
+    states = np.empty((5, n_params, n_cells, n_steps if record_states else 0))
+    final_states = np.empty((5, n_params, n_cells))
+    for k in prange(n_params * n_cells):
+        j, c = k // n_cells, k % n_cells
+        run_single(params[j], prcp[c], temp[c], pet[c], initial_states, sequential, sharp_split, edu_output,
+                   record_states, q[j, c], states[:, j, c], final_states[:, j, c])
+    return q, states, final_states
+
+def run_numpy(params: np.ndarray, prcp: np.ndarray, temp: np.ndarray, pet: np.ndarray,
+              initial_states: np.ndarray = INITIAL_STATES, sequential: bool = False,
+              sharp_split: bool = False, edu_output: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """NumPy向量化求解: 时间上逐步循环, 每步对 (n_params, n_cells) 的状态数组整体更新
+
+    参数与返回值的形状同hbv_kernel (不记录中间状态).
+    """
+    n_params, (n_cells, n_steps) = params.shape[0], prcp.shape
+    p = np.ascontiguousarray(params.T)[:, :, None]  # (12, n_params, 1), 与网格维广播
+    prcp_t, temp_t, pet_t = (np.ascontiguousarray(x.T) for x in (prcp, temp, pet))  # (T, n_cells)
+    states = tuple(np.full((n_params, n_cells), value) for value in initial_states)
+    q = np.empty((n_steps, n_params, n_cells))
+    for t in range(n_steps):
+        *states, q[t] = hbv_step(*states, prcp_t[t], temp_t[t], pet_t[t], p, sequential, sharp_split,
+                                edu_output)
+    return np.ascontiguousarray(q.transpose(1, 2, 0)), np.stack(states)
+
+def validate_against_edu(time_length: int = -1) -> Dict[str, float]:
+    """与HBV-EDU样例输出对比, 返回各变量的最大绝对误差
+
+    样例第一行为初始状态, 之后每行为该日输入作用后的状态. qsim与引擎按HBV-EDU方式输出的q (edu_output) 对比.
+    """
+    data = load_dataset('hbv_edu', ['prcp', 'temp', 'pet', 'qsim', 'snow', 'soil', 's1', 's2'],
+                        data_length=time_length)
+    prcp, temp, pet = (np.ascontiguousarray(data[name][None, 1:]) for name in ('prcp', 'temp', 'pet'))
+    initial_states = np.array([data['snow'][0], 0.0, data['soil'][0], data['s1'][0], data['s2'][0]])
+
+    q, states, _ = hbv_kernel(DEFAULT_PARAMS[None], prcp, temp, pet, initial_states,
+                              sequential=True, sharp_split=True, edu_output=True, record_states=True)
+    snowpack, _, soilwater, suz, slz = states[:, 0, 0]
+
+    # NumPy实现与numba实现在舍入误差内一致
+    q_numpy, _ = run_numpy(DEFAULT_PARAMS[None], prcp, temp, pet, initial_states, sequential=True,
+                           sharp_split=True, edu_output=True)
+
+    return {
+        'qsim': float(np.max(np.abs(q[0, 0] - data['qsim'][1:]))),
+        'snow': float(np.max(np.abs(snowpack - data['snow'][1:]))),
+        'soil': float(np.max(np.abs(soilwater - data['soil'][1:]))),
+        's1': float(np.max(np.abs(suz - data['s1'][1:]))),
+        's2': float(np.max(np.abs(slz - data['s2'][1:]))),
+        'numpy': float(np.max(np.abs(q_numpy - q))),
+    }
+
+def load_cells(n_cells: int, time_length: int = -1, seed: int = 42) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """由样例输入扰动得到 (n_cells, T) 的网格输入, 第一个网格为原始输入"""
+    data = load_dataset('hbv_edu', ['prcp', 'temp', 'pet'], data_length=time_length)
+    rng = np.random.default_rng(seed)
+    scale = rng.uniform(0.8, 1.2, (n_cells, 1))
+    shift = rng.uniform(-1.0, 1.0, (n_cells, 1))
+    scale[0], shift[0] = 1.0, 0.0
+    prcp = np.ascontiguousarray(data['prcp'] * scale)
+    temp = np.ascontiguousarray(data['temp'] + shift)
+    pet = np.ascontiguousarray(np.broadcast_to(data['pet'], prcp.shape))
+    return prcp, temp, pet
+
+def sample_params(n_params: int, seed: int = 42) -> np.ndarray:
+    """在参数范围内均匀采样 (n_params, 12) 参数矩阵, 第一组为DEFAULT_PARAMS"""
+    rng = np.random.default_rng(seed)
+    low, high = PARAM_BOUNDS[:, 0], PARAM_BOUNDS[:, 1]
+    params = low + (high - low) * rng.random((n_params, len(PARAM_NAMES)))
+    params[0] = DEFAULT_PARAMS
+    return params
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=-1, help='序列长度 (天), 默认全部')
+    parser.add_argument('--params', type=int, default=100, help='参数组数')
+    parser.add_argument('--cells', type=int, default=100, help='网格数')
+    parser.add_argument('--repeats', type=int, default=5, help='单组参数计时的重复次数')
+    args = parser.parse_args()
+
+    errors = validate_against_edu(args.length)
+    print("与HBV-EDU样例的最大绝对误差:", {name: f"{value:.2e}" for name, value in errors.items()})
+
+    prcp, temp, pet = load_cells(args.cells, args.length)
+    params = sample_params(args.params)
+    n_steps = prcp.shape[1]
+
+    # 单组参数单个网格 (与hbv_benchmark.jl的@btime对应: HydroModels DiscreteSolver, 平滑雨雪划分)
+    times = []
+    for _ in range(args.repeats + 1):
+        start_time = time.perf_counter()
+        hbv_kernel(params[:1], prcp[:1], temp[:1], pet[:1], INITIAL_STATES)
+        times.append(time.perf_counter() - start_time)
+    print(f"编译时间: {times[0]:.4f} 秒")
+    print(f"单组参数 x {n_steps} 天, 运行时间: {np.median(times[1:]) * 1e6:.1f} 微秒")
+
+    # 批量运行与单组参数相同, 使用默认 (HBV.jl) 的格式
+    n_runs = args.params * args.cells
+    start_time = time.perf_counter()
+    q, _, _ = hbv_kernel(params, prcp, temp, pet, INITIAL_STATES)
+    run_time = time.perf_counter() - start_time
+    print(f"numba: {args.params} 组参数 x {args.cells} 个网格 x {n_steps} 天, 运行时间: {run_time:.4f} 秒 "
+          f"({n_runs * n_steps / run_time / 1e6:.1f} 百万网格日/秒), 最大径流: {np.max(q):.2f}")
+
+    start_time = time.perf_counter()
+    q_numpy, _ = run_numpy(params, prcp, temp, pet)
+    run_time = time.perf_counter() - start_time
+    print(f"NumPy: 运行时间: {run_time:.4f} 秒 ({n_runs * n_steps / run_time / 1e6:.1f} 百万网格日/秒), "
+          f"与numba的最大差异: {np.max(np.abs(q_numpy - q)):.2e}")
+
+if __name__ == "__main__":
+    main()
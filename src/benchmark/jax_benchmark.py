@@ -11,7 +11,7 @@ import time
 from typing import NamedTuple, Tuple
 import numpy as np
 from benchmark.utils.data_loader import load_hydro_data, get_data_path
-from interpax import interp1d
+from benchmark.utils.jax_interpolate import CubicInterpolant, build_interpolant, evaluate
 
 # 定义模型参数
 class ModelParams(NamedTuple):
@@ -49,14 +49,16 @@ def calculate_pet(temp: float, lday: float) -> float:
     """计算潜在蒸散发"""
     return 29.8 * lday * 24 * 0.611 * jnp.exp((17.3 * temp) / (temp + 237.3)) / (temp + 273.2)
 
-def model_derivatives(t: float, state: ModelState, args: Tuple[ModelParams, jnp.ndarray, jnp.ndarray, jnp.ndarray]) -> ModelState:
+def build_forcing(inputs: ModelInput) -> CubicInterpolant:
+    """预计算输入的插值系数 (节点为t = 1, 2, ..., len)"""
+    return build_interpolant(jnp.stack([inputs.temp, inputs.lday, inputs.prcp], axis=-1))
+
+def model_derivatives(t: float, state: ModelState, args: Tuple[ModelParams, CubicInterpolant]) -> ModelState:
     """模型导数函数"""
-    params, temp_data, lday_data, prcp_data = args
+    params, forcing = args
     
-    # 获取当前时间步的插值输入
-    temp = interp1d(t, jnp.arange(1, len(temp_data) + 1), temp_data, method="cubic")
-    lday = interp1d(t, jnp.arange(1, len(lday_data) + 1), lday_data, method="cubic")
-    prcp = interp1d(t, jnp.arange(1, len(prcp_data) + 1), prcp_data, method="cubic")
+    # 获取当前时间步的插值输入 (三个输入共用一次索引)
+    temp, lday, prcp = evaluate(forcing, t)
     
     # 计算降雪和降雨
     snowfall = step_func(params.Tmin - temp) * prcp
@@ -111,7 +113,7 @@ def solve_model(params: ModelParams, initial_state: ModelState,
         t1=t_span[1],
         dt0=dt,
         y0=initial_state,
-        args=(params, inputs.temp, inputs.lday, inputs.prcp),
+        args=(params, build_forcing(inputs)),
         saveat=SaveAt(ts=jnp.arange(t_span[0], t_span[1] + dt, dt)),
         stepsize_controller=controller,
         max_steps=10000  # 增加最大步数
@@ -131,11 +133,9 @@ def loss_function(params: ModelParams, initial_state: ModelState,
     def compute_flow(t_idx):
         snowpack_state = states.snowpack[t_idx]
         soilwater_state = states.soilwater[t_idx]
-        t = t_idx + 1.0  # 转换为实际时间
-        
-        # 获取当前时间步的插值输入
-        temp = interp1d(t, jnp.arange(1, len(inputs.temp) + 1), inputs.temp, method="cubic")
-        lday = interp1d(t, jnp.arange(1, len(inputs.lday) + 1), inputs.lday, method="cubic")
+        # 输出时刻与插值节点重合, 插值结果即为原始输入
+        temp = inputs.temp[t_idx]
+        lday = inputs.lday[t_idx]
         
         # 计算蒸发
         evap = step_func(soilwater_state) * calculate_pet(temp, lday) * \
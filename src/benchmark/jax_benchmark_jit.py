@@ -2,16 +2,29 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# equinox的运行时检查默认通过主机回调报错, 含主机回调的程序不能写入持久化编译缓存.
+# 仅在作为脚本运行且使用缓存时 (含--compile-only子进程) 改为出错时返回NaN, 例如达到max_steps时损失与梯度为NaN
+# 而不报错; 作为库导入时保持equinox的默认行为. equinox在导入时读取该变量, 须在导入diffrax之前设置.
+if __name__ == '__main__' and '--no-cache' not in sys.argv:
+    os.environ.setdefault('EQX_ON_ERROR', 'nan')
+
 import jax
 import jax.numpy as jnp
-from jax import grad, jit, vmap
+from jax import grad, jit, lax, vmap
 import diffrax
 from diffrax import diffeqsolve, ODETerm, Tsit5, SaveAt, PIDController
+import argparse
+import json
+import subprocess
+import tempfile
 import time
-from typing import NamedTuple, Tuple
+from dataclasses import asdict
+from functools import partial
+from typing import NamedTuple, Tuple, Sequence
 import numpy as np
 from benchmark.utils.data_loader import load_hydro_data, get_data_path
-from interpax import interp1d
+from benchmark.utils.jax_interpolate import CubicInterpolant, build_interpolant, evaluate
+from benchmark.utils.jax_cache import AOTFunction, enable_compilation_cache
 
 # 定义模型参数
 class ModelParams(NamedTuple):
@@ -49,16 +62,13 @@ def calculate_pet(temp: float, lday: float) -> float:
     """计算潜在蒸散发"""
     return 29.8 * lday * 24 * 0.611 * jnp.exp((17.3 * temp) / (temp + 237.3)) / (temp + 273.2)
 
-@jit
-def model_derivatives(t: float, state: ModelState, args: Tuple[ModelParams, jnp.ndarray, jnp.ndarray, jnp.ndarray]) -> ModelState:
-    """模型导数函数"""
-    params, temp_data, lday_data, prcp_data = args
-    
-    # 获取当前时间步的插值输入
-    temp = interp1d(t, jnp.arange(1, len(temp_data) + 1), temp_data, method="cubic")
-    lday = interp1d(t, jnp.arange(1, len(lday_data) + 1), lday_data, method="cubic")
-    prcp = interp1d(t, jnp.arange(1, len(prcp_data) + 1), prcp_data, method="cubic")
-    
+def build_forcing(inputs: ModelInput) -> CubicInterpolant:
+    """预计算输入的插值系数 (节点为t = 1, 2, ..., len)"""
+    return build_interpolant(jnp.stack([inputs.temp, inputs.lday, inputs.prcp], axis=-1))
+
+def exphydro_derivatives(state: ModelState, params: ModelParams,
+                         temp: float, lday: float, prcp: float) -> ModelState:
+    """给定输入时的状态导数 (连续与离散时间求解共用的物理过程)"""
     # 计算降雪和降雨
     snowfall = step_func(params.Tmin - temp) * prcp
     rainfall = step_func(temp - params.Tmin) * prcp
@@ -89,6 +99,54 @@ def model_derivatives(t: float, state: ModelState, args: Tuple[ModelParams, jnp.
     
     return ModelState(snowpack=dsnowpack, soilwater=dsoilwater)
 
+@jit
+def model_derivatives(t: float, state: ModelState, args: Tuple[ModelParams, CubicInterpolant]) -> ModelState:
+    """模型导数函数"""
+    params, forcing = args
+    
+    # 获取当前时间步的插值输入 (三个输入共用一次索引)
+    temp, lday, prcp = evaluate(forcing, t)
+    return exphydro_derivatives(state, params, temp, lday, prcp)
+
+# 离散时间求解方法
+DISCRETE_METHODS = ('euler', 'rk4')
+
+@partial(jit, static_argnames='method')
+def solve_model_discrete(params: ModelParams, initial_state: ModelState, inputs: ModelInput,
+                         dt: float = 1.0, method: str = 'euler') -> ModelState:
+    """lax.scan离散时间求解 (显式欧拉或定步长RK4, 每个时间步内输入保持不变, 直接按索引读取)
+
+    与scipy_benchmark.solve_model_discrete及HydroModels的DiscreteSolver对应.
+    可jit, vmap与求导.
+
+    返回:
+        ModelState, 各字段为 (T,) 状态序列, 第0个元素为初始状态
+    """
+    if method not in DISCRETE_METHODS:
+        raise ValueError(f"未知的离散求解方法: {method}, 可选: {DISCRETE_METHODS}")
+
+    def rates(state, forcing):
+        return exphydro_derivatives(state, params, *forcing)
+
+    def shift(state, rate, scale):
+        return ModelState(*(s + scale * r for s, r in zip(state, rate)))
+
+    def step(state, forcing):
+        if method == 'euler':
+            rate = rates(state, forcing)
+        else:
+            k1 = rates(state, forcing)
+            k2 = rates(shift(state, k1, 0.5 * dt), forcing)
+            k3 = rates(shift(state, k2, 0.5 * dt), forcing)
+            k4 = rates(shift(state, k3, dt), forcing)
+            rate = ModelState(*((a + 2.0 * b + 2.0 * c + d) / 6.0 for a, b, c, d in zip(k1, k2, k3, k4)))
+        state = shift(state, rate, dt)
+        return state, state
+
+    state0 = ModelState(*(jnp.asarray(s, dtype=inputs.temp.dtype) for s in initial_state))
+    _, states = lax.scan(step, state0, (inputs.temp[:-1], inputs.lday[:-1], inputs.prcp[:-1]))
+    return ModelState(*(jnp.concatenate([s0[None], s]) for s0, s in zip(state0, states)))
+
 def solve_model(params: ModelParams, initial_state: ModelState, 
                 inputs: ModelInput, t_span: Tuple[float, float], 
                 dt: float) -> Tuple[jnp.ndarray, jnp.ndarray]:
@@ -115,7 +173,7 @@ def solve_model(params: ModelParams, initial_state: ModelState,
         t1=t_span[1],
         dt0=dt,
         y0=initial_state,
-        args=(params, inputs.temp, inputs.lday, inputs.prcp),
+        args=(params, build_forcing(inputs)),
         saveat=SaveAt(ts=ts),
         stepsize_controller=controller,
         max_steps=10000  # 增加最大步数
@@ -123,11 +181,19 @@ def solve_model(params: ModelParams, initial_state: ModelState,
     
     return solution.ts, solution.ys
 
-@jit
+# 梯度计算方式与diffrax伴随方法的对应
+GRADIENT_MODES = {
+    'direct': diffrax.DirectAdjoint,                  # 直接对求解循环反向传播
+    'checkpoint': diffrax.RecursiveCheckpointAdjoint, # 递归检查点 (diffrax默认)
+    'adjoint': diffrax.BacksolveAdjoint,              # 连续伴随, 反向求解增广系统
+}
+
+@partial(jit, static_argnames='gradient_mode')
 def solve_model_jit(params: ModelParams, initial_state: ModelState, 
                    inputs: ModelInput, ts: jnp.ndarray, 
-                   t0: float, t1: float, dt: float) -> Tuple[jnp.ndarray, jnp.ndarray]:
-    """JIT编译的求解模型函数"""
+                   t0: float, t1: float, dt: float,
+                   gradient_mode: str = 'checkpoint') -> Tuple[jnp.ndarray, jnp.ndarray]:
+    """JIT编译的求解模型函数 (gradient_mode见GRADIENT_MODES)"""
     # 创建ODE项
     term = ODETerm(model_derivatives)
     
@@ -147,10 +213,11 @@ def solve_model_jit(params: ModelParams, initial_state: ModelState,
         t1=t1,
         dt0=dt,
         y0=initial_state,
-        args=(params, inputs.temp, inputs.lday, inputs.prcp),
+        args=(params, build_forcing(inputs)),
         saveat=SaveAt(ts=ts),
         stepsize_controller=controller,
-        max_steps=10000
+        max_steps=10000,
+        adjoint=GRADIENT_MODES[gradient_mode](),
     )
     
     return solution.ts, solution.ys
@@ -161,11 +228,9 @@ def compute_flow(t_idx: int, states: ModelState, params: ModelParams,
     """计算单个时间步的流量"""
     snowpack_state = states.snowpack[t_idx]
     soilwater_state = states.soilwater[t_idx]
-    t = t_idx + 1.0  # 转换为实际时间
-    
-    # 获取当前时间步的插值输入
-    temp = interp1d(t, jnp.arange(1, len(inputs.temp) + 1), inputs.temp, method="cubic")
-    lday = interp1d(t, jnp.arange(1, len(inputs.lday) + 1), inputs.lday, method="cubic")
+    # 输出时刻与插值节点重合, 插值结果即为原始输入
+    temp = inputs.temp[t_idx]
+    lday = inputs.lday[t_idx]
     
     # 计算蒸发
     evap = step_func(soilwater_state) * calculate_pet(temp, lday) * \
@@ -181,15 +246,16 @@ def compute_flow(t_idx: int, states: ModelState, params: ModelParams,
     # 计算总流量
     return baseflow + surfaceflow
 
-@jit
+@partial(jit, static_argnames='gradient_mode')
 def loss_function(params: ModelParams, initial_state: ModelState, 
-                 inputs: ModelInput, observed_flow: jnp.ndarray) -> float:
+                 inputs: ModelInput, observed_flow: jnp.ndarray,
+                 gradient_mode: str = 'checkpoint') -> float:
     """损失函数"""
     # 求解模型
     t_span = (1.0, float(len(inputs.temp)))
     dt = 1.0
     ts = jnp.arange(t_span[0], t_span[1] + dt, dt)
-    _, states = solve_model_jit(params, initial_state, inputs, ts, t_span[0], t_span[1], dt)
+    _, states = solve_model_jit(params, initial_state, inputs, ts, t_span[0], t_span[1], dt, gradient_mode)
     
     # 使用vmap进行向量化计算
     predicted_flow = jax.vmap(lambda t_idx: compute_flow(t_idx, states, params, inputs))(
@@ -197,13 +263,113 @@ def loss_function(params: ModelParams, initial_state: ModelState,
     )
     return jnp.mean((predicted_flow - observed_flow) ** 2)
 
+@partial(jit, static_argnames='method')
+def discrete_loss_function(params: ModelParams, initial_state: ModelState,
+                           inputs: ModelInput, observed_flow: jnp.ndarray, method: str = 'euler') -> float:
+    """离散时间求解的损失函数"""
+    states = solve_model_discrete(params, initial_state, inputs, 1.0, method)
+    predicted_flow = jax.vmap(lambda t_idx: compute_flow(t_idx, states, params, inputs))(
+        jnp.arange(len(states.snowpack))
+    )
+    return jnp.mean((predicted_flow - observed_flow) ** 2)
+
+def masked_loss_function(params: ModelParams, initial_state: ModelState,
+                         inputs: ModelInput, observed_flow: jnp.ndarray,
+                         mask: jnp.ndarray) -> float:
+    """带掩码的损失函数 (填充的时间步不参与计算)"""
+    t_span = (1.0, float(len(inputs.temp)))
+    dt = 1.0
+    ts = jnp.arange(t_span[0], t_span[1] + dt, dt)
+    _, states = solve_model_jit(params, initial_state, inputs, ts, t_span[0], t_span[1], dt)
+
+    predicted_flow = jax.vmap(lambda t_idx: compute_flow(t_idx, states, params, inputs))(
+        jnp.arange(len(states.snowpack))
+    )
+    # 使用where而不是乘法, 避免观测中的NaN污染梯度
+    sq_err = jnp.where(mask, (predicted_flow - observed_flow) ** 2, 0.0)
+    return jnp.sum(sq_err) / jnp.maximum(jnp.sum(mask), 1)
+
+# 多参数: params各字段的首维为参数组
+ensemble_loss_function = jit(vmap(masked_loss_function, in_axes=(0, None, None, None, None)))
+
+# 多参数 x 多流域: 返回 (n_basins, n_params) 损失矩阵
+batched_loss_function = jit(vmap(
+    vmap(masked_loss_function, in_axes=(0, None, None, None, None)),
+    in_axes=(None, None, 0, 0, 0)
+))
+
+def stack_params(params_list: Sequence[ModelParams]) -> ModelParams:
+    """将多组参数堆叠为首维为参数组的ModelParams"""
+    return ModelParams(*(jnp.array(values) for values in zip(*params_list)))
+
+def pad_basins(inputs_list: Sequence[ModelInput], observed_list: Sequence[np.ndarray],
+               length: int = None) -> Tuple[ModelInput, jnp.ndarray, jnp.ndarray]:
+    """将不同长度的流域数据填充到统一长度
+
+    输入按最后一个值填充 (保证插值在填充段平稳), 观测流量填充0, 并返回有效时间步掩码.
+    length固定时不同批次可共用同一个编译结果.
+
+    返回:
+        (n_basins, length) 的输入, 观测流量和掩码
+    """
+    if length is None:
+        length = max(len(obs) for obs in observed_list)
+
+    def pad(x, mode):
+        x = np.asarray(x, dtype=np.float64)[:length]
+        if mode == 'edge':
+            return np.pad(x, (0, length - len(x)), mode='edge')
+        return np.pad(x, (0, length - len(x)))
+
+    inputs = ModelInput(*(
+        jnp.array(np.stack([pad(getattr(inp, name), 'edge') for inp in inputs_list]))
+        for name in ModelInput._fields
+    ))
+    observed_flow = jnp.array(np.stack([pad(obs, 'constant') for obs in observed_list]))
+    mask = jnp.array(np.stack([np.arange(length) < len(obs) for obs in observed_list]))
+    return inputs, observed_flow, mask
+
+def compile_report(length: int) -> None:
+    """在两个独立进程中依次编译 (共用一个新的临时缓存目录), 分别得到冷启动与热启动的编译时间"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        runs = {}
+        for label in ('冷启动', '热启动'):
+            command = [sys.executable, os.path.abspath(__file__), '--compile-only',
+                       '--length', str(length), '--cache-dir', cache_dir]
+            start_time = time.perf_counter()
+            completed = subprocess.run(command, capture_output=True, text=True, check=True)
+            process_time = time.perf_counter() - start_time
+            runs[label] = (json.loads(completed.stdout.strip().splitlines()[-1]), process_time)
+
+    print(f"编译时间 ({length} 天):")
+    print(f"{'':<8}{'函数':<24}{'降级(秒)':>10}{'编译(秒)':>10}{'缓存命中':>10}")
+    for label, (stats, process_time) in runs.items():
+        for name, entry in stats.items():
+            print(f"{label:<8}{name:<24}{entry['lower_time']:>10.2f}{entry['compile_time']:>10.2f}"
+                  f"{str(entry['cache_hit']):>10}")
+        print(f"{label:<8}{'进程总时间':<24}{process_time:>10.2f}")
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=10000, help='序列长度 (天)')
+    parser.add_argument('--cache-dir', default=None, help='持久化编译缓存目录 (默认data/.cache/jax)')
+    parser.add_argument('--no-cache', action='store_true', help='不使用持久化编译缓存')
+    parser.add_argument('--compile-only', action='store_true', help='只编译并输出编译时间 (JSON)')
+    parser.add_argument('--compile-report', action='store_true', help='对比冷启动与热启动的编译时间')
+    args = parser.parse_args()
+
+    if args.compile_report:
+        compile_report(args.length)
+        return
+    if not args.no_cache:
+        enable_compilation_cache(args.cache_dir)
+
     # 设置随机种子
     np.random.seed(42)
     
     # 加载数据
     data_path = get_data_path()
-    inputs_dict, observed_flow = load_hydro_data(data_path, data_length=10000)
+    inputs_dict, observed_flow = load_hydro_data(data_path, data_length=args.length)
     
     # 模型参数
     params = ModelParams(
@@ -224,9 +390,18 @@ def main():
     # 转换观测流量为JAX数组
     observed_flow = jnp.array(observed_flow)
     
-    # 预热JIT编译
-    print("预热JIT编译...")
-    _ = loss_function(params, initial_state, inputs, observed_flow)
+    # 按输入形状预先编译损失与梯度 (持久化缓存中已有时直接读取)
+    loss_exec = AOTFunction(loss_function)
+    grad_exec = AOTFunction(jit(grad(loss_function)), name='grad(loss_function)')
+    for fn in (loss_exec, grad_exec):
+        fn.compile(params, initial_state, inputs, observed_flow)
+    if args.compile_only:
+        print(json.dumps({fn.name: asdict(fn.last_stats) for fn in (loss_exec, grad_exec)}))
+        return
+    for fn in (loss_exec, grad_exec):
+        stats = fn.last_stats
+        source = "读取缓存" if stats.cache_hit else "编译"
+        print(f"{fn.name}: 降级 {stats.lower_time:.2f} 秒, {source} {stats.compile_time:.2f} 秒")
     
     # 测试损失函数性能
     print("\n开始损失函数性能测试...")
@@ -235,7 +410,7 @@ def main():
     
     for i in range(num_runs):
         start_time = time.time()
-        loss = loss_function(params, initial_state, inputs, observed_flow)
+        loss = loss_exec(params, initial_state, inputs, observed_flow)
         end_time = time.time()
         run_time = end_time - start_time
         loss_times.append(run_time)
@@ -248,16 +423,10 @@ def main():
     
     # 测试梯度计算性能
     print("\n开始梯度计算性能测试...")
-    grad_fn = jit(grad(loss_function))
-    
-    # 预热梯度计算
-    print("预热梯度计算...")
-    _ = grad_fn(params, initial_state, inputs, observed_flow)
-    
     grad_times = []
     for i in range(num_runs):
         start_time = time.time()
-        gradients = grad_fn(params, initial_state, inputs, observed_flow)
+        gradients = grad_exec(params, initial_state, inputs, observed_flow)
         end_time = time.time()
         run_time = end_time - start_time
         grad_times.append(run_time)
@@ -276,5 +445,46 @@ def main():
     speedup = avg_loss_time / avg_grad_time
     print(f"\n梯度计算相对于损失函数的加速比: {speedup:.2f}x")
 
+    # 离散时间lax.scan求解与diffrax自适应求解对比 (前向与梯度, 预热后计时)
+    print("\n离散时间求解对比:")
+    for name, fn in [('diffrax Tsit5', loss_function),
+                     ('scan euler', partial(discrete_loss_function, method='euler')),
+                     ('scan rk4', partial(discrete_loss_function, method='rk4'))]:
+        value_fn, gradient_fn = jit(fn), jit(grad(fn))
+        loss = value_fn(params, initial_state, inputs, observed_flow).block_until_ready()
+        jax.block_until_ready(gradient_fn(params, initial_state, inputs, observed_flow))
+        start_time = time.time()
+        value_fn(params, initial_state, inputs, observed_flow).block_until_ready()
+        forward_time = time.time() - start_time
+        start_time = time.time()
+        jax.block_until_ready(gradient_fn(params, initial_state, inputs, observed_flow))
+        grad_time = time.time() - start_time
+        print(f"  {name}: 损失值 = {loss:.4f}, 前向 {forward_time:.4f} 秒, 梯度 {grad_time:.4f} 秒")
+
+    # 测试多参数 x 多流域批量计算
+    print("\n开始批量计算性能测试...")
+    n_params = 8
+    rng = np.random.default_rng(42)
+    params_batch = stack_params([
+        params._replace(Smax=params.Smax * scale, Qmax=params.Qmax * scale)
+        for scale in rng.uniform(0.8, 1.2, n_params)
+    ])
+    # 两段不同长度的记录填充到同一长度, 共用一个编译结果
+    lengths = [len(observed_flow), len(observed_flow) // 2]
+    batch_inputs, batch_observed, batch_mask = pad_basins(
+        [ModelInput(*(x[:n] for x in inputs)) for n in lengths],
+        [observed_flow[:n] for n in lengths],
+    )
+
+    print("预热批量计算...")
+    _ = batched_loss_function(params_batch, initial_state, batch_inputs, batch_observed, batch_mask)
+
+    start_time = time.time()
+    batch_loss = batched_loss_function(params_batch, initial_state, batch_inputs, batch_observed, batch_mask)
+    batch_loss.block_until_ready()
+    run_time = time.time() - start_time
+    print(f"{len(lengths)} 个流域 x {n_params} 组参数, 运行时间: {run_time:.4f} 秒")
+    print(f"损失矩阵:\n{batch_loss}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,168 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 作为脚本运行时使用持久化编译缓存, equinox的运行时检查改为出错时返回NaN (原因见jax_benchmark_jit),
+# 须在导入diffrax (经jax_benchmark_jit) 之前设置
+if __name__ == '__main__':
+    os.environ.setdefault('EQX_ON_ERROR', 'nan')
+
+import argparse
+import time
+import jax
+import jax.numpy as jnp
+from jax import lax, jit, value_and_grad
+from typing import Callable, NamedTuple, Tuple
+import numpy as np
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+from benchmark.utils.jax_cache import enable_compilation_cache
+from benchmark.jax_benchmark_jit import ModelParams, ModelState, ModelInput, loss_function
+from benchmark import scipy_benchmark
+
+# 参数范围 (取自scipy_benchmark.PARAM_BOUNDS), 每个字段为 (下限, 上限)
+PARAM_BOUNDS = ModelParams(**{name: (float(low), float(high))
+                              for name, (low, high) in zip(scipy_benchmark.PARAM_NAMES, scipy_benchmark.PARAM_BOUNDS)})
+
+class AdamState(NamedTuple):
+    """Adam优化器状态"""
+    step: jnp.ndarray  # 迭代次数
+    m: ModelParams     # 一阶矩估计
+    v: ModelParams     # 二阶矩估计
+
+class CalibrationState(NamedTuple):
+    """lax.scan的循环状态"""
+    raw_params: ModelParams   # 无约束空间中的参数
+    opt_state: AdamState
+    loss: jnp.ndarray         # 上一次迭代的损失值
+    best_loss: jnp.ndarray    # 最小损失值
+    best_params: ModelParams  # 最小损失值对应的无约束参数
+    stall: jnp.ndarray        # 最小损失值连续未明显下降的迭代次数
+    grad_norm: jnp.ndarray    # 上一次迭代的梯度范数 (无约束空间)
+    grad_norm0: jnp.ndarray   # 初始参数处的梯度范数
+    converged: jnp.ndarray    # 是否已满足收敛条件
+    n_iters: jnp.ndarray      # 实际更新的迭代次数
+
+def to_bounded(raw_params: ModelParams, bounds: ModelParams = PARAM_BOUNDS) -> ModelParams:
+    """无约束参数 -> 参数范围内 (sigmoid变换)"""
+    return ModelParams(*(low + (high - low) * jax.nn.sigmoid(x) for x, (low, high) in zip(raw_params, bounds)))
+
+def to_unbounded(params: ModelParams, bounds: ModelParams = PARAM_BOUNDS) -> ModelParams:
+    """参数范围内 -> 无约束参数 (logit变换), 边界上的值向内收缩以保持有限"""
+    def logit(x, low, high):
+        u = jnp.clip((x - low) / (high - low), 1e-6, 1.0 - 1e-6)
+        return jnp.log(u) - jnp.log1p(-u)
+    return ModelParams(*(logit(x, low, high) for x, (low, high) in zip(params, bounds)))
+
+def adam_init(params: ModelParams) -> AdamState:
+    zeros = jax.tree_util.tree_map(jnp.zeros_like, params)
+    return AdamState(step=jnp.zeros((), dtype=jnp.int32), m=zeros, v=zeros)
+
+def adam_update(grads: ModelParams, state: AdamState, params: ModelParams, learning_rate: float,
+                b1: float = 0.9, b2: float = 0.999, eps: float = 1e-8) -> Tuple[ModelParams, AdamState]:
+    """一步Adam更新 (纯函数, 可在jit/scan中使用)"""
+    step = state.step + 1
+    m = jax.tree_util.tree_map(lambda m, g: b1 * m + (1 - b1) * g, state.m, grads)
+    v = jax.tree_util.tree_map(lambda v, g: b2 * v + (1 - b2) * g ** 2, state.v, grads)
+    m_scale = 1.0 / (1 - b1 ** step)
+    v_scale = 1.0 / (1 - b2 ** step)
+    params = jax.tree_util.tree_map(
+        lambda p, m, v: p - learning_rate * (m * m_scale) / (jnp.sqrt(v * v_scale) + eps), params, m, v)
+    return params, AdamState(step=step, m=m, v=v)
+
+def make_calibration(initial_state: ModelState, inputs: ModelInput, observed_flow: jnp.ndarray,
+                     n_iters: int = 1000, learning_rate: float = 0.05, tol: float = 1e-3, patience: int = 50,
+                     gtol: float = 1e-3, loss_fn: Callable = loss_function) -> Callable:
+    """构建编译后的率定程序: 损失, 梯度与参数更新的n_iters次迭代由lax.scan展开为一个XLA程序
+
+    收敛条件 (满足其一即设置收敛标记, 之后的迭代经lax.cond跳过求解):
+        - 连续patience次迭代中, 最小损失值的相对下降都不超过tol (固定学习率的Adam在最优点附近振荡,
+          单次迭代的损失变化不能作为判据)
+        - 梯度范数小于初始梯度范数的gtol倍 (相对判据: 初始参数落在梯度消失的平坦区域时不会误判为收敛)
+
+    返回:
+        calibrate(raw_params) -> (最终状态, 每次迭代的损失), 已jit; 最终状态的best_params为最小损失值对应的参数
+    """
+    objective = value_and_grad(lambda raw: loss_fn(to_bounded(raw), initial_state, inputs, observed_flow))
+
+    def step(carry: CalibrationState, _) -> Tuple[CalibrationState, jnp.ndarray]:
+        def update(carry):
+            loss, grads = objective(carry.raw_params)
+            better = loss < carry.best_loss
+            best_loss = jnp.where(better, loss, carry.best_loss)
+            best_params = jax.tree_util.tree_map(lambda best, raw: jnp.where(better, raw, best),
+                                                 carry.best_params, carry.raw_params)
+            stall = jnp.where(loss < carry.best_loss * (1.0 - tol), 0, carry.stall + 1)
+            grad_norm = jnp.sqrt(sum(jnp.sum(g ** 2) for g in jax.tree_util.tree_leaves(grads)))
+            grad_norm0 = jnp.where(carry.n_iters == 0, grad_norm, carry.grad_norm0)
+            raw_params, opt_state = adam_update(grads, carry.opt_state, carry.raw_params, learning_rate)
+            converged = (stall >= patience) | (grad_norm < gtol * grad_norm0)
+            return CalibrationState(raw_params, opt_state, loss, best_loss, best_params, stall, grad_norm,
+                                    grad_norm0, converged, carry.n_iters + 1)
+
+        carry = lax.cond(carry.converged, lambda carry: carry, update, carry)
+        return carry, carry.loss
+
+    @jit
+    def calibrate(raw_params: ModelParams) -> Tuple[CalibrationState, jnp.ndarray]:
+        carry = CalibrationState(raw_params, adam_init(raw_params), jnp.asarray(jnp.inf), jnp.asarray(jnp.inf),
+                                 raw_params, jnp.zeros((), dtype=jnp.int32), jnp.asarray(jnp.inf), jnp.asarray(jnp.inf),
+                                 jnp.asarray(False), jnp.zeros((), dtype=jnp.int32))
+        return lax.scan(step, carry, None, length=n_iters)
+
+    return calibrate
+
+def initial_params(seed: int = 42, bounds: ModelParams = PARAM_BOUNDS) -> ModelParams:
+    """参数范围内均匀采样的初始参数"""
+    rng = np.random.default_rng(seed)
+    return ModelParams(*(float(rng.uniform(low, high)) for low, high in bounds))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=1000, help='序列长度 (天)')
+    parser.add_argument('--iters', type=int, default=1000, help='最大迭代次数')
+    parser.add_argument('--lr', type=float, default=0.05, help='Adam学习率')
+    parser.add_argument('--tol', type=float, default=1e-3, help='最小损失值的相对下降阈值')
+    parser.add_argument('--patience', type=int, default=50, help='最小损失值未明显下降的迭代次数达到该值时视为收敛')
+    parser.add_argument('--gtol', type=float, default=1e-3, help='梯度范数相对初始梯度范数的收敛阈值')
+    parser.add_argument('--seed', type=int, default=42, help='初始参数的随机种子')
+    args = parser.parse_args()
+    enable_compilation_cache()
+
+    inputs_dict, observed_flow = load_hydro_data(get_data_path(), data_length=args.length)
+    inputs = ModelInput(*(jnp.array(inputs_dict[name]) for name in ModelInput._fields))
+    observed_flow = jnp.array(observed_flow)
+    initial_state = ModelState(snowpack=0.0, soilwater=50.0)
+
+    params0 = initial_params(args.seed)
+    raw_params = to_unbounded(params0)
+    calibrate = make_calibration(initial_state, inputs, observed_flow, args.iters, args.lr, args.tol,
+                                 args.patience, args.gtol)
+
+    # 编译 (与运行分开计时, 持久化缓存中已有时直接读取)
+    start_time = time.perf_counter()
+    compiled = calibrate.lower(raw_params).compile()
+    compile_time = time.perf_counter() - start_time
+    print(f"编译时间: {compile_time:.2f} 秒")
+
+    start_time = time.perf_counter()
+    final, losses = jax.block_until_ready(compiled(raw_params))
+    run_time = time.perf_counter() - start_time
+
+    n_iters = int(final.n_iters)
+    losses = np.asarray(losses)
+    params = to_bounded(final.best_params)
+    print(f"初始损失值: {losses[0]:.4f}, 最小损失值: {float(final.best_loss):.4f}, "
+          f"最终梯度范数: {float(final.grad_norm):.2e}")
+    print("初始参数:", {name: round(float(value), 6) for name, value in zip(ModelParams._fields, params0)})
+    print("率定参数:", {name: round(float(value), 6) for name, value in zip(ModelParams._fields, params)})
+    if not bool(final.converged):
+        status = "未收敛"
+    elif float(final.best_loss) > losses[0] * (1.0 - args.tol):
+        status = "损失未下降 (初始参数处梯度消失, 可更换--seed)"
+    else:
+        status = "已收敛"
+    print(f"{status}, 迭代 {n_iters}/{args.iters} 次, 总运行时间: {run_time:.2f} 秒, "
+          f"每次迭代: {run_time / max(n_iters, 1) * 1000:.2f} 毫秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import jax
+import jax.numpy as jnp
+from jax import grad, jit
+from diffrax import diffeqsolve, ODETerm, Tsit5, SaveAt, PIDController
+from interpax import interp1d
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+from benchmark.jax_benchmark_jit import (
+    ModelParams, ModelState, ModelInput, step_func, calculate_pet, compute_flow, loss_function
+)
+
+# 对比: 每次求导数时调用interpax.interp1d (修改前) 与预计算插值系数 (jax_benchmark_jit.loss_function)
+
+@jit
+def interpax_model_derivatives(t, state: ModelState, args) -> ModelState:
+    """修改前的模型导数函数: 每次调用重新计算三次插值"""
+    params, temp_data, lday_data, prcp_data = args
+
+    temp = interp1d(t, jnp.arange(1, len(temp_data) + 1), temp_data, method="cubic")
+    lday = interp1d(t, jnp.arange(1, len(lday_data) + 1), lday_data, method="cubic")
+    prcp = interp1d(t, jnp.arange(1, len(prcp_data) + 1), prcp_data, method="cubic")
+
+    snowfall = step_func(params.Tmin - temp) * prcp
+    rainfall = step_func(temp - params.Tmin) * prcp
+    melt = step_func(temp - params.Tmax) * step_func(state.snowpack) * \
+           jnp.minimum(state.snowpack, params.Df * (temp - params.Tmax))
+    pet = calculate_pet(temp, lday)
+    evap = step_func(state.soilwater) * pet * jnp.minimum(1.0, state.soilwater / params.Smax)
+    baseflow = step_func(state.soilwater) * params.Qmax * \
+              jnp.exp(-params.f * (jnp.maximum(0.0, params.Smax - state.soilwater)))
+    surfaceflow = jnp.maximum(0.0, state.soilwater - params.Smax)
+    flow = baseflow + surfaceflow
+
+    dsnowpack = jnp.maximum(snowfall - melt, -state.snowpack)
+    dsoilwater = jnp.maximum((rainfall + melt) - (evap + flow), -state.soilwater)
+    return ModelState(snowpack=dsnowpack, soilwater=dsoilwater)
+
+@jit
+def interpax_loss_function(params: ModelParams, initial_state: ModelState,
+                           inputs: ModelInput, observed_flow: jnp.ndarray) -> float:
+    """修改前的损失函数"""
+    t0, t1, dt = 1.0, float(len(inputs.temp)), 1.0
+    solution = diffeqsolve(
+        ODETerm(interpax_model_derivatives),
+        Tsit5(),
+        t0=t0,
+        t1=t1,
+        dt0=dt,
+        y0=initial_state,
+        args=(params, inputs.temp, inputs.lday, inputs.prcp),
+        saveat=SaveAt(ts=jnp.arange(t0, t1 + dt, dt)),
+        stepsize_controller=PIDController(rtol=1e-3, atol=1e-3),
+        max_steps=10000
+    )
+    states = solution.ys
+    predicted_flow = jax.vmap(lambda t_idx: compute_flow(t_idx, states, params, inputs))(
+        jnp.arange(len(states.snowpack))
+    )
+    return jnp.mean((predicted_flow - observed_flow) ** 2)
+
+def time_function(fn, args, num_runs: int) -> float:
+    """预热后多次运行, 返回最短运行时间"""
+    jax.block_until_ready(fn(*args))
+    run_times = []
+    for _ in range(num_runs):
+        start_time = time.perf_counter()
+        jax.block_until_ready(fn(*args))
+        run_times.append(time.perf_counter() - start_time)
+    return min(run_times)
+
+def main(data_length: int, num_runs: int):
+    data_path = get_data_path()
+    inputs_dict, observed_flow = load_hydro_data(data_path, data_length=data_length)
+
+    params = ModelParams(
+        f=0.01674478, Smax=1709.461015, Qmax=18.46996175,
+        Df=2.674548848, Tmax=0.175739196, Tmin=-2.092959084
+    )
+    initial_state = ModelState(snowpack=0.0, soilwater=50.0)
+    inputs = ModelInput(
+        temp=jnp.array(inputs_dict['temp']),
+        lday=jnp.array(inputs_dict['lday']),
+        prcp=jnp.array(inputs_dict['prcp'])
+    )
+    observed_flow = jnp.array(observed_flow)
+    args = (params, initial_state, inputs, observed_flow)
+
+    print(f"序列长度: {len(observed_flow)}, 重复次数: {num_runs}")
+    print(f"{'':<12}{'interpax':>12}{'预计算系数':>12}{'加速比':>10}")
+    for name, before_fn, after_fn in [
+        ('损失函数', interpax_loss_function, loss_function),
+        ('梯度计算', jit(grad(interpax_loss_function)), jit(grad(loss_function))),
+    ]:
+        before = time_function(before_fn, args, num_runs)
+        after = time_function(after_fn, args, num_runs)
+        print(f"{name:<12}{before:>11.4f}s{after:>11.4f}s{before / after:>9.1f}x")
+
+    print(f"\n损失值: interpax = {interpax_loss_function(*args):.6f}, 预计算系数 = {loss_function(*args):.6f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=10000, help='序列长度 (天)')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数')
+    args = parser.parse_args()
+    main(args.length, args.runs)
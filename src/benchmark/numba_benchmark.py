@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+from numba import njit, prange
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+from benchmark import scipy_benchmark
+
+# 参数矩阵的列顺序与取值范围
+PARAM_NAMES = scipy_benchmark.PARAM_NAMES
+PARAM_BOUNDS = scipy_benchmark.PARAM_BOUNDS
+
+# 复用scipy_benchmark中的物理过程, 由numba编译
+step_func = njit(cache=True)(scipy_benchmark.step_func)
+calculate_pet = njit(cache=True)(scipy_benchmark.calculate_pet)
+state_rates = njit(cache=True)(scipy_benchmark.state_rates)
+
+@njit(cache=True)
+def soil_flow(soilwater: float, Smax: float, Qmax: float, f: float) -> float:
+    """计算总流量 (基流 + 地表径流)"""
+    baseflow = step_func(soilwater) * Qmax * np.exp(-f * max(0.0, Smax - soilwater))
+    surfaceflow = max(0.0, soilwater - Smax)
+    return baseflow + surfaceflow
+
+@njit(cache=True)
+def run_single(params: np.ndarray, temp: np.ndarray, lday: np.ndarray, prcp: np.ndarray,
+               initial_state: np.ndarray, use_rk4: bool, flow: np.ndarray) -> None:
+    """单组参数的离散时间求解, 结果写入flow"""
+    Tmin, Tmax, Df, Smax, Qmax, f = params[0], params[1], params[2], params[3], params[4], params[5]
+    snowpack, soilwater = initial_state[0], initial_state[1]
+
+    n_steps = flow.shape[0]
+    for i in range(n_steps):
+        flow[i] = soil_flow(soilwater, Smax, Qmax, f)
+        if i == n_steps - 1:
+            break
+
+        # 与状态无关的通量
+        snowfall = step_func(Tmin - temp[i]) * prcp[i]
+        rainfall = step_func(temp[i] - Tmin) * prcp[i]
+        melt_gate = step_func(temp[i] - Tmax)
+        melt_pot = Df * (temp[i] - Tmax)
+        pet = calculate_pet(temp[i], lday[i])
+
+        k1s, k1w = state_rates(snowpack, soilwater, snowfall, rainfall, melt_gate, melt_pot, pet, Smax, Qmax, f)
+        if use_rk4:
+            k2s, k2w = state_rates(snowpack + 0.5 * k1s, soilwater + 0.5 * k1w,
+                                   snowfall, rainfall, melt_gate, melt_pot, pet, Smax, Qmax, f)
+            k3s, k3w = state_rates(snowpack + 0.5 * k2s, soilwater + 0.5 * k2w,
+                                   snowfall, rainfall, melt_gate, melt_pot, pet, Smax, Qmax, f)
+            k4s, k4w = state_rates(snowpack + k3s, soilwater + k3w,
+                                   snowfall, rainfall, melt_gate, melt_pot, pet, Smax, Qmax, f)
+            snowpack += (k1s + 2.0 * k2s + 2.0 * k3s + k4s) / 6.0
+            soilwater += (k1w + 2.0 * k2w + 2.0 * k3w + k4w) / 6.0
+        else:
+            snowpack += k1s
+            soilwater += k1w
+
+@njit(parallel=True, cache=True)
+def exphydro_kernel(params: np.ndarray, temp: np.ndarray, lday: np.ndarray, prcp: np.ndarray,
+                    initial_state: np.ndarray, use_rk4: bool = False) -> np.ndarray:
+    """批量参数的ExpHydro求解
+
+    参数:
+        params: (n_params, 6) 参数矩阵, 列顺序见PARAM_NAMES
+        temp, lday, prcp: (T,) 日尺度输入
+        initial_state: (2,) 初始状态 [snowpack, soilwater]
+        use_rk4: 是否使用定步长RK4 (默认显式欧拉)
+
+    返回:
+        (n_params, T) 流量矩阵
+    """
+    n_params = params.shape[0]
+    flow = np.empty((n_params, temp.shape[0]), dtype=np.float64)
+    for j in prange(n_params):
+        run_single(params[j], temp, lday, prcp, initial_state, use_rk4, flow[j])
+    return flow
+
+def sample_params(n_params: int, seed: int = 42) -> np.ndarray:
+    """在参数范围内均匀采样 (n_params, 6) 参数矩阵"""
+    rng = np.random.default_rng(seed)
+    low, high = PARAM_BOUNDS[:, 0], PARAM_BOUNDS[:, 1]
+    return low + (high - low) * rng.random((n_params, len(PARAM_NAMES)))
+
+def main():
+    # 加载数据
+    data_path = get_data_path()
+    inputs_dict, observed_flow = load_hydro_data(data_path)
+    temp = np.ascontiguousarray(inputs_dict['temp'], dtype=np.float64)
+    lday = np.ascontiguousarray(inputs_dict['lday'], dtype=np.float64)
+    prcp = np.ascontiguousarray(inputs_dict['prcp'], dtype=np.float64)
+    initial_state = np.array([0.0, 50.0])
+
+    n_params = 10000
+    params = sample_params(n_params)
+
+    # 预热JIT编译
+    start_time = time.perf_counter()
+    exphydro_kernel(params[:2], temp, lday, prcp, initial_state)
+    print(f"编译时间: {time.perf_counter() - start_time:.4f} 秒")
+
+    start_time = time.perf_counter()
+    flow = exphydro_kernel(params, temp, lday, prcp, initial_state)
+    run_time = time.perf_counter() - start_time
+    print(f"{n_params} 组参数 x {len(temp)} 天, 运行时间: {run_time:.4f} 秒 "
+          f"({n_params / run_time:.1f} 组/秒)")
+
+    # 计算每组参数的损失
+    loss = np.mean((flow - observed_flow) ** 2, axis=1)
+    best = np.argmin(loss)
+    print(f"\n最优损失值: {loss[best]:.4f}")
+    print("最优参数:", {name: round(float(value), 6) for name, value in zip(PARAM_NAMES, params[best])})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+from numba import njit, prange
+from benchmark.gr4j_benchmark import PARAM_BOUNDS, SAMPLE_PARAMS
+from benchmark.gr4j_benchmark import sample_params as sample_gr4j_params
+from benchmark.utils.data_loader import DATA_DIR, load_dataset
+
+# 参数的名称, 顺序与范围取自gr4j_benchmark (与superflexpy_benchmark.build_model的参数顺序一致).
+# superflexpy的汇流水库中x2 > 0为损失 (airGR中为补给), x2 < 0时新状态可超出Pegasus的区间上界 S0 + P * dt 而无法求解,
+# 因此采样时只取x2范围的非负部分
+SAMPLE_BOUNDS = PARAM_BOUNDS.copy()
+SAMPLE_BOUNDS[1, 0] = 0.0
+
+# superflexpy输出的参考序列 (见write_reference), 每列对应一组参数
+REFERENCE_PATH = DATA_DIR / 'gr4j' / 'superflexpy_reference.csv'
+REFERENCE_PARAMS = np.array([
+    SAMPLE_PARAMS,
+    [150.0, 0.5, 40.0, 2.5],
+    [600.0, 1.5, 200.0, 6.0],
+    [1000.0, 0.0, 120.0, 11.0],
+])
+REFERENCE_LENGTH = 500
+
+# superflexpy GR4J元件的固定参数与初始状态
+ALPHA, BETA, NI = 2.0, 5.0, 4.0 / 9.0  # 产流水库
+GAMMA, OMEGA = 5.0, 3.5                # 汇流水库
+SPLIT = 0.9                            # 进入UH1的比例
+INITIAL_STATES = np.array([10.0, 10.0])
+
+# PegasusPython的默认设置
+TOL_F, TOL_X, ITER_MAX = 1e-8, 1e-8, 10
+
+# 储水量方程的编号
+PRODUCTION, ROUTING = 0, 1
+
+@njit(cache=True)
+def store_fluxes(store: int, S: float, P: float, E: float, a: float, b: float, dt: float):
+    """储水量方程的通量 (与superflexpy的_fluxes_function_python一致), 流入为正
+
+    产流水库 (a=x1): [Ps, -Es, -Perc]; 汇流水库 (a=x2, b=x3): [Q9, -Qr, -F], F为正时表示损失
+    """
+    if store == PRODUCTION:
+        x1 = a
+        ratio = S / x1
+        ps = P * (1.0 - ratio ** ALPHA)
+        es = E * (2.0 * ratio - ratio ** ALPHA)
+        perc = ((x1 ** (1.0 - BETA)) / ((BETA - 1.0) * dt)) * (NI ** (BETA - 1.0)) * (S ** BETA)
+        return ps, -es, -perc
+    x2, x3 = a, b
+    qr = ((x3 ** (1.0 - GAMMA)) / ((GAMMA - 1.0) * dt)) * (S ** GAMMA)
+    exchange = x2 * (S / x3) ** OMEGA
+    return P, -qr, -exchange
+
+@njit(cache=True)
+def residual(store: int, S: float, S0: float, P: float, E: float, a: float, b: float, dt: float) -> float:
+    """隐式欧拉方程 (S - S0) / dt - sum(fluxes(S))"""
+    f1, f2, f3 = store_fluxes(store, S, P, E, a, b, dt)
+    return (S - S0) / dt - (f1 + f2 + f3)
+
+@njit(cache=True)
+def pegasus(store: int, S0: float, P: float, E: float, a: float, b: float, dt: float,
+            tol_F: float, tol_x: float, iter_max: int) -> float:
+    """Pegasus法求隐式欧拉方程的根 (与PegasusPython相同的区间, 迭代与收敛判断)
+
+    区间为 [0, 上界], 上界取旧状态下的 S0 + 入流 * dt. 区间两端同号或iter_max次迭代内未收敛时返回NaN (PegasusPython抛出异常).
+    """
+    if store == PRODUCTION:
+        upper = S0 + P * (1.0 - (S0 / a) ** ALPHA) * dt
+    else:
+        upper = S0 + P * dt
+    a_x, b_x = 0.0, upper
+    a_y = residual(store, a_x, S0, P, E, a, b, dt)
+    b_y = residual(store, b_x, S0, P, E, a, b, dt)
+
+    if abs(a_y) < tol_F:
+        return a_x
+    if abs(b_y) < tol_F:
+        return b_x
+    if a_y * b_y > 0:
+        return np.nan
+
+    # a为最新的近似根, b为与之异号的端点
+    for _ in range(iter_max):
+        root = a_x - a_y / (b_y - a_y) * (b_x - a_x)
+        root = min(max(root, min(a_x, b_x)), max(a_x, b_x))
+        f_root = residual(store, root, S0, P, E, a, b, dt)
+        if f_root * a_y < 0:
+            b_x, b_y = a_x, a_y
+        else:
+            b_y = b_y * a_y / (a_y + f_root)
+        a_x, a_y = root, f_root
+        if abs(f_root) < tol_F or abs(a_x - b_x) < tol_x:
+            return root
+    return np.nan
+
+@njit(cache=True)
+def uh1_weights(lag_time: float) -> np.ndarray:
+    """UnitHydrograph1的纵坐标 (S曲线 (t / x4)^2.5 的差分)"""
+    n = int(np.ceil(lag_time))
+    weights = np.empty(n)
+    previous = 0.0
+    for i in range(n):
+        t = i + 1.0
+        current = (t / lag_time) ** 2.5 if t < lag_time else 1.0
+        weights[i] = current - previous
+        previous = current
+    return weights
+
+@njit(cache=True)
+def uh2_weights(lag_time: float) -> np.ndarray:
+    """UnitHydrograph2的纵坐标 (lag_time为2 * x4)"""
+    n = int(np.ceil(lag_time))
+    half = lag_time / 2.0
+    weights = np.empty(n)
+    previous = 0.0
+    for i in range(n):
+        t = i + 1.0
+        if t < half:
+            current = 0.5 * (t / half) ** 2.5
+        elif t < lag_time:
+            current = 1.0 - 0.5 * (2.0 - t / half) ** 2.5
+        else:
+            current = 1.0
+        weights[i] = current - previous
+        previous = current
+    return weights
+
+@njit(cache=True)
+def run_single(params: np.ndarray, P: np.ndarray, E: np.ndarray, initial_states: np.ndarray, dt: float,
+               tol_F: float, tol_x: float, iter_max: int,
+               q: np.ndarray, ps_state: np.ndarray, rs_state: np.ndarray) -> None:
+    """单组参数的GR4J求解 (对应superflexpy_benchmark.build_model的Unit), 结果写入q与两个储水量"""
+    x1, x2, x3, x4 = params[0], params[1], params[2], params[3]
+    w1, w2 = uh1_weights(x4), uh2_weights(2.0 * x4)
+    n1, n2 = w1.shape[0], w2.shape[0]
+    # 滞时状态按环形缓冲区存放, lag[(t + k) % n]为k步后输出的部分
+    lag1, lag2 = np.zeros(n1), np.zeros(n2)
+    S, R = initial_states[0], initial_states[1]
+
+    for t in range(P.shape[0]):
+        # 截留
+        remove = min(E[t], P[t])
+        en, pn = E[t] - remove, P[t] - remove
+
+        # 产流水库 (隐式欧拉), 通量取新状态下的值
+        S = pegasus(PRODUCTION, S, pn, en, x1, 0.0, dt, tol_F, tol_x, iter_max)
+        ps, _, neg_perc = store_fluxes(PRODUCTION, S, pn, en, x1, 0.0, dt)
+        pr = pn - ps - neg_perc
+
+        # 分流与单位线
+        for k in range(n1):
+            lag1[(t + k) % n1] += SPLIT * pr * w1[k]
+        for k in range(n2):
+            lag2[(t + k) % n2] += (1.0 - SPLIT) * pr * w2[k]
+        q9, q1 = lag1[t % n1], lag2[t % n2]
+        lag1[t % n1], lag2[t % n2] = 0.0, 0.0
+
+        # 汇流水库 (隐式欧拉)
+        R = pegasus(ROUTING, R, q9, 0.0, x2, x3, dt, tol_F, tol_x, iter_max)
+        _, neg_qr, neg_exchange = store_fluxes(ROUTING, R, q9, 0.0, x2, x3, dt)
+
+        # FluxAggregator: Qr + max(0, Q1 - F)
+        q[t] = -neg_qr + max(0.0, q1 + neg_exchange)
+        ps_state[t], rs_state[t] = S, R
+
+@njit(parallel=True, cache=True)
+def gr4j_kernel(params: np.ndarray, P: np.ndarray, E: np.ndarray,
+                initial_states: np.ndarray = INITIAL_STATES, dt: float = 1.0,
+                tol_F: float = TOL_F, tol_x: float = TOL_X, iter_max: int = ITER_MAX):
+    """批量参数的GR4J求解 (隐式欧拉 + Pegasus), 参数维并行
+
+    参数:
+        params: (n_params, 4) 参数矩阵, 列顺序见gr4j_benchmark.PARAM_NAMES
+        P, E: (T,) 降水与潜在蒸散发
+        initial_states: (2,) 产流与汇流水库的初始储水量
+
+    返回:
+        (n_params, T) 的总径流, 产流水库与汇流水库储水量
+    """
+    n_params, n_steps = params.shape[0], P.shape[0]
+    q = np.empty((n_params, n_steps))
+    ps_state = np.empty((n_params, n_steps))
+    rs_state = np.empty((n_params, n_steps))
+    for j in prange(n_params):
+        run_single(params[j], P, E, initial_states, dt, tol_F, tol_x, iter_max, q[j], ps_state[j], rs_state[j])
+    return q, ps_state, rs_state
+
+def load_gr4j_inputs(time_length: int = -1):
+    """GR4J样例数据的降水与潜在蒸散发 (连续的float64数组)"""
+    data = load_dataset('gr4j', ['prcp', 'pet', 'flow'], data_length=time_length)
+    return (np.ascontiguousarray(data['prcp']), np.ascontiguousarray(data['pet']),
+            np.ascontiguousarray(data['flow']))
+
+def sample_params(n_params: int, seed: int = 42) -> np.ndarray:
+    """在SAMPLE_BOUNDS内均匀采样 (n_params, 4) 参数矩阵, 第一组为SAMPLE_PARAMS"""
+    return sample_gr4j_params(n_params, seed, SAMPLE_BOUNDS)
+
+def superflexpy_output(params: np.ndarray, P: np.ndarray, E: np.ndarray) -> np.ndarray:
+    """superflexpy (ImplicitEulerPython + PegasusPython) 的 (n_params, T - 1) 总径流
+
+    最后一步不输出: LagElement在state_array[-1]的视图上原地平移滞时状态, 改变了最后一步的单位线输出.
+    superflexpy未安装时抛出ImportError.
+    """
+    from benchmark.superflexpy_benchmark import build_model
+
+    q = np.empty((len(params), len(P) - 1))
+    for j, row in enumerate(params):
+        model = build_model(*row)
+        model.set_input([E, P])
+        model.set_timestep(1.0)
+        model.reset_states()
+        q[j] = model.get_output()[0][:-1]
+    return q
+
+def write_reference(path=REFERENCE_PATH) -> None:
+    """以REFERENCE_PARAMS运行superflexpy, 将前REFERENCE_LENGTH天的总径流写入path (需要superflexpy)"""
+    P, E, _ = load_gr4j_inputs(REFERENCE_LENGTH + 1)
+    q = superflexpy_output(REFERENCE_PARAMS, P, E)
+    header = ','.join(f'q{j}' for j in range(len(q)))
+    np.savetxt(path, q.T, fmt='%.12e', delimiter=',', header=header, comments='')
+
+def compare_with_reference(path=REFERENCE_PATH) -> float:
+    """与data/下superflexpy参考序列的最大绝对误差"""
+    reference = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2).T
+    P, E, _ = load_gr4j_inputs(reference.shape[1])
+    q, _, _ = gr4j_kernel(REFERENCE_PARAMS, P, E)
+    return float(np.max(np.abs(q - reference)))
+
+def compare_with_superflexpy(params: np.ndarray, P: np.ndarray, E: np.ndarray) -> float:
+    """与superflexpy的输出直接对比, 返回最大绝对误差 (superflexpy未安装时抛出ImportError)"""
+    q, _, _ = gr4j_kernel(params, P, E)
+    return float(np.max(np.abs(superflexpy_output(params, P, E) - q[:, :-1])))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=3600, help='序列长度 (天)')
+    parser.add_argument('--params', type=int, default=1000, help='参数组数')
+    parser.add_argument('--superflexpy', action='store_true', help='同时与superflexpy直接对比 (需要superflexpy)')
+    parser.add_argument('--write-reference', action='store_true', help='用superflexpy重新生成参考序列后退出')
+    args = parser.parse_args()
+
+    if args.write_reference:
+        write_reference()
+        print(f"参考序列已写入 {REFERENCE_PATH}")
+        return
+
+    P, E, observed_flow = load_gr4j_inputs(args.length)
+    params = sample_params(args.params)
+
+    # 预热JIT编译
+    start_time = time.perf_counter()
+    gr4j_kernel(params[:2], P, E)
+    print(f"编译时间: {time.perf_counter() - start_time:.4f} 秒")
+
+    start_time = time.perf_counter()
+    q, _, _ = gr4j_kernel(params[:1], P, E)
+    single_time = time.perf_counter() - start_time
+    print(f"单组参数 x {len(P)} 天, 运行时间: {single_time * 1000:.3f} 毫秒")
+
+    start_time = time.perf_counter()
+    q, _, _ = gr4j_kernel(params, P, E)
+    run_time = time.perf_counter() - start_time
+    print(f"{len(params)} 组参数 x {len(P)} 天, 运行时间: {run_time:.4f} 秒 ({len(params) / run_time:.1f} 组/秒)")
+    print(f"SAMPLE_PARAMS的均方误差: {np.nanmean((q[0] - observed_flow) ** 2):.4f}, 未收敛的参数组: {np.isnan(q).any(axis=1).sum()}")
+
+    print(f"与superflexpy参考序列的最大绝对误差: {compare_with_reference():.3e}")
+    # Julia的gr4j_model (HydroModels DiscreteSolver, 与此处的隐式欧拉格式不同) 在相同输入与参数组数下单独计时
+    print(f"Julia对照: julia -t auto --project src/benchmark/gr4j_benchmark.jl {len(P)} {len(params)}")
+    if args.superflexpy:
+        print(f"与superflexpy的最大绝对误差: {compare_with_superflexpy(params[:4], P, E):.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,9 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import math
+import argparse
 import numpy as np
-from scipy.integrate import solve_ivp
-from scipy.interpolate import interp1d
 from dataclasses import dataclass
 from typing import Tuple, List
 import time
@@ -20,6 +20,19 @@ class ModelParams:
     Qmax: float  # 最大基流
     f: float     # 基流衰减系数
 
+# 参数向量的顺序 (与ModelParams的字段顺序一致) 与率定时的取值范围
+PARAM_NAMES = ('Tmin', 'Tmax', 'Df', 'Smax', 'Qmax', 'f')
+PARAM_BOUNDS = np.array([
+    [-3.0, 0.0],      # Tmin
+    [0.0, 3.0],       # Tmax
+    [0.0, 5.0],       # Df
+    [100.0, 2000.0],  # Smax
+    [10.0, 50.0],     # Qmax
+    [0.0, 0.1],       # f
+])
+# 01013500的率定参数, 各脚本的默认参数 (顺序同PARAM_NAMES)
+DEFAULT_PARAMS = np.array([-2.092959084, 0.175739196, 2.674548848, 1709.461015, 18.46996175, 0.01674478])
+
 @dataclass
 class ModelState:
     """模型状态"""
@@ -85,7 +98,7 @@ def bucket_soil(state: ModelState, params: ModelParams,
                       surfaceflow=surfaceflow, evap=evap, melt=melt)
 
 def model_derivatives(t: float, state_array: np.ndarray, 
-                     interpolators: Tuple[interp1d, interp1d, interp1d],
+                     interpolators: Tuple['interp1d', 'interp1d', 'interp1d'],
                      params: ModelParams) -> np.ndarray:
     """模型导数计算"""
     # 获取当前时间步的插值输入
@@ -107,11 +120,274 @@ def model_derivatives(t: float, state_array: np.ndarray,
     
     return np.array([dsnowpack, dsoilwater])
 
+# 离散时间求解方法 (与HydroModels的DiscreteSolver对应, 按日步进, 输入按索引读取)
+DISCRETE_METHODS = ('euler', 'rk4')
+
+def forcing_fluxes(inputs: ModelInput, params: ModelParams) -> Tuple[np.ndarray, ...]:
+    """计算与状态无关的通量 (整段序列向量化计算)"""
+    temp = np.asarray(inputs.temp, dtype=np.float64)
+    lday = np.asarray(inputs.lday, dtype=np.float64)
+    prcp = np.asarray(inputs.prcp, dtype=np.float64)
+
+    snowfall = step_func(params.Tmin - temp) * prcp
+    rainfall = step_func(temp - params.Tmin) * prcp
+    melt_gate = step_func(temp - params.Tmax)      # 融雪开关
+    melt_pot = params.Df * (temp - params.Tmax)    # 潜在融雪量
+    pet = calculate_pet(temp, lday)
+
+    return snowfall, rainfall, melt_gate, melt_pot, pet
+
+def state_rates(snowpack: float, soilwater: float,
+                snowfall: float, rainfall: float, melt_gate: float, melt_pot: float, pet: float,
+                Smax: float, Qmax: float, f: float) -> Tuple[float, float]:
+    """标量状态导数 (bucket_surface与bucket_soil中与状态相关的部分)"""
+    melt = melt_gate * (math.tanh(5.0 * snowpack) + 1.0) * 0.5 * min(snowpack, melt_pot)
+
+    soil_gate = (math.tanh(5.0 * soilwater) + 1.0) * 0.5
+    evap = soil_gate * pet * min(1.0, soilwater / Smax)
+    baseflow = soil_gate * Qmax * math.exp(-f * max(0.0, Smax - soilwater))
+    surfaceflow = max(0.0, soilwater - Smax)
+
+    return snowfall - melt, (rainfall + melt) - (evap + baseflow + surfaceflow)
+
+def compute_outputs(states: np.ndarray, inputs: ModelInput, params: ModelParams) -> ModelOutput:
+    """由求解得到的状态序列一次性计算全部通量
+
+    参数:
+        states: (2, T) 状态序列 [snowpack, soilwater]
+
+    返回:
+        ModelOutput, 各字段为 (T,) 数组
+    """
+    snowpack, soilwater = states[0], states[1]
+    n_steps = states.shape[1]
+    _, _, melt_gate, melt_pot, pet = (x[:n_steps] for x in forcing_fluxes(inputs, params))
+
+    melt = melt_gate * step_func(snowpack) * np.minimum(snowpack, melt_pot)
+    evap = step_func(soilwater) * pet * np.minimum(1.0, soilwater / params.Smax)
+    baseflow = step_func(soilwater) * params.Qmax * np.exp(-params.f * np.maximum(0.0, params.Smax - soilwater))
+    surfaceflow = np.maximum(0.0, soilwater - params.Smax)
+
+    return ModelOutput(flow=baseflow + surfaceflow, baseflow=baseflow,
+                       surfaceflow=surfaceflow, evap=evap, melt=melt)
+
+def solve_model_discrete(initial_state: ModelState, inputs: ModelInput, params: ModelParams,
+                         n_steps: int, dt: float = 1.0, method: str = 'euler') -> np.ndarray:
+    """离散时间求解 (显式欧拉或定步长RK4, 每个时间步内输入保持不变)"""
+    if method not in DISCRETE_METHODS:
+        raise ValueError(f"未知的离散求解方法: {method}, 可选: {DISCRETE_METHODS}")
+
+    snowfall, rainfall, melt_gate, melt_pot, pet = forcing_fluxes(inputs, params)
+    if n_steps > len(snowfall):
+        raise ValueError(f"时间步数 {n_steps} 超过输入序列长度 {len(snowfall)}")
+    # 转换为Python列表, 循环内按索引读取比逐元素访问numpy数组更快
+    snowfall, rainfall, melt_gate, melt_pot, pet = (
+        x[:n_steps].tolist() for x in (snowfall, rainfall, melt_gate, melt_pot, pet))
+    Smax, Qmax, f = float(params.Smax), float(params.Qmax), float(params.f)
+
+    # 预分配状态数组, 第0列为初始状态
+    states = np.empty((2, n_steps), dtype=np.float64)
+    snowpack, soilwater = float(initial_state.snowpack), float(initial_state.soilwater)
+    states[0, 0], states[1, 0] = snowpack, soilwater
+
+    for i in range(n_steps - 1):
+        forcing = (snowfall[i], rainfall[i], melt_gate[i], melt_pot[i], pet[i], Smax, Qmax, f)
+        if method == 'euler':
+            dsnow, dsoil = state_rates(snowpack, soilwater, *forcing)
+        else:
+            k1s, k1w = state_rates(snowpack, soilwater, *forcing)
+            k2s, k2w = state_rates(snowpack + 0.5 * dt * k1s, soilwater + 0.5 * dt * k1w, *forcing)
+            k3s, k3w = state_rates(snowpack + 0.5 * dt * k2s, soilwater + 0.5 * dt * k2w, *forcing)
+            k4s, k4w = state_rates(snowpack + dt * k3s, soilwater + dt * k3w, *forcing)
+            dsnow = (k1s + 2.0 * k2s + 2.0 * k3s + k4s) / 6.0
+            dsoil = (k1w + 2.0 * k2w + 2.0 * k3w + k4w) / 6.0
+        snowpack += dt * dsnow
+        soilwater += dt * dsoil
+        states[0, i + 1], states[1, i + 1] = snowpack, soilwater
+
+    return states
+
+# 隐式求解方法与雅可比矩阵的计算方式
+IMPLICIT_METHODS = ('BDF', 'Radau', 'LSODA')
+JACOBIAN_MODES = ('analytic', 'fd', 'fd-vectorized')
+
+def jacobian_modes(method: str) -> Tuple[str, ...]:
+    """method适用的雅可比矩阵计算方式 (显式方法为空)
+
+    LSODA在内部计算有限差分雅可比矩阵, 不使用vectorized, 'fd'与'fd-vectorized'相同, 只保留'fd'.
+    """
+    if method not in IMPLICIT_METHODS:
+        return ()
+    return tuple(mode for mode in JACOBIAN_MODES if not (method == 'LSODA' and mode == 'fd-vectorized'))
+
+class LinearForcing:
+    """等间距时间网格上的线性插值 (与interp1d(kind='linear')及两端取端点值一致), 一次返回三个输入"""
+
+    def __init__(self, t_points: np.ndarray, inputs: ModelInput):
+        self.t0 = float(t_points[0])
+        self.dt = float(t_points[1] - t_points[0])
+        # 按时间步存为Python元组, 标量插值不经过numpy
+        n_points = len(t_points)
+        self.rows = list(zip(*(np.asarray(x[:n_points], dtype=np.float64).tolist()
+                               for x in (inputs.temp, inputs.lday, inputs.prcp))))
+        self.last = len(self.rows) - 2
+
+    def __call__(self, t: float) -> Tuple[float, float, float]:
+        x = (t - self.t0) / self.dt
+        i = min(max(int(math.floor(x)), 0), self.last)
+        w = min(max(x - i, 0.0), 1.0)
+        left, right = self.rows[i], self.rows[i + 1]
+        return tuple(a + w * (b - a) for a, b in zip(left, right))
+
+def exphydro_rhs(t: float, y: np.ndarray, forcing: LinearForcing, params: ModelParams) -> np.ndarray:
+    """solve_ivp的状态导数 (与model_derivatives相同的物理过程)
+
+    y为 (2,) 或 (2, k), 后者用于vectorized=True时一次计算有限差分雅可比矩阵的全部列.
+    """
+    temp, lday, prcp = forcing(t)
+    if y.ndim == 1:
+        # 单个状态: 标量路径 (math比numpy标量运算快)
+        rain_gate = (math.tanh(5.0 * (temp - params.Tmin)) + 1.0) * 0.5
+        snow_gate = (math.tanh(5.0 * (params.Tmin - temp)) + 1.0) * 0.5
+        melt_gate = (math.tanh(5.0 * (temp - params.Tmax)) + 1.0) * 0.5
+        pet = 29.8 * lday * 24 * 0.611 * math.exp((17.3 * temp) / (temp + 237.3)) / (temp + 273.2)
+        return np.array(state_rates(float(y[0]), float(y[1]), snow_gate * prcp, rain_gate * prcp, melt_gate,
+                                    params.Df * (temp - params.Tmax), pet, params.Smax, params.Qmax, params.f))
+
+    snowpack, soilwater = y[0], y[1]
+    snowfall = step_func(params.Tmin - temp) * prcp
+    rainfall = step_func(temp - params.Tmin) * prcp
+    melt = step_func(temp - params.Tmax) * step_func(snowpack) * np.minimum(snowpack, params.Df * (temp - params.Tmax))
+
+    soil_gate = step_func(soilwater)
+    evap = soil_gate * calculate_pet(temp, lday) * np.minimum(1.0, soilwater / params.Smax)
+    baseflow = soil_gate * params.Qmax * np.exp(-params.f * np.maximum(0.0, params.Smax - soilwater))
+    surfaceflow = np.maximum(0.0, soilwater - params.Smax)
+
+    return np.array([snowfall - melt, (rainfall + melt) - (evap + baseflow + surfaceflow)])
+
+def step_func_derivative(x: float) -> float:
+    """阶跃函数的导数"""
+    return 2.5 * (1.0 - math.tanh(5.0 * x) ** 2)
+
+def exphydro_jacobian(t: float, y: np.ndarray, forcing: LinearForcing, params: ModelParams) -> np.ndarray:
+    """状态导数对 [snowpack, soilwater] 的解析雅可比矩阵 (2x2)
+
+    min/max的分段处取所在一侧的导数. 积雪只影响融雪, 土壤含水量不影响积雪, 故右上元素为0.
+    """
+    temp, lday, _ = forcing(t)
+    snowpack, soilwater = float(y[0]), float(y[1])
+    Smax, Qmax, f = params.Smax, params.Qmax, params.f
+
+    # 融雪 = melt_gate * g(S) * min(S, melt_pot)
+    melt_gate = (math.tanh(5.0 * (temp - params.Tmax)) + 1.0) * 0.5
+    melt_pot = params.Df * (temp - params.Tmax)
+    dmelt = melt_gate * (step_func_derivative(snowpack) * min(snowpack, melt_pot)
+                         + (math.tanh(5.0 * snowpack) + 1.0) * 0.5 * (1.0 if snowpack < melt_pot else 0.0))
+
+    # 蒸发, 基流与地表径流对土壤含水量W的导数
+    gate, dgate = (math.tanh(5.0 * soilwater) + 1.0) * 0.5, step_func_derivative(soilwater)
+    pet = 29.8 * lday * 24 * 0.611 * math.exp((17.3 * temp) / (temp + 237.3)) / (temp + 273.2)
+    below = soilwater < Smax
+    devap = dgate * pet * min(1.0, soilwater / Smax) + (gate * pet / Smax if below else 0.0)
+    base = Qmax * math.exp(-f * max(0.0, Smax - soilwater))
+    dbase = dgate * base + (gate * base * f if below else 0.0)
+    dsurface = 0.0 if below else 1.0
+
+    return np.array([[-dmelt, 0.0],
+                     [dmelt, -(devap + dbase + dsurface)]])
+
+def solve_model_ivp(initial_state: ModelState, inputs: ModelInput, params: ModelParams,
+                    t_span: Tuple[float, float], dt: float, method: str = 'BDF',
+                    jacobian: str = 'analytic') -> Tuple[np.ndarray, np.ndarray, dict]:
+    """solve_ivp求解 (显式或隐式方法), 返回步数等统计
+
+    参数:
+        jacobian: 隐式方法的雅可比矩阵计算方式. 'analytic'为exphydro_jacobian,
+            'fd'为逐列调用右端项的有限差分, 'fd-vectorized'为vectorized=True (一次调用得到全部列,
+            LSODA不支持, 见jacobian_modes). 显式方法忽略此参数.
+
+    返回:
+        时间点, (2, T) 状态, 统计 (接受的步数, 右端项/雅可比矩阵求值次数, LU分解次数)
+    """
+    from scipy.integrate import solve_ivp
+
+    if jacobian not in JACOBIAN_MODES:
+        raise ValueError(f"未知的雅可比矩阵计算方式: {jacobian}, 可选: {JACOBIAN_MODES}")
+    if method in IMPLICIT_METHODS and jacobian not in jacobian_modes(method):
+        raise ValueError(f"{method}不支持雅可比矩阵计算方式{jacobian}, 可选: {jacobian_modes(method)}")
+    t_points = np.arange(t_span[0], t_span[1] + dt, dt)
+    forcing = LinearForcing(t_points, inputs)
+
+    options = {}
+    if method in IMPLICIT_METHODS:
+        if jacobian == 'analytic':
+            options['jac'] = exphydro_jacobian
+        options['vectorized'] = jacobian == 'fd-vectorized'
+
+    # 不使用t_eval: 由稠密输出在输出时刻取值 (与t_eval相同), solution.t保留每个接受步, 用于统计步数
+    solution = solve_ivp(
+        exphydro_rhs,
+        t_span,
+        np.array([initial_state.snowpack, initial_state.soilwater], dtype=np.float64),
+        method=method,
+        args=(forcing, params),
+        dense_output=True,
+        rtol=1e-3,
+        atol=1e-3,
+        **options
+    )
+    stats = {'success': solution.success, 'steps': len(solution.t) - 1, 'nfev': solution.nfev,
+             'njev': solution.njev, 'nlu': solution.nlu}
+    t_points = t_points[t_points <= solution.t[-1]]
+    return t_points, solution.sol(t_points), stats
+
+def compare_ivp_methods(initial_state: ModelState, inputs: ModelInput, params: ModelParams,
+                        t_span: Tuple[float, float], dt: float, observed_flow: np.ndarray,
+                        methods: Tuple[str, ...] = ('RK45',) + IMPLICIT_METHODS) -> List[dict]:
+    """各solve_ivp方法 (隐式方法按雅可比矩阵计算方式) 的步数, 运行时间与误差
+
+    误差为状态相对于严格容差 (1e-9) Radau参考解的最大绝对偏差.
+    """
+    from scipy.integrate import solve_ivp
+
+    t_points = np.arange(t_span[0], t_span[1] + dt, dt)
+    reference = solve_ivp(exphydro_rhs, t_span, np.array([initial_state.snowpack, initial_state.soilwater]),
+                          method='Radau', t_eval=t_points, jac=exphydro_jacobian,
+                          args=(LinearForcing(t_points, inputs), params), rtol=1e-9, atol=1e-9).y
+    rows = []
+    for method in methods:
+        for jacobian in jacobian_modes(method) or ('-',):
+            start_time = time.perf_counter()
+            t_points, states, stats = solve_model_ivp(
+                initial_state, inputs, params, t_span, dt, method, 'analytic' if jacobian == '-' else jacobian)
+            run_time = time.perf_counter() - start_time
+            flow = compute_outputs(states, inputs, params).flow
+            loss = np.mean((flow - observed_flow[:len(flow)]) ** 2)
+            error = np.abs(states - reference[:, :states.shape[1]]).max()
+            rows.append({'method': method, 'jacobian': jacobian, 'time': run_time, 'loss': loss,
+                         'error': error, **stats})
+    return rows
+
 def solve_model(initial_state: ModelState, inputs: ModelInput, params: ModelParams, 
-                t_span: Tuple[float, float], dt: float) -> Tuple[np.ndarray, np.ndarray]:
-    """求解模型"""
+                t_span: Tuple[float, float], dt: float, method: str = 'RK45') -> Tuple[np.ndarray, np.ndarray]:
+    """求解模型
+
+    method为'euler'或'rk4'时使用离散时间求解, 为'BDF', 'Radau', 'LSODA'时使用带解析雅可比矩阵的隐式求解,
+    否则作为solve_ivp的求解方法
+    """
     # 创建时间点
     t_points = np.arange(t_span[0], t_span[1] + dt, dt)
+
+    if method in DISCRETE_METHODS:
+        return t_points, solve_model_discrete(initial_state, inputs, params, len(t_points), dt, method)
+    if method in IMPLICIT_METHODS:
+        t_points, states, _ = solve_model_ivp(initial_state, inputs, params, t_span, dt, method)
+        return t_points, states
+
+    # scipy只有连续时间求解需要 (离散求解与numba后端不导入)
+    from scipy.integrate import solve_ivp
+    from scipy.interpolate import interp1d
     
     # 创建插值器
     temp_interp = interp1d(t_points, inputs.temp, kind='linear', bounds_error=False, fill_value=(inputs.temp[0], inputs.temp[-1]))
@@ -125,14 +401,14 @@ def solve_model(initial_state: ModelState, inputs: ModelInput, params: ModelPara
         np.array([initial_state.snowpack, initial_state.soilwater]),
         args=((temp_interp, lday_interp, prcp_interp), params),
         t_eval=t_points,
-        method='RK45',
+        method=method,
         rtol=1e-3,
         atol=1e-3
     )
     
     return solution.t, solution.y
 
-def main():
+def main(method: str = 'RK45', compare: bool = False):
     # 设置随机种子
     np.random.seed(42)
     
@@ -141,10 +417,7 @@ def main():
     inputs_dict, observed_flow = load_hydro_data(data_path, data_length=1000)  # 使用一年的数据
     
     # 模型参数
-    params = ModelParams(
-        f=0.01674478, Smax=1709.461015, Qmax=18.46996175,
-        Df=2.674548848, Tmax=0.175739196, Tmin=-2.092959084
-    )
+    params = ModelParams(*DEFAULT_PARAMS)
     
     # 初始状态
     initial_state = ModelState(snowpack=0.0, soilwater=50.0)
@@ -160,27 +433,32 @@ def main():
     t_span = (0.0, len(inputs_dict['temp']) - 1)
     dt = 1.0
     
+    if compare:
+        print(f"solve_ivp方法对比 ({len(observed_flow)} 天):")
+        print(f"{'方法':<8}{'雅可比矩阵':<16}{'步数':>8}{'右端项':>8}{'雅可比':>8}{'LU':>6}{'时间(秒)':>10}{'损失值':>10}{'误差(mm)':>10}")
+        for row in compare_ivp_methods(initial_state, inputs, params, t_span, dt, observed_flow):
+            status = '' if row['success'] else '  (未完成)'
+            print(f"{row['method']:<8}{row['jacobian']:<16}{row['steps']:>8}{row['nfev']:>8}{row['njev']:>8}"
+                  f"{row['nlu']:>6}{row['time']:>10.4f}{row['loss']:>10.4f}{row['error']:>10.2f}{status}")
+        return
+
     # 求解模型
     start_time = time.time()
-    t_eval, states = solve_model(initial_state, inputs, params, t_span, dt)
+    t_eval, states = solve_model(initial_state, inputs, params, t_span, dt, method=method)
     end_time = time.time()
     
-    print(f"模型求解时间: {end_time - start_time:.4f} 秒")
+    print(f"模型求解时间 ({method}): {end_time - start_time:.4f} 秒")
     
     # 计算预测流量
-    predicted_flow = np.array([
-        bucket_soil(
-            ModelState(snowpack=states[0, i], soilwater=states[1, i]),
-            params,
-            inputs.prcp[i], 0.0,
-            calculate_pet(inputs.temp[i], inputs.lday[i])
-        ).flow
-        for i in range(len(t_eval))
-    ])
+    predicted_flow = compute_outputs(states, inputs, params).flow
     
     # 计算损失
     loss = np.mean((predicted_flow - observed_flow) ** 2)
     print(f"\n损失值: {loss:.4f}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--method', default='RK45', help="solve_ivp求解方法或离散求解方法 ('euler', 'rk4')")
+    parser.add_argument('--compare', action='store_true', help='对比各solve_ivp方法的步数与运行时间')
+    args = parser.parse_args()
+    main(args.method, args.compare)
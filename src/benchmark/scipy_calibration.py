@@ -0,0 +1,195 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+from benchmark.scipy_benchmark import (
+    ModelParams, ModelState, ModelInput, PARAM_NAMES, PARAM_BOUNDS, solve_model, compute_outputs
+)
+
+# 共享内存中数组的行顺序
+SHARED_FIELDS = ('temp', 'lday', 'prcp', 'flow')
+
+# 工作进程中的全局状态 (由_init_worker设置)
+_worker: Dict[str, object] = {}
+
+class SharedForcing:
+    """放入共享内存的输入与观测流量, 工作进程按名称映射, 无需逐任务序列化"""
+
+    def __init__(self, inputs_dict: Dict[str, np.ndarray], observed_flow: np.ndarray):
+        data = np.stack([inputs_dict['temp'], inputs_dict['lday'], inputs_dict['prcp'], observed_flow])
+        self.shape = data.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+        np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)[:] = data
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """工作进程中打开共享内存 (不登记到resource_tracker, 由主进程负责释放)"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def _init_worker(shm_name: str, shape: Tuple[int, int], method: str) -> None:
+    """工作进程初始化: 映射共享内存中的输入"""
+    shm = _attach_shared_memory(shm_name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker['shm'] = shm  # 保持引用, 避免共享内存被关闭
+    _worker['inputs'] = ModelInput(**{name: data[i] for i, name in enumerate(SHARED_FIELDS[:3])})
+    _worker['observed_flow'] = data[3]
+    _worker['method'] = method
+
+def evaluate_params(params: np.ndarray, inputs: ModelInput, observed_flow: np.ndarray, method: str) -> float:
+    """单组参数的均方误差"""
+    model_params = ModelParams(**dict(zip(PARAM_NAMES, params)))
+    t_span = (0.0, len(observed_flow) - 1.0)
+    _, states = solve_model(ModelState(snowpack=0.0, soilwater=50.0), inputs, model_params, t_span, 1.0, method=method)
+    if states.shape[1] != len(observed_flow):
+        # solve_ivp提前终止 (如步长过小) 时视为无效参数
+        return np.inf
+    predicted_flow = compute_outputs(states, inputs, model_params).flow
+    loss = np.mean((predicted_flow - observed_flow) ** 2)
+    return float(loss) if np.isfinite(loss) else np.inf
+
+def _evaluate_in_worker(params: np.ndarray) -> float:
+    return evaluate_params(params, _worker['inputs'], _worker['observed_flow'], _worker['method'])
+
+def differential_evolution(evaluate_population: Callable[[np.ndarray], np.ndarray], bounds: np.ndarray,
+                           pop_size: int = 32, generations: int = 50, mutation: float = 0.7,
+                           crossover: float = 0.9, seed: int = 42,
+                           callback: Optional[Callable[[int, float, int], None]] = None
+                           ) -> Tuple[np.ndarray, float, List[float]]:
+    """DE/rand/1/bin差分进化 (按代同步评估, 每代的全部试验个体一次交给evaluate_population)
+
+    返回:
+        最优参数, 最优目标值, 每代最优目标值
+    """
+    rng = np.random.default_rng(seed)
+    low, high = bounds[:, 0], bounds[:, 1]
+    n_dims = len(bounds)
+
+    population = low + (high - low) * rng.random((pop_size, n_dims))
+    fitness = evaluate_population(population)
+    history = [float(fitness.min())]
+
+    for generation in range(generations):
+        # 变异: 每个个体选三个互不相同且不同于自身的个体
+        candidates = np.array([rng.choice(np.delete(np.arange(pop_size), i), 3, replace=False)
+                               for i in range(pop_size)])
+        a, b, c = population[candidates[:, 0]], population[candidates[:, 1]], population[candidates[:, 2]]
+        mutant = np.clip(a + mutation * (b - c), low, high)
+
+        # 二项交叉, 保证至少一维来自变异个体
+        cross = rng.random((pop_size, n_dims)) < crossover
+        cross[np.arange(pop_size), rng.integers(0, n_dims, pop_size)] = True
+        trial = np.where(cross, mutant, population)
+
+        # 选择
+        trial_fitness = evaluate_population(trial)
+        improved = trial_fitness <= fitness
+        population[improved] = trial[improved]
+        fitness[improved] = trial_fitness[improved]
+        history.append(float(fitness.min()))
+        if callback is not None:
+            callback(generation, history[-1], pop_size * (generation + 2))
+
+    best = int(np.argmin(fitness))
+    return population[best], float(fitness[best]), history
+
+def calibrate(inputs_dict: Dict[str, np.ndarray], observed_flow: np.ndarray, n_workers: int,
+              method: str = 'euler', pop_size: int = 32, generations: int = 50, seed: int = 42,
+              verbose: bool = True) -> Dict[str, object]:
+    """进程池并行率定
+
+    输入通过共享内存传给工作进程一次, 每代只传递参数矩阵的各行.
+
+    返回:
+        包含最优参数, 最优损失, 评估次数与耗时的字典
+    """
+    forcing = SharedForcing(inputs_dict, observed_flow)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(forcing.name, forcing.shape, method)) as executor:
+            chunksize = max(1, pop_size // (4 * n_workers))
+
+            def evaluate_population(population: np.ndarray) -> np.ndarray:
+                return np.fromiter(executor.map(_evaluate_in_worker, population, chunksize=chunksize),
+                                   dtype=np.float64, count=len(population))
+
+            def report(generation: int, best_loss: float, n_evals: int) -> None:
+                if verbose:
+                    print(f"  第 {generation + 1:>3} 代: 最优损失 = {best_loss:.4f}, 评估次数 = {n_evals}")
+
+            # 预热工作进程 (进程启动与导入不计入率定时间)
+            list(executor.map(_evaluate_in_worker, [PARAM_BOUNDS.mean(axis=1)] * n_workers))
+
+            start_time = time.perf_counter()
+            best_params, best_loss, history = differential_evolution(
+                evaluate_population, PARAM_BOUNDS, pop_size, generations, seed=seed, callback=report)
+            run_time = time.perf_counter() - start_time
+    finally:
+        forcing.close()
+
+    n_evals = pop_size * (generations + 1)
+    return {
+        'params': dict(zip(PARAM_NAMES, best_params.tolist())),
+        'loss': best_loss,
+        'history': history,
+        'n_evals': n_evals,
+        'run_time': run_time,
+        'evals_per_second': n_evals / run_time,
+    }
+
+def scaling_benchmark(inputs_dict: Dict[str, np.ndarray], observed_flow: np.ndarray, max_workers: int,
+                      method: str = 'euler', pop_size: int = 32, generations: int = 5) -> List[Dict[str, float]]:
+    """1到max_workers个进程的评估速度与并行效率"""
+    rows = []
+    for n_workers in range(1, max_workers + 1):
+        result = calibrate(inputs_dict, observed_flow, n_workers, method, pop_size, generations, verbose=False)
+        rows.append({'workers': n_workers, 'evals_per_second': result['evals_per_second']})
+    base = rows[0]['evals_per_second']
+    for row in rows:
+        row['speedup'] = row['evals_per_second'] / base
+        row['efficiency'] = row['speedup'] / row['workers']
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='工作进程数')
+    parser.add_argument('--method', default='euler', help="求解方法, 见scipy_benchmark.solve_model")
+    parser.add_argument('--length', type=int, default=-1, help='序列长度 (天), 默认全部')
+    parser.add_argument('--popsize', type=int, default=32, help='种群大小')
+    parser.add_argument('--generations', type=int, default=50, help='进化代数')
+    parser.add_argument('--scaling', action='store_true', help='测试1到workers个进程的并行效率')
+    args = parser.parse_args()
+
+    inputs_dict, observed_flow = load_hydro_data(get_data_path(), data_length=args.length)
+
+    if args.scaling:
+        print(f"并行效率测试 ({args.method}, {len(observed_flow)} 天, 种群 {args.popsize}):")
+        print(f"{'进程数':>6}{'评估/秒':>12}{'加速比':>10}{'效率':>8}")
+        for row in scaling_benchmark(inputs_dict, observed_flow, args.workers, args.method, args.popsize):
+            print(f"{row['workers']:>6}{row['evals_per_second']:>12.1f}{row['speedup']:>10.2f}{row['efficiency']:>8.2f}")
+        return
+
+    print(f"差分进化率定 ({args.method}, {len(observed_flow)} 天, {args.workers} 个进程):")
+    result = calibrate(inputs_dict, observed_flow, args.workers, args.method, args.popsize, args.generations)
+    print(f"\n最优损失值: {result['loss']:.4f}")
+    print("最优参数:", {name: round(value, 6) for name, value in result['params'].items()})
+    print(f"评估次数: {result['n_evals']}, 率定时间: {result['run_time']:.2f} 秒, "
+          f"{result['evals_per_second']:.1f} 次/秒")
+
+if __name__ == "__main__":
+    main()
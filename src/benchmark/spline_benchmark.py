@@ -0,0 +1,108 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import numpy as np
+import torch
+from benchmark.utils.data_loader import load_hydro_data, get_data_path
+from benchmark.utils.interpolate import natural_cubic_spline_coeffs, _natural_cubic_spline_coeffs_without_missing_values
+
+def make_gappy_forcings(n_basins: int, data_length: int, gap_fraction: float, seed: int = 42) -> torch.Tensor:
+    """构造多流域含缺测的输入 (n_basins, T, 3)
+
+    以01013500的temp, lday, prcp为基础加扰动, 再随机挖去若干段连续缺测.
+    """
+    rng = np.random.default_rng(seed)
+    inputs_dict, _ = load_hydro_data(get_data_path(), data_length=data_length)
+    base = np.stack([inputs_dict['temp'], inputs_dict['lday'], inputs_dict['prcp']], axis=-1)
+    forcings = base[None] * rng.uniform(0.8, 1.2, (n_basins, 1, 3))
+
+    # 随机缺测段, 长度1-30天
+    n_gaps = int(gap_fraction * base.shape[0] / 15)
+    for basin in range(n_basins):
+        for channel in range(3):
+            starts = rng.integers(0, base.shape[0], n_gaps)
+            lengths = rng.integers(1, 31, n_gaps)
+            for start, length in zip(starts, lengths):
+                forcings[basin, start:start + length, channel] = np.nan
+    return torch.from_numpy(forcings)
+
+def _scalar_path_coeffs(t: torch.Tensor, x: torch.Tensor):
+    """单条含缺测路径 (length,) 的系数 (向量化之前的逐时段实现)"""
+    path_no_nan = x.masked_select(~torch.isnan(x))
+    if path_no_nan.size(0) == 0:
+        return tuple(torch.zeros(x.size(0) - 1, dtype=x.dtype) for _ in range(4))
+    x = x.clone()
+    if torch.isnan(x[0]):
+        x[0] = path_no_nan[0]
+    if torch.isnan(x[-1]):
+        x[-1] = path_no_nan[-1]
+    not_nan = ~torch.isnan(x)
+    path_no_nan = x.masked_select(not_nan)
+    times_no_nan = t.masked_select(not_nan)
+    coeffs_no_nan = _natural_cubic_spline_coeffs_without_missing_values(times_no_nan, path_no_nan)
+
+    pieces = ([], [], [], [])
+    iter_times_no_nan = iter(times_no_nan)
+    iter_coeffs_no_nan = iter(zip(*coeffs_no_nan))
+    next_time_no_nan = next(iter_times_no_nan)
+    for time in t[:-1]:
+        if time >= next_time_no_nan:
+            prev_time_no_nan = next_time_no_nan
+            next_time_no_nan = next(iter_times_no_nan)
+            a, b, two_c, three_d = next(iter_coeffs_no_nan)
+        offset = prev_time_no_nan - time
+        a_inner = (0.5 * two_c - three_d * offset / 3) * offset
+        pieces[0].append(a + (a_inner - b) * offset)
+        pieces[1].append(b + (three_d * offset - two_c) * offset)
+        pieces[2].append(two_c - 2 * three_d * offset)
+        pieces[3].append(three_d)
+    return tuple(torch.stack(piece) for piece in pieces)
+
+def reference_spline_coeffs(t: torch.Tensor, x: torch.Tensor):
+    """逐流域, 逐输入的循环实现 (向量化之前的参考), x为 (n_basins, T, channels), 返回值与natural_cubic_spline_coeffs相同"""
+    coeffs = [[_scalar_path_coeffs(t, x[basin, :, channel]) for channel in range(x.size(-1))]
+              for basin in range(x.size(0))]
+    a, b, two_c, three_d = (torch.stack([torch.stack([path[k] for path in basin], dim=-1) for basin in coeffs])
+                            for k in range(4))
+    return t, a, b, two_c / 2, three_d / 3
+
+def main(n_basins: int, data_length: int, gap_fraction: float, num_runs: int, reference_basins: int):
+    forcings = make_gappy_forcings(n_basins, data_length, gap_fraction)
+    times = torch.arange(1, forcings.size(1) + 1, dtype=forcings.dtype)
+    print(f"{n_basins} 个流域 x {forcings.size(1)} 天 x 3 个输入, "
+          f"缺测比例: {torch.isnan(forcings).double().mean().item():.3f}")
+
+    run_times = []
+    for _ in range(num_runs):
+        start_time = time.perf_counter()
+        coeffs = natural_cubic_spline_coeffs(times, forcings)
+        run_times.append(time.perf_counter() - start_time)
+    print(f"样条系数计算时间: 中位数 {np.median(run_times):.4f} 秒, 最快 {min(run_times):.4f} 秒")
+    assert not any(torch.isnan(c).any() for c in coeffs[1:])
+
+    # 循环实现很慢, 只在前reference_basins个流域上计时与对比
+    reference_basins = min(reference_basins, n_basins)
+    if reference_basins > 0:
+        subset = forcings[:reference_basins]
+        start_time = time.perf_counter()
+        reference = reference_spline_coeffs(times, subset)
+        reference_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        vectorised = natural_cubic_spline_coeffs(times, subset)
+        vectorised_time = time.perf_counter() - start_time
+        error = max(float((r - v).abs().max()) for r, v in zip(reference[1:], vectorised[1:]))
+        print(f"{reference_basins} 个流域: 循环实现 {reference_time:.4f} 秒, 向量化实现 {vectorised_time:.4f} 秒, "
+              f"加速比 {reference_time / vectorised_time:.1f}, 系数最大绝对误差 {error:.3e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--basins', type=int, default=100, help='流域数量')
+    parser.add_argument('--length', type=int, default=10000, help='序列长度 (天)')
+    parser.add_argument('--gap-fraction', type=float, default=0.05, help='缺测比例 (近似)')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数')
+    parser.add_argument('--reference-basins', type=int, default=2, help='与循环实现对比的流域数 (0为不对比)')
+    args = parser.parse_args()
+    main(args.basins, args.length, args.gap_fraction, args.runs, args.reference_basins)
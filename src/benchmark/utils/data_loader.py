@@ -1,33 +1,160 @@
-import pandas as pd
+import hashlib
+import json
+import os
 import numpy as np
-from typing import Tuple, Dict
+from dataclasses import dataclass, field
+from typing import Tuple, Dict, Optional, Sequence
 from pathlib import Path
 
+DATA_DIR = Path(__file__).parent.parent.parent.parent / 'data'
+CACHE_DIR = DATA_DIR / '.cache'
+
+@dataclass
+class DatasetSpec:
+    """数据集描述: 文件路径模板与列名映射 (统一名称 -> CSV列名), 未映射的数值列保留原名"""
+    path: str
+    columns: Dict[str, str] = field(default_factory=dict)
+    default_basin: Optional[str] = None
+
+DATASETS: Dict[str, DatasetSpec] = {
+    'exphydro': DatasetSpec('exphydro/{basin}.csv', {
+        'temp': 'tmean(C)', 'lday': 'dayl(day)', 'prcp': 'prcp(mm/day)', 'pet': 'pet(mm)',
+        'srad': 'srad(W/m2)', 'vp': 'vp(Pa)', 'flow': 'flow(mm)',
+    }, default_basin='01013500'),
+    'm50': DatasetSpec('m50/{basin}.csv', {
+        'temp': 'Temp', 'lday': 'Lday', 'prcp': 'Prcp', 'pet': 'Pet', 'flow': 'Flow',
+        'snowpack': 'SnowWater', 'soilwater': 'SoilWater',
+    }, default_basin='01013500'),
+    'gr4j': DatasetSpec('gr4j/sample.csv', {'prcp': 'prec', 'flow': 'qobs'}),
+    'hbv_edu': DatasetSpec('hbv_edu/hbv_sample.csv', {'prcp': 'prec'}),
+    'hymod': DatasetSpec('hymod/sample.csv', {'prcp': 'precip', 'flow': 'q'}),
+    'cemaneige': DatasetSpec('cemaneige/sample.csv', {'prcp': 'precipitation', 'temp': 'mean_temp'}),
+    'symhyd': DatasetSpec('symhyd/sample.csv', {'prcp': 'precip', 'flow': 'q'}),
+}
+
+def _file_hash(file_path: str) -> str:
+    """计算文件内容的哈希值"""
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _cache_paths(file_path: str) -> Tuple[Path, Path]:
+    """缓存文件路径 (数组与元数据), 按源文件绝对路径区分"""
+    file_path = os.path.abspath(file_path)
+    key = hashlib.sha1(file_path.encode()).hexdigest()[:12]
+    stem = f"{Path(file_path).parent.name}-{Path(file_path).stem}-{key}"
+    return CACHE_DIR / f"{stem}.npy", CACHE_DIR / f"{stem}.json"
+
+def _build_cache(file_path: str, array_path: Path, meta_path: Path, file_hash: str) -> dict:
+    """解析CSV并写入列优先的float64数组缓存"""
+    # pandas只在缓存缺失或失效时需要, 延迟导入以缩短启动时间
+    import pandas as pd
+    df = pd.read_csv(file_path)
+    columns = [name for name in df.columns
+               if pd.api.types.is_numeric_dtype(df[name]) and not name.startswith('Unnamed')]
+    # (n_columns, n_rows): 每列连续存储, 截取前n行得到的是连续视图
+    array = np.ascontiguousarray(df[columns].to_numpy(dtype=np.float64).T)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再替换, 避免并行的进程读到写了一半的缓存
+    tmp_array_path = array_path.with_suffix(f'.{os.getpid()}.tmp.npy')
+    np.save(tmp_array_path, array)
+    os.replace(tmp_array_path, array_path)
+
+    stat = os.stat(file_path)
+    meta = {'source': os.path.abspath(file_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'hash': file_hash, 'columns': columns}
+    tmp_meta_path = meta_path.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp_meta_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta_path, meta_path)
+    return meta
+
+def load_cached_table(file_path: str) -> Tuple[np.ndarray, Dict[str, int]]:
+    """读取CSV的数值列缓存
+
+    首次读取时解析CSV并保存为.npy; 之后以内存映射方式打开. 源文件的修改时间与大小未变时直接使用缓存,
+    否则比较文件哈希, 内容变化时重建缓存.
+
+    返回:
+        (n_columns, n_rows) 只读内存映射数组, 以及列名到行号的映射
+    """
+    array_path, meta_path = _cache_paths(file_path)
+    stat = os.stat(file_path)
+
+    meta = None
+    if array_path.exists() and meta_path.exists():
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (meta['mtime_ns'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+            file_hash = _file_hash(file_path)
+            if meta['hash'] == file_hash:
+                # 仅修改时间变化 (如重新检出), 更新元数据即可
+                meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                with open(meta_path, 'w') as f:
+                    json.dump(meta, f)
+            else:
+                meta = None
+    if meta is None:
+        meta = _build_cache(file_path, array_path, meta_path, _file_hash(file_path))
+
+    array = np.load(array_path, mmap_mode='r')
+    return array, {name: i for i, name in enumerate(meta['columns'])}
+
+def load_columns(file_path: str, columns: Sequence[str], data_length: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """读取指定列的前data_length行 (零拷贝的float64只读视图)"""
+    array, index = load_cached_table(file_path)
+    missing = [name for name in columns if name not in index]
+    if missing:
+        raise KeyError(f"{file_path} 中没有列 {missing}, 可用的列: {list(index)}")
+    rows = slice(None) if data_length is None or data_length < 0 else slice(0, data_length)
+    return {name: array[index[name], rows] for name in columns}
+
+def load_dataset(name: str, columns: Optional[Sequence[str]] = None, data_length: Optional[int] = None,
+                 basin: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """按统一列名读取data/下的数据集
+
+    参数:
+        name: DATASETS中的数据集名称
+        columns: 统一列名 (或未映射的原列名), 默认为全部数值列
+        data_length: 读取的行数, 默认全部
+        basin: 按流域存放的数据集 (exphydro, m50) 的流域编号
+    """
+    spec = DATASETS[name]
+    file_path = str(DATA_DIR / spec.path.format(basin=basin or spec.default_basin))
+    _, index = load_cached_table(file_path)
+    renamed = {csv_name: unified for unified, csv_name in spec.columns.items()}
+    if columns is None:
+        columns = [renamed.get(csv_name, csv_name) for csv_name in index]
+    csv_columns = [spec.columns.get(column, column) for column in columns]
+    views = load_columns(file_path, csv_columns, data_length)
+    return {column: views[csv_name] for column, csv_name in zip(columns, csv_columns)}
+
 def load_hydro_data(file_path: str, data_length: int=-1) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
     """
     加载水文数据
-    
+
     参数:
         file_path: CSV文件路径
-        
+        data_length: 读取的行数, 小于0时读取全部
+
     返回:
-        Tuple[Dict[str, np.ndarray], np.ndarray]: 输入数据和观测流量
+        Tuple[Dict[str, np.ndarray], np.ndarray]: 输入数据和观测流量 (缓存的只读视图)
     """
-    # 读取CSV文件
-    df = pd.read_csv(file_path)
-    
+    spec = DATASETS['exphydro']
+    data = load_columns(file_path, [spec.columns[name] for name in ('temp', 'lday', 'prcp', 'flow')], data_length)
+
     # 提取输入数据
     inputs = {
-        'temp': df['tmean(C)'].values[:data_length],  # 温度
-        'lday': df['dayl(day)'].values[:data_length],  # 日照时长
-        'prcp': df['prcp(mm/day)'].values[:data_length],  # 降水量
+        'temp': data[spec.columns['temp']],  # 温度
+        'lday': data[spec.columns['lday']],  # 日照时长
+        'prcp': data[spec.columns['prcp']],  # 降水量
     }
-    
+
     # 提取观测流量
-    observed_flow = df['flow(mm)'].values[:data_length]
-    
+    observed_flow = data[spec.columns['flow']]
+
     return inputs, observed_flow
 
 def get_data_path() -> str:
     """获取数据文件路径"""
-    return str(Path(__file__).parent.parent.parent.parent / 'data' / 'exphydro' / '01013500.csv') 
\ No newline at end of file
+    return str(DATA_DIR / 'exphydro' / '01013500.csv')
@@ -0,0 +1,176 @@
+import json
+import os
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+from benchmark.utils.data_loader import CACHE_DIR, DATASETS, load_columns
+
+STORE_DIR = CACHE_DIR / 'stores'
+
+BasinSelection = Union[None, str, Sequence[str]]
+
+class ForcingStore:
+    """多流域输入存储: 内存映射的 (n_basins, T, n_vars) float64数组
+
+    所有流域对齐到同一日尺度时间轴, 缺少的时段或变量填充NaN. 按流域编号与日期的定位均为O(1),
+    连续的流域范围与时间窗口返回视图而不复制. 通过pickle传给子进程时只传递存储路径,
+    子进程重新映射同一文件, 共享操作系统的页缓存.
+
+    示例:
+        store = ForcingStore.build({'01013500': get_data_path()}, 'data/.cache/stores/camels')
+        forcing = store.select(['01013500'], start='1990-01-01', end='1999-12-31', variables=['temp', 'prcp'])
+
+    多进程共享的示例见forcing_store_benchmark.py.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path / 'meta.json') as f:
+            meta = json.load(f)
+        self.basin_ids: List[str] = meta['basin_ids']
+        self.variables: List[str] = meta['variables']
+        self.start_date = np.datetime64(meta['start_date'], 'D')
+        self.data = np.load(self.path / 'data.npy', mmap_mode='r')
+        self._basin_index = {basin: i for i, basin in enumerate(self.basin_ids)}
+        self._variable_index = {name: i for i, name in enumerate(self.variables)}
+
+    def __reduce__(self):
+        # 只序列化路径, 子进程中重新打开内存映射
+        return (ForcingStore, (str(self.path),))
+
+    def __repr__(self) -> str:
+        return (f"ForcingStore({str(self.path)!r}, basins={len(self.basin_ids)}, "
+                f"dates={self.start_date}..{self.end_date}, variables={self.variables})")
+
+    @property
+    def n_steps(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def end_date(self) -> np.datetime64:
+        return self.start_date + np.timedelta64(self.n_steps - 1, 'D')
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.start_date + np.arange(self.n_steps).astype('timedelta64[D]')
+
+    def time_index(self, date) -> int:
+        """日期对应的时间索引"""
+        index = int((np.datetime64(date, 'D') - self.start_date).astype(int))
+        if not 0 <= index < self.n_steps:
+            raise KeyError(f"日期 {date} 不在 {self.start_date} 至 {self.end_date} 范围内")
+        return index
+
+    def time_window(self, start=None, end=None) -> slice:
+        """时间窗口 [start, end] (含两端) 对应的切片"""
+        return slice(0 if start is None else self.time_index(start),
+                     self.n_steps if end is None else self.time_index(end) + 1)
+
+    def basin_indices(self, basins: BasinSelection) -> Union[slice, np.ndarray]:
+        """流域编号对应的索引, 连续的流域返回切片以保持视图"""
+        return self._indices(basins, self._basin_index, '流域')
+
+    def variable_indices(self, variables: BasinSelection) -> Union[slice, np.ndarray]:
+        """变量名对应的索引, 连续的变量返回切片以保持视图"""
+        return self._indices(variables, self._variable_index, '变量')
+
+    @staticmethod
+    def _indices(keys: BasinSelection, index: Dict[str, int], kind: str) -> Union[slice, np.ndarray]:
+        if keys is None:
+            return slice(None)
+        if isinstance(keys, str):
+            keys = [keys]
+        missing = [key for key in keys if key not in index]
+        if missing:
+            raise KeyError(f"未知的{kind}: {missing}")
+        positions = np.array([index[key] for key in keys])
+        if len(positions) > 0 and np.array_equal(positions, np.arange(positions[0], positions[0] + len(positions))):
+            return slice(int(positions[0]), int(positions[0]) + len(positions))
+        return positions
+
+    def select(self, basins: BasinSelection = None, start=None, end=None,
+               variables: BasinSelection = None) -> np.ndarray:
+        """按流域, 时间窗口与变量取数据
+
+        返回:
+            (n_basins, T, n_vars) 数组. 流域与变量均为连续范围时是内存映射的只读视图, 否则为副本
+        """
+        basin_index = self.basin_indices(basins)
+        variable_index = self.variable_indices(variables)
+        data = self.data[:, self.time_window(start, end)]
+        if isinstance(basin_index, slice) and isinstance(variable_index, slice):
+            return data[basin_index, :, variable_index]
+        # 两个维度都用数组索引时numpy会合并维度, 因此分两步
+        return data[basin_index][..., variable_index]
+
+    def select_basin(self, basin: str, start=None, end=None) -> Dict[str, np.ndarray]:
+        """取单个流域的全部变量, 返回变量名到 (T,) 视图的字典"""
+        data = self.data[self._basin_index[basin], self.time_window(start, end)]
+        return {name: data[:, i] for name, i in self._variable_index.items()}
+
+    @classmethod
+    def build(cls, files: Dict[str, str], path: Union[str, Path],
+              variables: Sequence[str] = ('temp', 'lday', 'prcp', 'flow'), dataset: str = 'exphydro',
+              start_dates: Optional[Dict[str, str]] = None) -> 'ForcingStore':
+        """由多个流域的CSV构建存储
+
+        参数:
+            files: 流域编号到CSV路径的映射
+            path: 存储目录
+            variables: 统一变量名 (见data_loader.DATASETS中的列名映射), 文件中没有的变量填充NaN
+            dataset: 列名映射所用的数据集
+            start_dates: 没有date列的文件的起始日期
+        """
+        import pandas as pd
+
+        spec = DATASETS[dataset]
+        start_dates = start_dates or {}
+
+        # 读取各流域的日期与变量 (通过data_loader的列缓存)
+        records = {}
+        for basin, file_path in files.items():
+            header = pd.read_csv(file_path, nrows=0).columns
+            if 'date' in header:
+                dates = pd.to_datetime(pd.read_csv(file_path, usecols=['date'])['date']).values.astype('datetime64[D]')
+            elif basin in start_dates:
+                n_rows = len(pd.read_csv(file_path, usecols=[header[0]]))
+                dates = np.datetime64(start_dates[basin], 'D') + np.arange(n_rows).astype('timedelta64[D]')
+            else:
+                raise ValueError(f"{file_path} 没有date列, 请在start_dates中给出流域 {basin} 的起始日期")
+            if len(dates) > 1 and np.any(np.diff(dates) != np.timedelta64(1, 'D')):
+                raise ValueError(f"{file_path} 的日期不是连续的日序列")
+
+            available = [name for name in variables if spec.columns.get(name, name) in header]
+            columns = load_columns(file_path, [spec.columns.get(name, name) for name in available])
+            records[basin] = (dates, {name: columns[spec.columns.get(name, name)] for name in available})
+
+        start_date = min(dates[0] for dates, _ in records.values())
+        end_date = max(dates[-1] for dates, _ in records.values())
+        n_steps = int((end_date - start_date).astype(int)) + 1
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        # 重建时先删除meta.json, 使存储在写入期间不可打开; 已映射旧data.npy的进程仍读到旧文件
+        (path / 'meta.json').unlink(missing_ok=True)
+        # 先写临时文件再替换, 不原地截断正在被其他进程映射的data.npy
+        tmp_data_path = path / f'data.npy.{os.getpid()}.tmp'
+        data = np.lib.format.open_memmap(tmp_data_path, mode='w+', dtype=np.float64,
+                                         shape=(len(files), n_steps, len(variables)))
+        data[:] = np.nan
+        for i, (dates, columns) in enumerate(records.values()):
+            offset = int((dates[0] - start_date).astype(int))
+            for j, name in enumerate(variables):
+                if name in columns:
+                    data[i, offset:offset + len(dates), j] = columns[name]
+        data.flush()
+        del data
+        os.replace(tmp_data_path, path / 'data.npy')
+
+        # 元数据最后写入, 存在meta.json即表示存储完整
+        tmp_meta_path = path / f'meta.json.{os.getpid()}.tmp'
+        with open(tmp_meta_path, 'w') as f:
+            json.dump({'basin_ids': list(files), 'variables': list(variables),
+                       'start_date': str(start_date), 'dataset': dataset}, f)
+        os.replace(tmp_meta_path, path / 'meta.json')
+        return cls(path)
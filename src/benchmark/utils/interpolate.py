@@ -1,13 +1,6 @@
 import math
 import torch
-import numpy as np
-
-def cheap_stack(tensors, dim):
-    if len(tensors) == 1:
-        return tensors[0].unsqueeze(dim)
-    else:
-        return torch.stack(tensors, dim=dim)
-
+import torch.nn.functional as F
 
 def tridiagonal_solve(b, A_upper, A_diagonal, A_lower):
     """Solves a tridiagonal system Ax = b.
@@ -36,34 +29,45 @@ def tridiagonal_solve(b, A_upper, A_diagonal, A_lower):
     Returns:
         A tensor of shape (..., k), corresponding to the x solving Ax = b
 
-    Warning:
-        This implementation isn't super fast. You probably want to cache the result, if possible.
+    This uses parallel cyclic reduction: each of the ceil(log2(k)) rounds eliminates the couplings to the rows `stride`
+    away from every row at once, so the whole solve is a handful of batched tensor operations (and autograd nodes) per
+    round rather than per knot. Cyclic reduction doesn't pivot, which is fine for the diagonally dominant systems
+    that arise from spline interpolation.
     """
 
-    # This implementation is very much written for clarity rather than speed.
-
     A_upper, _ = torch.broadcast_tensors(A_upper, b[..., :-1])
     A_lower, _ = torch.broadcast_tensors(A_lower, b[..., :-1])
     A_diagonal, b = torch.broadcast_tensors(A_diagonal, b)
 
     channels = b.size(-1)
 
-    new_b = np.empty(channels, dtype=object)
-    new_A_diagonal = np.empty(channels, dtype=object)
-    outs = np.empty(channels, dtype=object)
-
-    new_b[0] = b[..., 0]
-    new_A_diagonal[0] = A_diagonal[..., 0]
-    for i in range(1, channels):
-        w = A_lower[..., i - 1] / new_A_diagonal[i - 1]
-        new_A_diagonal[i] = A_diagonal[..., i] - w * A_upper[..., i - 1]
-        new_b[i] = b[..., i] - w * new_b[i - 1]
-
-    outs[channels - 1] = new_b[channels - 1] / new_A_diagonal[channels - 1]
-    for i in range(channels - 2, -1, -1):
-        outs[i] = (new_b[i] - A_upper[..., i] * outs[i + 1]) / new_A_diagonal[i]
-
-    return torch.stack(outs.tolist(), dim=-1)
+    # Pad the off-diagonals to length k, so that row i reads lower[i] * x[i - 1] + diagonal[i] * x[i] + upper[i] * x[i + 1]
+    lower = F.pad(A_lower, (1, 0))
+    upper = F.pad(A_upper, (0, 1))
+    diagonal = A_diagonal
+    rhs = b
+
+    # Rows outside [0, k) act as the identity equation x = 0, so they never contribute.
+    stride = 1
+    while stride < channels:
+        lower_prev = F.pad(lower[..., :-stride], (stride, 0))
+        upper_prev = F.pad(upper[..., :-stride], (stride, 0))
+        diagonal_prev = F.pad(diagonal[..., :-stride], (stride, 0), value=1.)
+        rhs_prev = F.pad(rhs[..., :-stride], (stride, 0))
+        lower_next = F.pad(lower[..., stride:], (0, stride))
+        upper_next = F.pad(upper[..., stride:], (0, stride))
+        diagonal_next = F.pad(diagonal[..., stride:], (0, stride), value=1.)
+        rhs_next = F.pad(rhs[..., stride:], (0, stride))
+
+        alpha = -lower / diagonal_prev
+        gamma = -upper / diagonal_next
+        diagonal = diagonal + alpha * upper_prev + gamma * lower_next
+        rhs = rhs + alpha * rhs_prev + gamma * rhs_next
+        lower = alpha * lower_prev
+        upper = gamma * upper_next
+        stride *= 2
+
+    return rhs / diagonal
 
 def _validate_input(t, X):
     if not t.is_floating_point():
@@ -72,10 +76,8 @@ def _validate_input(t, X):
         raise ValueError("X must both be floating point.")
     if len(t.shape) != 1:
         raise ValueError("t must be one dimensional. It instead has shape {}.".format(tuple(t.shape)))
-    prev_t_i = -math.inf
-    for t_i in t:
-        if t_i <= prev_t_i:
-            raise ValueError("t must be monotonically increasing.")
+    if (t[1:] <= t[:-1]).any():
+        raise ValueError("t must be monotonically increasing.")
 
     if X.ndimension() < 2:
         raise ValueError("X must have at least two dimensions, corresponding to time and channels. It instead has "
@@ -141,44 +143,17 @@ def _natural_cubic_spline_coeffs_without_missing_values(t, x):
 
 
 def _natural_cubic_spline_coeffs_with_missing_values(t, x):
-    if x.ndimension() == 1:
-        # We have to break everything down to individual scalar paths because of the possibility of missing values
-        # being different in different channels
-        return _natural_cubic_spline_coeffs_with_missing_values_scalar(t, x)
-    else:
-        a_pieces = []
-        b_pieces = []
-        two_c_pieces = []
-        three_d_pieces = []
-        for p in x.unbind(dim=0):  # TODO: parallelise over this
-            a, b, two_c, three_d = _natural_cubic_spline_coeffs_with_missing_values(t, p)
-            a_pieces.append(a)
-            b_pieces.append(b)
-            two_c_pieces.append(two_c)
-            three_d_pieces.append(three_d)
-        return (cheap_stack(a_pieces, dim=0),
-                cheap_stack(b_pieces, dim=0),
-                cheap_stack(two_c_pieces, dim=0),
-                cheap_stack(three_d_pieces, dim=0))
-
-
-def _natural_cubic_spline_coeffs_with_missing_values_scalar(t, x):
-    # t and x both have shape (length,)
+    # x should be a tensor of shape (..., length), and may have missing values in different places along every path.
+    # Rather than splitting into scalar paths, we move the observed entries of every path to the front, solve all of the
+    # resulting (padded) tridiagonal systems at once, and then gather the pieces back onto the full time grid.
 
+    length = x.size(-1)
     not_nan = ~torch.isnan(x)
-    path_no_nan = x.masked_select(not_nan)
-
-    if path_no_nan.size(0) == 0:
-        # Every entry is a NaN, so we take a constant path with derivative zero, so return zero coefficients.
-        # Note that we may assume that X.size(0) >= 2 by the checks in __init__ so "X.size(0) - 1" is a valid
-        # thing to do.
-        return (torch.zeros(x.size(0) - 1, dtype=x.dtype, device=x.device),
-                torch.zeros(x.size(0) - 1, dtype=x.dtype, device=x.device),
-                torch.zeros(x.size(0) - 1, dtype=x.dtype, device=x.device),
-                torch.zeros(x.size(0) - 1, dtype=x.dtype, device=x.device))
-    # else we have at least one non-NaN entry, in which case we're going to impute at least one more entry (as
-    # the path is of length at least 2 so the start and the end aren't the same), so we will then have at least two
-    # non-Nan entries. In particular we can call _compute_coeffs safely later.
+
+    # If every entry of a path is a NaN then we take a constant path with derivative zero, i.e. zero coefficients.
+    all_nan = ~not_nan.any(dim=-1, keepdim=True)
+    x = torch.where(all_nan, torch.zeros_like(x), x)
+    not_nan = not_nan | all_nan
 
     # How to deal with missing values at the start or end of the time series? We're creating some splines, so one
     # option is just to extend the first piece backwards, and the final piece forwards. But polynomials tend to
@@ -186,57 +161,65 @@ def _natural_cubic_spline_coeffs_with_missing_values_scalar(t, x):
     # being awful.
     # Instead we impute an observation at the very start equal to the first actual observation made, and impute an
     # observation at the very end equal to the last actual observation made, and then proceed with splines as
-    # normal.
-    need_new_not_nan = False
-    if torch.isnan(x[0]):
-        if not need_new_not_nan:
-            x = x.clone()
-            need_new_not_nan = True
-        x[0] = path_no_nan[0]
-    if torch.isnan(x[-1]):
-        if not need_new_not_nan:
-            x = x.clone()
-            need_new_not_nan = True
-        x[-1] = path_no_nan[-1]
-    if need_new_not_nan:
-        not_nan = ~torch.isnan(x)
-        path_no_nan = x.masked_select(not_nan)
-    times_no_nan = t.masked_select(not_nan)
-
-    # Find the coefficients on the pieces we do understand
-    # These all have shape (len - 1,)
-    (a_pieces_no_nan,
-     b_pieces_no_nan,
-     two_c_pieces_no_nan,
-     three_d_pieces_no_nan) = _natural_cubic_spline_coeffs_without_missing_values(times_no_nan, path_no_nan)
-
-    # Now we're going to normalise them to give coefficients on every interval
-    a_pieces = []
-    b_pieces = []
-    two_c_pieces = []
-    three_d_pieces = []
-
-    iter_times_no_nan = iter(times_no_nan)
-    iter_coeffs_no_nan = iter(zip(a_pieces_no_nan, b_pieces_no_nan, two_c_pieces_no_nan, three_d_pieces_no_nan))
-    next_time_no_nan = next(iter_times_no_nan)
-    for time in t[:-1]:
-        # will always trigger on the first iteration because of how we've imputed missing values at the start and
-        # end of the time series.
-        if time >= next_time_no_nan:
-            prev_time_no_nan = next_time_no_nan
-            next_time_no_nan = next(iter_times_no_nan)
-            next_a_no_nan, next_b_no_nan, next_two_c_no_nan, next_three_d_no_nan = next(iter_coeffs_no_nan)
-        offset = prev_time_no_nan - time
-        a_inner = (0.5 * next_two_c_no_nan - next_three_d_no_nan * offset / 3) * offset
-        a_pieces.append(next_a_no_nan + (a_inner - next_b_no_nan) * offset)
-        b_pieces.append(next_b_no_nan + (next_three_d_no_nan * offset - next_two_c_no_nan) * offset)
-        two_c_pieces.append(next_two_c_no_nan - 2 * next_three_d_no_nan * offset)
-        three_d_pieces.append(next_three_d_no_nan)
-
-    return (cheap_stack(a_pieces, dim=0),
-            cheap_stack(b_pieces, dim=0),
-            cheap_stack(two_c_pieces, dim=0),
-            cheap_stack(three_d_pieces, dim=0))
+    # normal. (argmax returns the first maximal index.)
+    first_index = not_nan.to(torch.uint8).argmax(dim=-1, keepdim=True)
+    last_index = length - 1 - not_nan.flip(-1).to(torch.uint8).argmax(dim=-1, keepdim=True)
+    x = torch.cat([torch.where(not_nan[..., :1], x[..., :1], x.gather(-1, first_index)),
+                   x[..., 1:-1],
+                   torch.where(not_nan[..., -1:], x[..., -1:], x.gather(-1, last_index))], dim=-1)
+    not_nan = ~torch.isnan(x)
+
+    # Move the observed entries of every path to the front (a stable sort keeps them in time order). Each path now
+    # has num_no_nan >= 2 knots, followed by padding.
+    order = torch.argsort((~not_nan).to(torch.uint8), dim=-1, stable=True)
+    num_no_nan = not_nan.sum(dim=-1, keepdim=True)
+    positions = torch.arange(length, device=x.device)
+    knot_valid = positions < num_no_nan
+    piece_valid = positions[:-1] + 1 < num_no_nan
+    times_no_nan = t.expand_as(x).gather(-1, order)
+    path_no_nan = torch.where(knot_valid, x.gather(-1, order), torch.zeros_like(x))
+
+    # Same system as _natural_cubic_spline_coeffs_without_missing_values, except that the padding rows are decoupled
+    # from everything else (zero off-diagonals, unit diagonal, zero right hand side) and so solve to zero.
+    time_diffs = torch.where(piece_valid, times_no_nan[..., 1:] - times_no_nan[..., :-1],
+                             torch.ones_like(times_no_nan[..., 1:]))
+    time_diffs_reciprocal = torch.where(piece_valid, time_diffs.reciprocal(), torch.zeros_like(time_diffs))
+    time_diffs_reciprocal_squared = time_diffs_reciprocal ** 2
+    three_path_diffs = 3 * (path_no_nan[..., 1:] - path_no_nan[..., :-1])
+    six_path_diffs = 2 * three_path_diffs
+    path_diffs_scaled = three_path_diffs * time_diffs_reciprocal_squared
+
+    system_diagonal = 2 * (F.pad(time_diffs_reciprocal, (0, 1)) + F.pad(time_diffs_reciprocal, (1, 0)))
+    system_diagonal = torch.where(knot_valid, system_diagonal, torch.ones_like(system_diagonal))
+    system_rhs = F.pad(path_diffs_scaled, (0, 1)) + F.pad(path_diffs_scaled, (1, 0))
+    knot_derivatives = tridiagonal_solve(system_rhs, time_diffs_reciprocal, system_diagonal, time_diffs_reciprocal)
+
+    a_pieces_no_nan = path_no_nan[..., :-1]
+    b_pieces_no_nan = knot_derivatives[..., :-1]
+    two_c_pieces_no_nan = (six_path_diffs * time_diffs_reciprocal
+                           - 4 * knot_derivatives[..., :-1]
+                           - 2 * knot_derivatives[..., 1:]) * time_diffs_reciprocal
+    three_d_pieces_no_nan = (-six_path_diffs * time_diffs_reciprocal
+                             + 3 * (knot_derivatives[..., :-1]
+                                    + knot_derivatives[..., 1:])) * time_diffs_reciprocal_squared
+
+    # Now we're going to normalise them to give coefficients on every interval. Interval i of the full grid lies in
+    # the piece starting at the last observed time <= t[i]; as t[0] is always observed, its index is the number of
+    # observations up to and including i, minus one.
+    piece_index = not_nan[..., :-1].cumsum(dim=-1) - 1
+    next_a_no_nan = a_pieces_no_nan.gather(-1, piece_index)
+    next_b_no_nan = b_pieces_no_nan.gather(-1, piece_index)
+    next_two_c_no_nan = two_c_pieces_no_nan.gather(-1, piece_index)
+    next_three_d_no_nan = three_d_pieces_no_nan.gather(-1, piece_index)
+    offset = times_no_nan.gather(-1, piece_index) - t[:-1]
+
+    a_inner = (0.5 * next_two_c_no_nan - next_three_d_no_nan * offset / 3) * offset
+    a = next_a_no_nan + (a_inner - next_b_no_nan) * offset
+    b = next_b_no_nan + (next_three_d_no_nan * offset - next_two_c_no_nan) * offset
+    two_c = next_two_c_no_nan - 2 * next_three_d_no_nan * offset
+    three_d = next_three_d_no_nan
+
+    return a, b, two_c, three_d
 
 
 # The mathematics of this are adapted from  http://mathworld.wolfram.com/CubicSpline.html, although they only treat the
@@ -328,34 +311,60 @@ class NaturalCubicSpline:
         t, a, b, c, d = coeffs
 
         self._t = t
-        self._a = a
-        self._b = b
-        self._c = c
-        self._d = d
+        # Stacked so that a lookup is a single index_select; _a, _b, _c, _d are views into it.
+        self._coeffs = torch.stack([a, b, c, d])
+        self._a, self._b, self._c, self._d = self._coeffs.unbind(0)
+
+        # If the knots are evenly spaced (e.g. daily forcings) then the piece containing a time can be found by a
+        # division rather than a binary search.
+        time_diffs = t[1:] - t[:-1]
+        self._uniform = bool(torch.allclose(time_diffs, time_diffs[0].expand_as(time_diffs)))
+        self._t0 = t[0].item()
+        self._dt = time_diffs[0].item()
 
     def _interpret_t(self, t):
         maxlen = self._b.size(-2) - 1
-        index = torch.bucketize(t.detach(), self._t) - 1
+        if self._uniform and t.dim() == 0 and not torch.compiler.is_compiling():
+            # A single time in eager mode (as inside an ODE solver): find the piece with Python arithmetic and index
+            # with a plain int, which is much cheaper than launching several tiny tensor operations.
+            index = min(max(math.floor((t.item() - self._t0) / self._dt), 0), maxlen)
+            return t - self._t[index], index
+        elif self._uniform:
+            # Evenly spaced knots: a division rather than a binary search. This stays in tensor ops (no .item()) when
+            # compiling, so that a scalar time inside a compiled ODE RHS does not cause a graph break.
+            index = torch.floor((t.detach() - self._t0) / self._dt).long()
+        else:
+            index = torch.bucketize(t.detach(), self._t) - 1
         index = index.clamp(0, maxlen)  # clamp because t may go outside of [t[0], t[-1]]; this is fine
         # will never access the last element of self._t; this is correct behaviour
-        fractional_part = t - self._t[index]
+        fractional_part = t - self._t.index_select(0, index.reshape(-1)).reshape(index.shape)
         return fractional_part, index
 
+    def _select(self, index):
+        if isinstance(index, int):
+            return self._a[..., index, :], self._b[..., index, :], self._c[..., index, :], self._d[..., index, :]
+        # Same as (self._a[..., index, :], ..., self._d[..., index, :]), but index_select keeps a 0-dimensional index as
+        # a tensor rather than converting it to a Python int (which is a host sync and a torch.compile graph break).
+        selected = self._coeffs.index_select(-2, index.reshape(-1))
+        return selected.reshape(self._coeffs.shape[:-2] + index.shape + self._coeffs.shape[-1:]).unbind(0)
+
     def evaluate(self, t):
         fractional_part, index = self._interpret_t(t)
         fractional_part = fractional_part.unsqueeze(-1)
-        inner = self._c[..., index, :] + self._d[..., index, :] * fractional_part
-        inner = self._b[..., index, :] + inner * fractional_part
-        return self._a[..., index, :] + inner * fractional_part
+        a, b, c, d = self._select(index)
+        inner = c + d * fractional_part
+        inner = b + inner * fractional_part
+        return a + inner * fractional_part
 
     def derivative(self, t, order=1):
         fractional_part, index = self._interpret_t(t)
         fractional_part = fractional_part.unsqueeze(-1)
+        _, b, c, d = self._select(index)
         if order == 1:
-            inner = 2 * self._c[..., index, :] + 3 * self._d[..., index, :] * fractional_part
-            deriv = self._b[..., index, :] + inner * fractional_part
+            inner = 2 * c + 3 * d * fractional_part
+            deriv = b + inner * fractional_part
         elif order == 2:
-            deriv = 2 * self._c[..., index, :] + 6 * self._d[..., index, :] * fractional_part
+            deriv = 2 * c + 6 * d * fractional_part
         else:
             raise ValueError('Derivative is not implemented for orders greater than 2.')
-        return deriv
\ No newline at end of file
+        return deriv
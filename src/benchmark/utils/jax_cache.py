@@ -0,0 +1,87 @@
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+import jax
+
+from benchmark.utils.data_loader import CACHE_DIR
+
+# 项目内的持久化编译缓存目录 (在data/.cache下, 不纳入版本控制)
+JAX_CACHE_DIR = CACHE_DIR / 'jax'
+
+def enable_compilation_cache(path: Union[str, Path, None] = None) -> Path:
+    """启用JAX持久化编译缓存
+
+    默认目录为JAX_CACHE_DIR, 可由环境变量JAX_COMPILATION_CACHE_DIR覆盖.
+    所有编译结果都写入缓存 (不设最短编译时间与最小条目大小), 须在第一次编译之前调用.
+    含主机回调的程序不会写入缓存: 调用方需在导入diffrax之前设置EQX_ON_ERROR=nan, 使运行时检查
+    不经主机回调 (出错时返回NaN而不报错, 因此只应在脚本入口处设置, 见jax_benchmark_jit).
+    """
+    path = Path(path or os.environ.get('JAX_COMPILATION_CACHE_DIR') or JAX_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    jax.config.update('jax_compilation_cache_dir', str(path))
+    jax.config.update('jax_persistent_cache_min_compile_time_secs', 0)
+    jax.config.update('jax_persistent_cache_min_entry_size_bytes', 0)
+    return path
+
+# 持久化缓存命中次数 (由JAX的监控事件累计)
+_cache_hits = 0
+
+def _count_cache_hits(event: str, **kwargs) -> None:
+    global _cache_hits
+    if event == '/jax/compilation_cache/cache_hits':
+        _cache_hits += 1
+
+jax.monitoring.register_event_listener(_count_cache_hits)
+
+@dataclass
+class CompileStats:
+    """一次AOT编译的耗时"""
+    lower_time: float    # 追踪与降级到StableHLO
+    compile_time: float  # XLA编译 (或从持久化缓存读取)
+    cache_hit: bool      # 结果来自持久化缓存
+
+def _signature(args: Tuple[Any, ...]) -> Hashable:
+    """按pytree结构与各叶子的形状, 类型 (含弱类型标记) 生成键"""
+    leaves, treedef = jax.tree_util.tree_flatten(args)
+    avals = tuple((aval.shape, str(aval.dtype), aval.weak_type) for aval in map(jax.typeof, leaves))
+    return treedef, avals
+
+class AOTFunction:
+    """按输入形状与类型缓存lower().compile()得到的可执行文件
+
+    fn为jit函数. 静态参数以关键字传入, 作为键的一部分, 不传给编译结果.
+    同一形状的后续调用直接执行编译结果, 不再经过jit的分派与追踪.
+
+    示例:
+        loss = AOTFunction(loss_function)
+        value = loss(params, initial_state, inputs, observed_flow, gradient_mode='checkpoint')
+        print(loss.last_stats)
+    """
+
+    def __init__(self, fn: Callable, name: Optional[str] = None):
+        self.fn = fn
+        self.name = name or getattr(fn, '__name__', repr(fn))
+        self.executables: Dict[Hashable, Any] = {}
+        self.stats: Dict[Hashable, CompileStats] = {}
+        self.last_stats: Optional[CompileStats] = None
+
+    def compile(self, *args, **static_kwargs):
+        """编译 (或取出已编译的) 可执行文件"""
+        key = (_signature(args), tuple(sorted(static_kwargs.items())))
+        if key not in self.executables:
+            hits = _cache_hits
+            start_time = time.perf_counter()
+            lowered = self.fn.lower(*args, **static_kwargs)
+            lower_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            self.executables[key] = lowered.compile()
+            compile_time = time.perf_counter() - start_time
+            self.stats[key] = CompileStats(lower_time, compile_time, _cache_hits > hits)
+        self.last_stats = self.stats[key]
+        return self.executables[key]
+
+    def __call__(self, *args, **static_kwargs):
+        return self.compile(*args, **static_kwargs)(*args)
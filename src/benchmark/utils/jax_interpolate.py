@@ -0,0 +1,51 @@
+import jax.numpy as jnp
+from typing import NamedTuple
+
+class CubicInterpolant(NamedTuple):
+    """均匀网格上的三次Hermite插值 (预计算系数, 作为pytree传入jit/vmap/grad)"""
+    t0: jnp.ndarray      # 第一个节点的时间
+    dt: jnp.ndarray      # 节点间距
+    coeffs: jnp.ndarray  # (4, n - 1, ...) 每个区间的多项式系数, 按幂次升序
+
+def cubic_slopes(values: jnp.ndarray) -> jnp.ndarray:
+    """节点处的一阶差商 (与interpax的'cubic'方法一致: 两端单侧差分, 内部中心差分)"""
+    df = jnp.diff(values, axis=0)
+    return jnp.concatenate([df[:1], 0.5 * (df[:-1] + df[1:]), df[-1:]], axis=0)
+
+def build_interpolant(values: jnp.ndarray, t0: float = 1.0, dt: float = 1.0) -> CubicInterpolant:
+    """构建插值器
+
+    参数:
+        values: (n, ...) 节点上的取值, 首维为时间, 其余维度 (如多个输入通道) 一并插值
+        t0: 第一个节点的时间
+        dt: 节点间距
+
+    返回:
+        CubicInterpolant, 与interpax.interp1d(method="cubic")在[t0, t0 + (n - 1) * dt]内结果相同
+    """
+    values = jnp.asarray(values)
+    # 斜率以单位区间 (s = (t - t0) / dt - i) 表示, 因此dt不出现在系数中
+    slopes = cubic_slopes(values)
+    f0, f1 = values[:-1], values[1:]
+    m0, m1 = slopes[:-1], slopes[1:]
+    coeffs = jnp.stack([
+        f0,
+        m0,
+        3.0 * (f1 - f0) - 2.0 * m0 - m1,
+        2.0 * (f0 - f1) + m0 + m1,
+    ], axis=0)
+    return CubicInterpolant(t0=jnp.asarray(t0, dtype=values.dtype),
+                            dt=jnp.asarray(dt, dtype=values.dtype),
+                            coeffs=coeffs)
+
+def evaluate(interp: CubicInterpolant, t: jnp.ndarray) -> jnp.ndarray:
+    """在时间t处求值: O(1)索引 + Horner求值
+
+    超出节点范围时延用首末区间的多项式.
+    """
+    s = (t - interp.t0) / interp.dt
+    index = jnp.clip(jnp.floor(s).astype(jnp.int32), 0, interp.coeffs.shape[1] - 1)
+    c = interp.coeffs[:, index]
+    # 扩展s的维度, 使其与通道维度广播
+    s = jnp.reshape(s - index, s.shape + (1,) * (c.ndim - 1 - s.ndim))
+    return c[0] + s * (c[1] + s * (c[2] + s * c[3]))